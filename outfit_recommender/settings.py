@@ -27,6 +27,8 @@ INSTALLED_APPS = [
 CRISPY_TEMPLATE_PACK = 'bootstrap4'
 
 MIDDLEWARE = [
+    'wardrobe.instrumentation.RequestTimingMiddleware',
+    'wardrobe.instrumentation.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -40,7 +42,7 @@ ROOT_URLCONF = 'outfit_recommender.urls'
 
 TEMPLATES = [
     {
-        'BACKEND': 'django.template.backends.django.DjangoTemplates',
+        'BACKEND': 'wardrobe.instrumentation.TimedDjangoTemplates',  # Reports render time to RequestTimingMiddleware
         'DIRS': [os.path.join(BASE_DIR, 'templates')],
         'APP_DIRS': True,
         'OPTIONS': {
@@ -56,13 +58,60 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'outfit_recommender.wsgi.application'
 
-# Database
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# Database: SQLite by default, PostgreSQL with DB_ENGINE=postgres and the
+# DB_NAME/DB_USER/DB_PASSWORD/DB_HOST/DB_PORT environment variables.
+# Connections are kept for DB_CONN_MAX_AGE seconds and reused across
+# requests. ASGI deployments (ASYNC_VIEWS) default to 0, since Django 4.2
+# opens them on per-request threads that would leak kept connections
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+DB_CONN_MAX_AGE = int(os.environ.get('DB_CONN_MAX_AGE', '0' if os.environ.get('ASYNC_VIEWS', '') == '1' else '60'))
+
+if DB_ENGINE == 'postgres':
+    # Django 4.2 has no connection pool of its own: each web process keeps
+    # one connection per thread. With many processes, run PgBouncer in
+    # transaction mode in front of the database and set DB_POOLER=pgbouncer,
+    # which turns off the server-side cursors it cannot carry between
+    # transactions
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'outfit_recommender'),
+            'USER': os.environ.get('DB_USER', ''),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', ''),
+            'PORT': os.environ.get('DB_PORT', ''),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            'CONN_HEALTH_CHECKS': True,
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_POOLER', '') == 'pgbouncer',
+            'OPTIONS': {'connect_timeout': 5},
+        }
+    }
+else:
+    # WAL lets reads run alongside the single writer, and IMMEDIATE
+    # transactions make concurrent writers wait busy_timeout for the lock
+    # instead of failing with "database is locked" (see
+    # wardrobe/backends/sqlite3/base.py)
+    DATABASES = {
+        'default': {
+            'ENGINE': 'wardrobe.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'CONN_MAX_AGE': DB_CONN_MAX_AGE,
+            # A file rather than the default shared in-memory database, so
+            # tests with several connections lock the way deployments do
+            'TEST': {'NAME': BASE_DIR / 'test_db.sqlite3'},
+            'OPTIONS': {
+                'transaction_mode': 'IMMEDIATE',
+                'pragmas': {
+                    'journal_mode': 'WAL',
+                    'synchronous': 'NORMAL',
+                    'busy_timeout': 10000,  # ms
+                    'mmap_size': 256 * 1024 * 1024,  # bytes of the file read through mmap
+                    'cache_size': -64 * 1024,  # Negative means KiB: a 64 MB page cache per connection
+                    'temp_store': 'MEMORY',
+                },
+            },
+        }
     }
-}
 
 # Password validation
 AUTH_PASSWORD_VALIDATORS = [
@@ -94,6 +143,103 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Uploads: stream anything over 1 MB to a temporary file in chunks and cut
+# off oversize uploads while they are still arriving (see wardrobe/ingest.py)
+FILE_UPLOAD_MAX_MEMORY_SIZE = 1024 * 1024
+FILE_UPLOAD_HANDLERS = [
+    'wardrobe.ingest.UploadSizeLimitHandler',
+    'django.core.files.uploadhandler.MemoryFileUploadHandler',
+    'django.core.files.uploadhandler.TemporaryFileUploadHandler',
+]
+MAX_IMAGE_UPLOAD_SIZE = 25 * 1024 * 1024  # bytes
+MAX_IMAGE_PIXELS = 50_000_000  # Larger images are rejected from their header
+MAX_STORED_IMAGE_DIMENSION = 2048  # Originals are downscaled to this longest side
+
+# Background image analysis (see wardrobe/jobs.py and run_analysis_worker)
+ANALYSIS_QUEUE_MAX_DEPTH = 500
+ANALYSIS_JOB_MAX_ATTEMPTS = 3
+ANALYSIS_JOB_RETRY_DELAY = 30  # seconds, doubled on every retry
+ANALYSIS_WORKER_PROCESSES = 2
+
+# Color detection: 'accurate' (KMeans) or 'fast' (histogram, no sklearn)
+IMAGE_ANALYSIS_MODE = 'accurate'
+
+# Outfit candidates scored per season by the recommendation engine; bounds
+# generation latency for very large wardrobes
+OUTFIT_CANDIDATE_BUDGET = 20000
+
+# 'broadcast' (budgeted bulk scoring) or 'branch_and_bound' (pruned exact search
+# that stops at the node/time budget and returns the best found so far)
+OUTFIT_SEARCH_STRATEGY = 'broadcast'
+OUTFIT_SEARCH_MAX_NODES = 200000
+OUTFIT_SEARCH_TIME_LIMIT = 0.5  # seconds per season
+
+# Image analysis result cache (see wardrobe/analysis_cache.py)
+ANALYSIS_CACHE_ENABLED = True
+ANALYSIS_CACHE_MAX_ENTRIES = 10000
+ANALYSIS_CACHE_NEAR_DUPLICATES = True  # Also match perceptually similar images by dHash
+ANALYSIS_CACHE_MAX_DISTANCE = 3  # Max dHash Hamming distance; values above 3 may miss matches
+ANALYSIS_CACHE_MAX_COLOR_DISTANCE = 10.0  # Max mean Lab distance; dHash alone ignores color
+
+# Caches. Local memory is per process; with several web or worker
+# processes, point these at a shared backend such as
+# django.core.cache.backends.filebased.FileBasedCache or
+# django.core.cache.backends.db.DatabaseCache so invalidation is seen everywhere
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'default',
+    },
+    # Shared by every web worker and by precompute_suggestions, so pools
+    # built offline are the ones served; the table is created by migrations
+    'suggestions': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'wardrobe_suggestion_cache',
+        'OPTIONS': {'MAX_ENTRIES': 50000},  # Users with a cached pool
+    },
+}
+
+# Per-user suggestion candidate pools (see wardrobe/suggestion_pool.py),
+# reused until the wardrobe or favorite colors/patterns change
+SUGGESTION_CACHE_ALIAS = 'suggestions'
+SUGGESTION_CACHE_TIMEOUT = 24 * 3600  # seconds
+SUGGESTION_POOL_SIZE = 40  # Candidates kept per season
+
+# Parsed style preferences are cached in the default cache until saved;
+# each use checks the row's version, so other processes see saves at once
+STYLE_PREFERENCE_CACHE_TIMEOUT = 3600  # seconds
+
+# Keyset-paginated listings (see wardrobe/pagination.py)
+WARDROBE_PAGE_SIZE = 24
+OUTFITS_PAGE_SIZE = 12
+
+# Per-view request timing (see wardrobe/instrumentation.py)
+REQUEST_TIMING_ENABLED = True
+# Maximum queries per URL name; with QUERY_BUDGET_ENFORCE (e.g. in test
+# settings) a request over budget raises QueryBudgetExceeded
+VIEW_QUERY_BUDGETS = {
+    'dashboard': 8,
+    'wardrobe-home': 6,
+    'outfit-suggestions': 6,
+    'saved-outfits': 6,
+}
+QUERY_BUDGET_ENFORCE = False
+# Besides staff users, Prometheus scrapes /metrics with this bearer token
+# (scrape_config authorization.credentials); empty disables token access
+METRICS_TOKEN = os.environ.get('METRICS_TOKEN', '')
+# Client addresses allowed without a token. Empty by default: behind a
+# local reverse proxy every request arrives from 127.0.0.1
+METRICS_ALLOWED_IPS = [ip for ip in os.environ.get('METRICS_ALLOWED_IPS', '').split(',') if ip]
+# cProfile 1 in N requests into PROFILE_DIR (0 = off)
+PROFILE_SAMPLE_RATE = int(os.environ.get('PROFILE_SAMPLE_RATE', '0'))
+PROFILE_DIR = BASE_DIR / 'profiles'
+
+# Serve the busiest views from wardrobe/async_views.py; turn on when running
+# under an ASGI server (outfit_recommender/asgi.py)
+ASYNC_VIEWS = os.environ.get('ASYNC_VIEWS', '') == '1'
+# Threads that async views hand image analysis and outfit search to
+ML_EXECUTOR_WORKERS = 4
+
 # Default primary key field type
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -1,9 +1,9 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, re_path, include
 from django.conf import settings
 from django.conf.urls.static import static
 from django.contrib.auth import views as auth_views
-from wardrobe import views as wardrobe_views
+from wardrobe import async_views, views as wardrobe_views
 
 urlpatterns = [
     path('admin/', admin.site.urls),
@@ -11,9 +11,15 @@ urlpatterns = [
     path('register/', wardrobe_views.register, name='register'),
     path('login/', auth_views.LoginView.as_view(template_name='wardrobe/login.html'), name='login'),
     path('logout/', auth_views.LogoutView.as_view(template_name='wardrobe/logout.html'), name='logout'),
-    path('dashboard/', wardrobe_views.dashboard, name='dashboard'),
+    path('dashboard/', (async_views if getattr(settings, 'ASYNC_VIEWS', False) else wardrobe_views).dashboard, name='dashboard'),
     path('wardrobe/', include('wardrobe.urls')),
+    path('metrics', wardrobe_views.prometheus_metrics, name='prometheus-metrics'),
 ]
 
 if settings.DEBUG:
+    # Renditions have content-hashed names, so they can be cached forever;
+    # in production the web server should send the same headers for them
+    urlpatterns += [
+        re_path(r'^%s(?P<path>renditions/.*)$' % settings.MEDIA_URL.lstrip('/'), wardrobe_views.serve_rendition_file),
+    ]
     urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
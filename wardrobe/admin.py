@@ -1,5 +1,5 @@
 from django.contrib import admin
-from .models import UserProfile, ClothingItem, Outfit, SavedOutfit, StylePreference
+from .models import UserProfile, ClothingItem, AnalysisJob, ItemFeatures, WardrobeStats, ImageAnalysisCache, AnalysisCacheCounter, Outfit, SavedOutfit, StylePreference
 
 @admin.register(UserProfile)
 class UserProfileAdmin(admin.ModelAdmin):
@@ -8,10 +8,38 @@ class UserProfileAdmin(admin.ModelAdmin):
 
 @admin.register(ClothingItem)
 class ClothingItemAdmin(admin.ModelAdmin):
-    list_display = ('name', 'user', 'category', 'color', 'pattern', 'season')
-    list_filter = ('category', 'color', 'pattern', 'season')
+    list_display = ('name', 'user', 'category', 'color', 'pattern', 'season', 'analysis_status')
+    list_filter = ('category', 'color', 'pattern', 'season', 'analysis_status')
     search_fields = ('name', 'user__username')
 
+@admin.register(AnalysisJob)
+class AnalysisJobAdmin(admin.ModelAdmin):
+    list_display = ('item', 'status', 'attempts', 'run_after', 'locked_by', 'date_finished')
+    list_filter = ('status',)
+    search_fields = ('item__name', 'item__user__username', 'last_error')
+
+@admin.register(ItemFeatures)
+class ItemFeaturesAdmin(admin.ModelAdmin):
+    list_display = ('item', 'user', 'embedding_version', 'date_updated')
+    list_filter = ('embedding_version',)
+    search_fields = ('item__name', 'user__username')
+    exclude = ('embedding',)
+
+@admin.register(WardrobeStats)
+class WardrobeStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'total_items', 'style_score', 'date_updated')
+    search_fields = ('user__username',)
+
+@admin.register(ImageAnalysisCache)
+class ImageAnalysisCacheAdmin(admin.ModelAdmin):
+    list_display = ('content_hash', 'version', 'color', 'pattern', 'hits', 'last_used')
+    list_filter = ('version', 'color', 'pattern')
+    search_fields = ('content_hash',)
+
+@admin.register(AnalysisCacheCounter)
+class AnalysisCacheCounterAdmin(admin.ModelAdmin):
+    list_display = ('name', 'value')
+
 @admin.register(Outfit)
 class OutfitAdmin(admin.ModelAdmin):
     list_display = ('name', 'user', 'occasion', 'season', 'ai_score')
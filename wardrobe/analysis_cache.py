@@ -0,0 +1,157 @@
+import os
+from django.conf import settings
+from django.db.models import F, Q
+from django.utils import timezone
+from .models import ImageAnalysisCache, AnalysisCacheCounter
+from .renditions import hash_image_file
+
+# Cache defaults, overridable from settings
+DEFAULT_MAX_ENTRIES = 10000
+DEFAULT_MAX_DISTANCE = 3  # Max Hamming distance between dHashes for a near-duplicate hit
+DEFAULT_MAX_COLOR_DISTANCE = 10.0  # Max CIE76 distance between mean Lab colors for a near-duplicate hit
+EVICTION_SLACK = 0.1  # Let the cache overshoot by 10% before trimming it back
+
+COUNTER_NAMES = ['exact_hits', 'near_hits', 'misses', 'evictions']
+
+def cache_enabled():
+    return getattr(settings, 'ANALYSIS_CACHE_ENABLED', True)
+
+def content_hash(image_file):
+    """SHA-256 hex digest of an uploaded file or filesystem path, read in chunks"""
+    if isinstance(image_file, (str, os.PathLike)):
+        with open(image_file, 'rb') as f:
+            return hash_image_file(f)
+    return hash_image_file(image_file)
+
+def _to_signed(value):
+    """Store an unsigned 64-bit hash in a signed BigIntegerField"""
+    return value - (1 << 64) if value >= (1 << 63) else value
+
+def _bands(dhash):
+    return [(dhash >> (16 * i)) & 0xFFFF for i in range(4)]
+
+def _hamming(a, b):
+    return bin((a ^ b) & 0xFFFFFFFFFFFFFFFF).count('1')
+
+def _color_distance(a, b):
+    return sum((x - y) ** 2 for x, y in zip(a, b)) ** 0.5
+
+def _bump(name, amount=1):
+    updated = AnalysisCacheCounter.objects.filter(name=name).update(value=F('value') + amount)
+    if not updated:
+        counter, _ = AnalysisCacheCounter.objects.get_or_create(name=name)
+        AnalysisCacheCounter.objects.filter(pk=counter.pk).update(value=F('value') + amount)
+
+def _touch(entry):
+    ImageAnalysisCache.objects.filter(pk=entry.pk).update(hits=F('hits') + 1, last_used=timezone.now())
+
+def _result(entry):
+    return {'color': entry.color, 'pattern': entry.pattern, 'palette': entry.palette, 'features': entry.features}
+
+def get_exact(digest, version):
+    """Look up a result by content hash"""
+    entry = ImageAnalysisCache.objects.filter(content_hash=digest, version=version).first()
+    if entry is None:
+        return None
+    _touch(entry)
+    _bump('exact_hits')
+    return _result(entry)
+
+def get_exact_many(digests, version):
+    """Look up results for several content hashes in one query"""
+    entries = {
+        entry.content_hash: entry
+        for entry in ImageAnalysisCache.objects.filter(content_hash__in=set(digests), version=version)
+    }
+    if entries:
+        ImageAnalysisCache.objects.filter(pk__in=[e.pk for e in entries.values()]).update(
+            hits=F('hits') + 1, last_used=timezone.now()
+        )
+        _bump('exact_hits', sum(1 for d in digests if d in entries))
+    return {digest: _result(entry) for digest, entry in entries.items()}
+
+def get_near(dhash, mean_lab, version):
+    """Look up a result for a visually near-identical image
+
+    The 64-bit dHash is split into four 16-bit bands. Two hashes within
+    Hamming distance 3 must agree on at least one band, so candidates are
+    fetched by indexed band equality and then checked exactly. The dHash
+    is grayscale, so the same garment in another color hashes alike; a
+    candidate also needs a mean Lab color within
+    ANALYSIS_CACHE_MAX_COLOR_DISTANCE of the image's.
+    """
+    if not getattr(settings, 'ANALYSIS_CACHE_NEAR_DUPLICATES', True):
+        return None
+
+    max_distance = getattr(settings, 'ANALYSIS_CACHE_MAX_DISTANCE', DEFAULT_MAX_DISTANCE)
+    max_color_distance = getattr(settings, 'ANALYSIS_CACHE_MAX_COLOR_DISTANCE', DEFAULT_MAX_COLOR_DISTANCE)
+    bands = _bands(dhash)
+    candidates = ImageAnalysisCache.objects.filter(
+        Q(dhash_band0=bands[0]) | Q(dhash_band1=bands[1]) |
+        Q(dhash_band2=bands[2]) | Q(dhash_band3=bands[3]),
+        version=version,
+    )
+
+    best, best_distance = None, max_distance + 1
+    for entry in candidates:
+        # Entries stored before mean_lab existed have no color to compare
+        if not entry.mean_lab or _color_distance(entry.mean_lab, mean_lab) > max_color_distance:
+            continue
+        distance = _hamming(entry.dhash, dhash)
+        if distance < best_distance:
+            best, best_distance = entry, distance
+
+    if best is None:
+        return None
+    _touch(best)
+    _bump('near_hits')
+    return _result(best)
+
+def record_miss():
+    _bump('misses')
+
+def store(digest, dhash, mean_lab, version, results):
+    """Store an analysis result and evict least recently used entries if over size"""
+    if not results.get('color') or not results.get('pattern'):
+        return
+
+    bands = _bands(dhash)
+    ImageAnalysisCache.objects.update_or_create(
+        content_hash=digest, version=version,
+        defaults={
+            'dhash': _to_signed(dhash),
+            'dhash_band0': bands[0],
+            'dhash_band1': bands[1],
+            'dhash_band2': bands[2],
+            'dhash_band3': bands[3],
+            'mean_lab': [round(float(value), 2) for value in mean_lab],
+            'color': results['color'],
+            'pattern': results['pattern'],
+            'palette': results.get('palette', []),
+            'features': results.get('features', {}),
+            'last_used': timezone.now(),
+        },
+    )
+    evict()
+
+def evict():
+    """Trim the cache back to its maximum size, dropping least recently used entries"""
+    max_entries = getattr(settings, 'ANALYSIS_CACHE_MAX_ENTRIES', DEFAULT_MAX_ENTRIES)
+    total = ImageAnalysisCache.objects.count()
+    if total <= max_entries * (1 + EVICTION_SLACK):
+        return 0
+
+    # Everything used no later than the first entry past the limit goes
+    cutoff = ImageAnalysisCache.objects.order_by('-last_used').values_list('last_used', flat=True)[max_entries]
+    evicted, _ = ImageAnalysisCache.objects.filter(last_used__lte=cutoff).delete()
+    _bump('evictions', evicted)
+    return evicted
+
+def cache_stats():
+    """Hit/miss counters and current size of the analysis cache"""
+    stats = {name: 0 for name in COUNTER_NAMES}
+    stats.update(AnalysisCacheCounter.objects.values_list('name', 'value'))
+    lookups = stats['exact_hits'] + stats['near_hits'] + stats['misses']
+    stats['hit_rate'] = (stats['exact_hits'] + stats['near_hits']) / lookups if lookups else 0.0
+    stats['entries'] = ImageAnalysisCache.objects.count()
+    return stats
@@ -0,0 +1,167 @@
+import hashlib
+from functools import wraps
+from django.conf import settings
+from django.http import JsonResponse
+from django.utils.cache import get_conditional_response, patch_cache_control, set_response_etag
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_GET
+from .listings import (item_listing, outfit_listing, saved_outfit_listing,
+                       serialize_item, serialize_outfit, serialize_saved_outfit,
+                       ITEM_FIELDS, OUTFIT_FIELDS, SAVED_OUTFIT_FIELDS,
+                       DEFAULT_ITEM_FIELDS, DEFAULT_OUTFIT_FIELDS, DEFAULT_SAVED_OUTFIT_FIELDS)
+from .models import COLOR_CHOICES, PATTERN_CHOICES, choice_values
+from .pagination import (paginate_keyset, InvalidCursor, ITEM_ORDERING, OUTFIT_ORDERING, SAVED_OUTFIT_ORDERING,
+                         DEFAULT_ITEMS_PAGE_SIZE, DEFAULT_OUTFITS_PAGE_SIZE, MAX_PAGE_SIZE)
+from .preferences import get_preferences
+from .stats import get_wardrobe_stats
+
+ITEM_FILTERS = ('category', 'color', 'pattern', 'season')
+OUTFIT_FILTERS = ('occasion', 'season', 'style')
+
+class BadRequest(ValueError):
+    """Raised for query parameters the API cannot use; answered with a 400"""
+    pass
+
+def api_view(view):
+    """GET-only JSON view for a logged-in user
+
+    Anonymous requests get a 401 rather than the login redirect, and
+    BadRequest becomes a 400 with its message.
+    """
+    @require_GET
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if not request.user.is_authenticated:
+            return JsonResponse({'error': 'Authentication required'}, status=401)
+        try:
+            return view(request, *args, **kwargs)
+        except BadRequest as e:
+            return JsonResponse({'error': str(e)}, status=400)
+    return wrapper
+
+def conditional_json(request, build, version_key=None, last_modified=None):
+    """JSON response from build(), or a 304 when the client's copy is current
+
+    With a version_key (a value that changes whenever the data does) the
+    ETag is known up front and build is skipped for clients that are up to
+    date. Without one the ETag is a hash of the payload, which still saves
+    sending it again. The list endpoints send no Last-Modified: deleting a
+    row or rescoring an outfit changes a page without changing any row
+    date, while the payload hash always changes with the page.
+    """
+    etag = None
+    if version_key is not None:
+        key = f'{request.user.pk}:{version_key}:{request.GET.urlencode()}'
+        etag = quote_etag(hashlib.md5(key.encode(), usedforsecurity=False).hexdigest())
+        not_modified = get_conditional_response(request, etag=etag, last_modified=last_modified)
+        if not_modified is not None:
+            not_modified['ETag'] = etag
+            if last_modified is not None:
+                not_modified['Last-Modified'] = http_date(last_modified)
+            patch_cache_control(not_modified, private=True, no_cache=True)
+            return not_modified
+
+    response = JsonResponse(build(), json_dumps_params={'separators': (',', ':')})
+    if etag is None:
+        set_response_etag(response)
+        response = get_conditional_response(request, etag=response['ETag'], response=response)
+    else:
+        response['ETag'] = etag
+        if last_modified is not None:
+            response['Last-Modified'] = http_date(last_modified)
+    # Private to the user, and always revalidated so changes show up immediately
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+def requested_fields(request, available, default):
+    """Fields named in ?fields=a,b,c, or the default set"""
+    fields = request.GET.get('fields')
+    if not fields:
+        return default
+    fields = tuple(dict.fromkeys(name.strip() for name in fields.split(',') if name.strip()))
+    unknown = [name for name in fields if name not in available]
+    if unknown:
+        raise BadRequest(f'Unknown fields: {", ".join(unknown)}. Available: {", ".join(available)}')
+    return fields
+
+def filtered(request, queryset, filters):
+    """Apply ?field=value equality filters, ignoring empty values and 'All'"""
+    for field in filters:
+        value = request.GET.get(field)
+        if value and value != 'All':
+            queryset = queryset.filter(**{field: value.lower()})
+    return queryset
+
+def keyset_page(request, queryset, ordering, default_page_size):
+    try:
+        page_size = int(request.GET.get('page_size', default_page_size))
+    except ValueError:
+        raise BadRequest('page_size must be an integer')
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    try:
+        return paginate_keyset(queryset, ordering, request.GET.get('cursor'), page_size)
+    except InvalidCursor:
+        raise BadRequest('Invalid cursor')
+
+def page_payload(page, serialize, fields):
+    return {
+        'results': [serialize(obj, fields) for obj in page],
+        'next_cursor': page.next_cursor,
+    }
+
+@api_view
+def items(request):
+    """A page of the user's items, newest first"""
+    fields = requested_fields(request, ITEM_FIELDS, DEFAULT_ITEM_FIELDS)
+    queryset = filtered(request, item_listing(request.user), ITEM_FILTERS)
+    page = keyset_page(request, queryset, ITEM_ORDERING,
+                       getattr(settings, 'WARDROBE_PAGE_SIZE', DEFAULT_ITEMS_PAGE_SIZE))
+    return conditional_json(request, lambda: page_payload(page, serialize_item, fields))
+
+@api_view
+def outfits(request):
+    """A page of the user's outfits, best first"""
+    fields = requested_fields(request, OUTFIT_FIELDS, DEFAULT_OUTFIT_FIELDS)
+    queryset = filtered(request, outfit_listing(request.user), OUTFIT_FILTERS)
+    if 'items' not in fields:
+        queryset = queryset.prefetch_related(None)
+    page = keyset_page(request, queryset, OUTFIT_ORDERING,
+                       getattr(settings, 'OUTFITS_PAGE_SIZE', DEFAULT_OUTFITS_PAGE_SIZE))
+    return conditional_json(request, lambda: page_payload(page, serialize_outfit, fields))
+
+@api_view
+def saved_outfits(request):
+    """A page of the user's saved outfits, most recently saved first"""
+    fields = requested_fields(request, SAVED_OUTFIT_FIELDS, DEFAULT_SAVED_OUTFIT_FIELDS)
+    queryset = saved_outfit_listing(request.user, with_items='outfit' in fields)
+    page = keyset_page(request, queryset, SAVED_OUTFIT_ORDERING,
+                       getattr(settings, 'OUTFITS_PAGE_SIZE', DEFAULT_OUTFITS_PAGE_SIZE))
+    return conditional_json(request, lambda: page_payload(page, serialize_saved_outfit, fields))
+
+@api_view
+def preferences(request):
+    """The user's style preferences, validated by their version"""
+    prefs = get_preferences(request.user)
+    return conditional_json(request, lambda: {
+        'favorite_colors': choice_values(prefs.color_mask, COLOR_CHOICES),
+        'preferred_patterns': choice_values(prefs.pattern_mask, PATTERN_CHOICES),
+        'seasons': list(prefs.seasons),
+        'occasions': list(prefs.occasions),
+        'style': prefs.style,
+        'casual_formal_balance': prefs.casual_formal_balance,
+        'sustainability_focus': prefs.sustainability_focus,
+    }, version_key=f'preferences:{prefs.version}')
+
+@api_view
+def dashboard(request):
+    """Wardrobe totals and breakdowns, validated by the stats version"""
+    stats = get_wardrobe_stats(request.user)
+    return conditional_json(request, lambda: {
+        'total_items': stats.total_items,
+        'style_score': stats.style_score,
+        'category_counts': stats.category_counts,
+        'color_counts': stats.color_counts,
+        'pattern_counts': stats.pattern_counts,
+        'season_counts': stats.season_counts,
+        'date_updated': stats.date_updated.isoformat(),
+    }, version_key=f'stats:{stats.version}', last_modified=int(stats.date_updated.timestamp()))
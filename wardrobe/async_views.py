@@ -0,0 +1,154 @@
+"""Async versions of the busiest views, for deployments behind an ASGI server
+
+Queries go through Django's async ORM, CPU-bound ML runs on the bounded
+executor in executor.py, and the remaining sync work (templates that check
+storage, transactions, signal-heavy saves) runs through sync_to_async.
+They take the place of their views.py counterparts when ASYNC_VIEWS is on.
+"""
+from functools import wraps
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib import messages
+from django.contrib.auth.views import redirect_to_login
+from django.shortcuts import render, redirect
+from .executor import run_ml
+from .metrics import stage
+from .forms import ClothingItemForm, BulkItemUploadForm
+from .listings import item_listing, outfit_listing, saved_outfit_listing, SUGGESTION_ITEM_FIELDS
+from .ml_utils import analyze_images
+from .models import ClothingItem
+from .pagination import apaginate_keyset, InvalidCursor, ITEM_ORDERING, OUTFIT_ORDERING, SAVED_OUTFIT_ORDERING, DEFAULT_ITEMS_PAGE_SIZE, DEFAULT_OUTFITS_PAGE_SIZE
+from .persistence import save_outfit_suggestions
+from .preferences import get_preferences
+from .stats import aget_wardrobe_stats
+from .suggestion_pool import suggest_from_pool
+from .views import page_url, filter_items, filter_outfits, store_new_item, store_bulk_items, observe_generation, report_saved_suggestions
+
+arender = sync_to_async(render)
+
+def async_login_required(view):
+    """login_required for async views
+
+    request.user is loaded lazily with sync queries, so it is resolved
+    once on a worker thread before the view runs.
+    """
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if not await sync_to_async(lambda: request.user.is_authenticated)():
+            return redirect_to_login(request.get_full_path())
+        return await view(request, *args, **kwargs)
+    return wrapper
+
+async def alisting_page(request, queryset, ordering, page_size):
+    """Async views.listing_page"""
+    try:
+        page = await apaginate_keyset(queryset, ordering, request.GET.get('cursor'), page_size)
+    except InvalidCursor:
+        page = await apaginate_keyset(queryset, ordering, None, page_size)
+
+    return page, {
+        'page': page,
+        'next_page_url': page_url(request, page.next_cursor) if page.has_next else None,
+        'first_page_url': page_url(request) if page.cursor else None,
+    }
+
+@async_login_required
+async def dashboard(request):
+    """User dashboard view"""
+    stats = await aget_wardrobe_stats(request.user)
+    recent_items = [item async for item in item_listing(request.user).order_by(*ITEM_ORDERING)[:4]]
+    saved_outfits = [saved async for saved in
+                     saved_outfit_listing(request.user, with_items=False).order_by(*SAVED_OUTFIT_ORDERING)[:2]]
+    outfit_suggestions = [outfit async for outfit in outfit_listing(request.user).order_by(*OUTFIT_ORDERING)[:3]]
+
+    context = {
+        'wardrobe_count': stats.total_items,
+        'recent_items': recent_items,
+        'saved_outfits': saved_outfits,
+        'outfit_suggestions': outfit_suggestions,
+        'style_score': stats.style_score,
+    }
+    return await arender(request, 'wardrobe/dashboard.html', context)
+
+@async_login_required
+async def wardrobe_home(request):
+    """View for browsing wardrobe items"""
+    items, selected = filter_items(request, item_listing(request.user))
+    page, pagination = await alisting_page(request, items, ITEM_ORDERING,
+                                           getattr(settings, 'WARDROBE_PAGE_SIZE', DEFAULT_ITEMS_PAGE_SIZE))
+
+    context = {'items': page, **pagination, **selected}
+    return await arender(request, 'wardrobe/wardrobe_home.html', context)
+
+@async_login_required
+async def add_item(request):
+    """View for adding a new clothing item"""
+    if request.method == 'POST':
+        form = ClothingItemForm(request.POST, request.FILES)
+        # Validation inspects and may resize the upload
+        if await run_ml(form.is_valid):
+            await sync_to_async(store_new_item)(request, form)
+            return redirect('wardrobe-home')
+    else:
+        form = ClothingItemForm()
+
+    return await arender(request, 'wardrobe/item_form.html', {'form': form, 'title': 'Add New Item'})
+
+@async_login_required
+async def bulk_add_items(request):
+    """View for adding many clothing items at once from a batch of photos"""
+    if request.method == 'POST':
+        form = BulkItemUploadForm(request.POST, request.FILES)
+        if await run_ml(form.is_valid):
+            images = form.cleaned_data['images']
+            analysis_results = await run_ml(analyze_images, images)
+            items = await sync_to_async(store_bulk_items)(request.user, form.cleaned_data, images, analysis_results)
+            messages.success(request, f'{len(items)} items have been added to your wardrobe!')
+            return redirect('wardrobe-home')
+    else:
+        form = BulkItemUploadForm()
+
+    return await arender(request, 'wardrobe/bulk_upload.html', {'form': form, 'title': 'Add Items in Bulk'})
+
+@async_login_required
+async def outfit_suggestions(request):
+    """View for outfit suggestions"""
+    outfits, selected = filter_outfits(request, outfit_listing(request.user))
+    page, pagination = await alisting_page(request, outfits, OUTFIT_ORDERING,
+                                           getattr(settings, 'OUTFITS_PAGE_SIZE', DEFAULT_OUTFITS_PAGE_SIZE))
+
+    context = {'outfits': page, **pagination, **selected}
+    return await arender(request, 'wardrobe/outfit_suggestions.html', context)
+
+@async_login_required
+async def saved_outfits(request):
+    """View for saved outfits"""
+    page, pagination = await alisting_page(request, saved_outfit_listing(request.user), SAVED_OUTFIT_ORDERING,
+                                           getattr(settings, 'OUTFITS_PAGE_SIZE', DEFAULT_OUTFITS_PAGE_SIZE))
+    context = {'saved_outfits': page, **pagination}
+    return await arender(request, 'wardrobe/saved_outfits.html', context)
+
+@async_login_required
+async def generate_suggestions(request):
+    """Generate new outfit suggestions using ML"""
+    with stage('generate_suggestions', 'stats'):
+        stats = await aget_wardrobe_stats(request.user)
+
+    if stats.total_items < 2:
+        messages.warning(request, 'You need at least 2 items in your wardrobe to generate outfit suggestions.')
+        return redirect('wardrobe-home')
+
+    with stage('generate_suggestions', 'preferences'):
+        style_prefs = await sync_to_async(get_preferences)(request.user)
+    with stage('generate_suggestions', 'load_items'):
+        items = [item async for item in ClothingItem.objects.filter(user=request.user).only(*SUGGESTION_ITEM_FIELDS)]
+
+    # The candidate search is the CPU-heavy part
+    with stage('generate_suggestions', 'suggest'):
+        suggestions, _ = await run_ml(suggest_from_pool, request.user, items, style_prefs, stats.version)
+
+    with stage('generate_suggestions', 'save'):
+        saved = await sync_to_async(save_outfit_suggestions)(request.user, suggestions)
+    observe_generation(items, suggestions)
+    report_saved_suggestions(request, saved)
+    return redirect('outfit-suggestions')
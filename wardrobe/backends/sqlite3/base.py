@@ -0,0 +1,51 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+# Applied to every new connection unless OPTIONS['pragmas'] overrides them
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',  # Readers no longer block on the writer, or the writer on readers
+    'synchronous': 'NORMAL',  # Durable in WAL mode except for the last commits on power loss
+    'busy_timeout': 5000,  # ms a writer waits for the write lock before "database is locked"
+}
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """SQLite backend with per-connection pragmas and a configurable BEGIN
+
+    Extra OPTIONS, removed before the rest reach sqlite3.connect():
+
+        'pragmas': {name: value} run as PRAGMA name = value on connect
+        'transaction_mode': 'DEFERRED', 'IMMEDIATE' or 'EXCLUSIVE'
+
+    A DEFERRED transaction (SQLite's and Django's default) that reads
+    before it writes has to upgrade its lock at the first write. When
+    another connection has committed in between, SQLite fails the upgrade
+    with "database is locked" straight away instead of waiting out
+    busy_timeout. IMMEDIATE takes the write lock at BEGIN, so concurrent
+    writers queue on busy_timeout instead. Django 5.1 added
+    transaction_mode and init_command to its own backend; this covers 4.2.
+    """
+    pragmas = DEFAULT_PRAGMAS
+    transaction_mode = None
+
+    def get_connection_params(self):
+        kwargs = super().get_connection_params()
+        self.pragmas = {**DEFAULT_PRAGMAS, **kwargs.pop('pragmas', {})}
+        transaction_mode = kwargs.pop('transaction_mode', None)
+        if transaction_mode is not None and transaction_mode.upper() not in TRANSACTION_MODES:
+            raise ImproperlyConfigured(
+                f'transaction_mode must be one of {", ".join(TRANSACTION_MODES)}, not {transaction_mode!r}')
+        self.transaction_mode = transaction_mode.upper() if transaction_mode else None
+        return kwargs
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        for name, value in self.pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        if self.transaction_mode is None:
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
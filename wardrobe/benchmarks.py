@@ -0,0 +1,185 @@
+import io
+import json
+import platform
+import statistics
+import time
+import tracemalloc
+import numpy as np
+from PIL import Image
+from . import ml_utils
+from .models import ClothingItem, CATEGORY_CHOICES, COLOR_CHOICES, PATTERN_CHOICES, SEASON_CHOICES, OCCASION_CHOICES, choice_mask
+from .preferences import Preferences
+
+# Synthetic inputs: phone-photo-like resolutions and wardrobe sizes
+IMAGE_RESOLUTIONS = [(640, 480), (1920, 1440), (4032, 3024)]
+WARDROBE_SIZES = [10, 1000, 10000]
+DEFAULT_THRESHOLD = 0.2  # Flag results more than 20% worse than the baseline
+
+def synthetic_image(width, height, seed=0, fmt='JPEG'):
+    """Encoded bytes of a garment-like test image: a colored body with stripes over a light background"""
+    rng = np.random.default_rng(seed)
+    pixels = np.full((height, width, 3), 235, dtype=np.uint8)
+    body = rng.integers(0, 256, 3, dtype=np.uint8)
+    top, left = height // 6, width // 5
+    pixels[top:height - top, left:width - left] = body
+    stripe = max(height // 24, 1)
+    for y in range(top, height - top, stripe * 4):
+        pixels[y:y + stripe, left:width - left] = 255 - body
+    noise = rng.integers(-12, 13, pixels.shape, dtype=np.int16)
+    pixels = np.clip(pixels.astype(np.int16) + noise, 0, 255).astype(np.uint8)
+
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format=fmt, quality=90)
+    return buffer.getvalue()
+
+def synthetic_wardrobe(size, seed=0):
+    """Unsaved ClothingItems with ids, spread over every category, color, pattern and season"""
+    rng = np.random.default_rng(seed)
+    choices = [[value for value, _ in options] for options in
+               (CATEGORY_CHOICES, COLOR_CHOICES, PATTERN_CHOICES, SEASON_CHOICES)]
+    picks = [rng.integers(0, len(options), size) for options in choices]
+    return [
+        ClothingItem(id=i + 1, user_id=1, name=f'Item {i + 1}',
+                     category=choices[0][picks[0][i]], color=choices[1][picks[1][i]],
+                     pattern=choices[2][picks[2][i]], season=choices[3][picks[3][i]])
+        for i in range(size)
+    ]
+
+def synthetic_preferences():
+    return Preferences(
+        user_id=1, version=1,
+        color_mask=choice_mask(['black', 'blue', 'white'], COLOR_CHOICES),
+        pattern_mask=choice_mask(['solid', 'striped'], PATTERN_CHOICES),
+        season_mask=choice_mask(['fall', 'winter'], SEASON_CHOICES),
+        occasion_mask=choice_mask(['casual', 'business'], OCCASION_CHOICES),
+        style='casual', casual_formal_balance=50, sustainability_focus=False,
+    )
+
+def benchmark_cases():
+    """Map of benchmark name to a zero-argument callable
+
+    Inputs are built here, outside the measured calls. Image analysis runs
+    without the analysis cache so only the image code is measured.
+    """
+    cases = {}
+    for width, height in IMAGE_RESOLUTIONS:
+        data = synthetic_image(width, height, seed=width)
+        for mode in ml_utils.ANALYSIS_MODES:
+            cases[f'analyze_image[{mode}]@{width}x{height}'] = (
+                lambda data=data, mode=mode: ml_utils.analyze_image(io.BytesIO(data), raise_errors=True,
+                                                                    use_cache=False, mode=mode))
+        cases[f'load_image_pixels@{width}x{height}'] = lambda data=data: ml_utils.load_image_pixels(io.BytesIO(data))
+
+    img_array = ml_utils.load_image_pixels(io.BytesIO(synthetic_image(640, 480)))
+    cases['detect_pattern'] = lambda: ml_utils.detect_pattern(img_array)
+    colors = np.random.default_rng(0).integers(0, 256, (1000, 3))
+    cases['map_color_to_category@x1000'] = lambda: [ml_utils.map_color_to_category(color) for color in colors]
+
+    prefs = synthetic_preferences()
+    for size in WARDROBE_SIZES:
+        items = synthetic_wardrobe(size, seed=size)
+        cases[f'encode_items@{size}'] = (
+            lambda items=items: ml_utils.encode_items(items, prefs.color_mask, prefs.pattern_mask))
+        cases[f'generate_outfit_suggestions@{size}'] = (
+            lambda items=items: ml_utils.generate_outfit_suggestions(items, prefs, random_state=0))
+    return cases
+
+def measure(func, repeat=5, min_time=0.2):
+    """Wall time, peak memory and retained allocations of one call of func
+
+    Timing calls func in loops of at least min_time seconds and reports the
+    best and median per-call time over repeat loops. Memory is measured in
+    a separate traced call, since tracing slows Python code down: peak is
+    the most memory held at once above the starting point, and retained
+    blocks/bytes are allocations made by the call still alive when it
+    returns (its result, caches, leaks). CPython has no counter of every
+    allocation, so retained blocks stand in for allocation counts.
+    """
+    func()  # Warm up caches and lazy imports
+
+    number, elapsed = 1, 0.0
+    while True:
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        elapsed = time.perf_counter() - start
+        if elapsed >= min_time or number >= 1_000_000:
+            break
+        number *= 10 if elapsed < min_time / 10 else 2
+
+    times = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        for _ in range(number):
+            func()
+        times.append((time.perf_counter() - start) / number)
+
+    tracemalloc.start()
+    try:
+        before = tracemalloc.take_snapshot()
+        tracemalloc.reset_peak()
+        base = tracemalloc.get_traced_memory()[0]
+        result = func()
+        peak = tracemalloc.get_traced_memory()[1] - base
+        retained = tracemalloc.take_snapshot().compare_to(before, 'filename')
+        del result
+    finally:
+        tracemalloc.stop()
+
+    return {
+        'time_ms': statistics.median(times) * 1000,
+        'best_ms': min(times) * 1000,
+        'peak_kib': peak / 1024,
+        'retained_kib': sum(stat.size_diff for stat in retained) / 1024,
+        'retained_blocks': sum(stat.count_diff for stat in retained),
+        'loops': number,
+    }
+
+def run_benchmarks(pattern=None, repeat=5, min_time=0.2, progress=None):
+    """Measure every case whose name contains pattern"""
+    results = {}
+    for name, func in benchmark_cases().items():
+        if pattern and pattern not in name:
+            continue
+        results[name] = measure(func, repeat, min_time)
+        if progress:
+            progress(name, results[name])
+    return results
+
+def environment():
+    """Where results were measured; comparing across machines is not meaningful"""
+    return {
+        'machine': platform.machine(),
+        'processor': platform.processor(),
+        'python': platform.python_version(),
+        'numpy': np.__version__,
+        'pillow': Image.__version__,
+    }
+
+def save_results(path, results):
+    with open(path, 'w') as f:
+        json.dump({'environment': environment(), 'results': results}, f, indent=2, sort_keys=True)
+
+def load_results(path):
+    with open(path) as f:
+        return json.load(f)
+
+def compare_results(results, baseline, threshold=DEFAULT_THRESHOLD):
+    """Regressions of results against a baseline's results
+
+    Best time (the least noisy) and peak memory are compared; a metric is a
+    regression when it is more than threshold (a fraction) worse. Returns
+    (name, metric, baseline value, current value) tuples.
+    """
+    regressions = []
+    for name, current in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            continue
+        for metric in ('best_ms', 'peak_kib'):
+            # Ignore sub-KiB peaks, which are noise in the tracer itself
+            if metric == 'peak_kib' and previous[metric] < 1:
+                continue
+            if current[metric] > previous[metric] * (1 + threshold):
+                regressions.append((name, metric, previous[metric], current[metric]))
+    return regressions
@@ -0,0 +1,46 @@
+import asyncio
+import contextvars
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from django.conf import settings
+from django.db import connections
+
+# Executor defaults, overridable from settings
+DEFAULT_ML_EXECUTOR_WORKERS = min(4, os.cpu_count() or 1)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+def ml_executor():
+    """Bounded thread pool that async views hand CPU-bound ML work to
+
+    NumPy, scikit-learn and Pillow release the GIL in their heavy loops, so
+    the threads overlap, and the inputs (uploads, model instances) need no
+    pickling. At most ML_EXECUTOR_WORKERS calls run at once; the rest wait
+    here while the event loop keeps serving other requests.
+    """
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=getattr(settings, 'ML_EXECUTOR_WORKERS', DEFAULT_ML_EXECUTOR_WORKERS),
+                thread_name_prefix='ml',
+            )
+        return _executor
+
+def _call(func, args, kwargs):
+    try:
+        return func(*args, **kwargs)
+    finally:
+        # Executor threads live outside Django's request cycle, so close
+        # any connection func opened (e.g. for the analysis cache) here
+        connections.close_all()
+
+async def run_ml(func, *args, **kwargs):
+    """Run func(*args, **kwargs) on the ML executor without blocking the event loop"""
+    loop = asyncio.get_running_loop()
+    # Carry the request's context over so its timings include func's queries
+    context = contextvars.copy_context()
+    return await loop.run_in_executor(ml_executor(), partial(context.run, _call, func, args, kwargs))
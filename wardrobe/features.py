@@ -0,0 +1,65 @@
+import numpy as np
+from django.utils import timezone
+from .ml_utils import EMBEDDING_DIM, EMBEDDING_VERSION
+from .models import ItemFeatures
+
+EMBEDDING_DTYPE = np.dtype('<f4')
+
+def pack_embedding(embedding):
+    """Pack an embedding into little-endian float32 bytes"""
+    return np.asarray(embedding, dtype=EMBEDDING_DTYPE).tobytes()
+
+def unpack_embedding(data):
+    """Unpack bytes written by pack_embedding"""
+    return np.frombuffer(bytes(data), dtype=EMBEDDING_DTYPE)
+
+def build_item_features(item, results):
+    """Unsaved ItemFeatures for an item from an analysis result, or None"""
+    features = results.get('features')
+    if not features or not features.get('embedding'):
+        return None
+    return ItemFeatures(
+        item=item,
+        user_id=item.user_id,
+        palette=results.get('palette', []),
+        pattern_stats=features.get('pattern_stats', {}),
+        embedding=pack_embedding(features['embedding']),
+        embedding_version=features.get('embedding_version', EMBEDDING_VERSION),
+        date_updated=timezone.now(),
+    )
+
+def save_item_features(item, results):
+    """Create or replace the stored features of an item"""
+    record = build_item_features(item, results)
+    if record is None:
+        return None
+    ItemFeatures.objects.update_or_create(
+        item=item,
+        defaults={
+            'user_id': record.user_id,
+            'palette': record.palette,
+            'pattern_stats': record.pattern_stats,
+            'embedding': record.embedding,
+            'embedding_version': record.embedding_version,
+            'date_updated': record.date_updated,
+        },
+    )
+    return record
+
+def load_feature_matrix(user, version=EMBEDDING_VERSION):
+    """All of a user's item embeddings as one float32 matrix, in one query
+
+    Returns (item_ids, matrix) where matrix[i] is the embedding of
+    item_ids[i]. Items without features for this version are left out.
+    """
+    rows = list(
+        ItemFeatures.objects.filter(user=user, embedding_version=version)
+        .order_by('item_id')
+        .values_list('item_id', 'embedding')
+    )
+    if not rows:
+        return np.empty(0, dtype=np.int64), np.empty((0, EMBEDDING_DIM), dtype=EMBEDDING_DTYPE)
+
+    item_ids = np.fromiter((item_id for item_id, _ in rows), dtype=np.int64, count=len(rows))
+    matrix = np.frombuffer(b''.join(bytes(data) for _, data in rows), dtype=EMBEDDING_DTYPE)
+    return item_ids, matrix.reshape(len(rows), -1)
@@ -1,6 +1,8 @@
 from django import forms
 from django.contrib.auth.models import User
 from django.contrib.auth.forms import UserCreationForm
+from .ingest import inspect_image, normalize_image, ImageRejected
+from .renditions import hash_image_file
 from .models import UserProfile, ClothingItem, Outfit, StylePreference, CATEGORY_CHOICES, COLOR_CHOICES, PATTERN_CHOICES, SEASON_CHOICES, OCCASION_CHOICES, STYLE_CHOICES
 
 class UserRegisterForm(UserCreationForm):
@@ -29,6 +31,59 @@ class ClothingItemForm(forms.ModelForm):
         widgets = {
             'description': forms.Textarea(attrs={'rows': 3}),
         }
+    
+    def clean_image(self):
+        image = self.cleaned_data.get('image')
+        # Only new uploads need checking; an unchanged image is a stored FieldFile
+        if image and 'image' in self.changed_data:
+            try:
+                inspect_image(image)
+            except ImageRejected as e:
+                raise forms.ValidationError(str(e))
+            image = normalize_image(image)
+        return image
+    
+    def save(self, commit=True):
+        instance = super(ClothingItemForm, self).save(commit=False)
+        if 'image' in self.changed_data and self.cleaned_data.get('image'):
+            instance.image_hash = hash_image_file(self.cleaned_data['image'])
+        if commit:
+            instance.save()
+        return instance
+
+class MultipleImageInput(forms.ClearableFileInput):
+    allow_multiple_selected = True
+
+class MultipleImageField(forms.ImageField):
+    def __init__(self, *args, **kwargs):
+        kwargs.setdefault('widget', MultipleImageInput())
+        super(MultipleImageField, self).__init__(*args, **kwargs)
+    
+    def clean(self, data, initial=None):
+        if isinstance(data, (list, tuple)):
+            return [super(MultipleImageField, self).clean(d, initial) for d in data]
+        return [super(MultipleImageField, self).clean(data, initial)]
+
+class BulkItemUploadForm(forms.Form):
+    MAX_FILES = 200
+    
+    images = MultipleImageField()
+    category = forms.ChoiceField(choices=CATEGORY_CHOICES)
+    season = forms.ChoiceField(choices=SEASON_CHOICES)
+    
+    def clean_images(self):
+        images = self.cleaned_data['images']
+        if len(images) > self.MAX_FILES:
+            raise forms.ValidationError(f'You can upload at most {self.MAX_FILES} photos at a time.')
+        
+        normalized = []
+        for image in images:
+            try:
+                inspect_image(image)
+            except ImageRejected as e:
+                raise forms.ValidationError(f'{image.name}: {e}')
+            normalized.append(normalize_image(image))
+        return normalized
 
 class OutfitForm(forms.ModelForm):
     class Meta:
@@ -40,37 +95,9 @@ class OutfitForm(forms.ModelForm):
         }
 
 class StylePreferenceForm(forms.ModelForm):
-    FAVORITE_COLORS = [
-        ('black', 'Black'),
-        ('white', 'White'),
-        ('gray', 'Gray'),
-        ('blue', 'Blue'),
-        ('red', 'Red'),
-        ('green', 'Green'),
-        ('yellow', 'Yellow'),
-        ('purple', 'Purple'),
-    ]
-    
-    PATTERN_CHOICES = [
-        ('solid', 'Solid'),
-        ('stripes', 'Stripes'),
-        ('plaid', 'Plaid'),
-        ('floral', 'Floral'),
-        ('polka-dots', 'Polka Dots'),
-        ('minimal', 'Minimal'),
-    ]
-    
-    OCCASION_CHOICES = [
-        ('everyday', 'Everyday'),
-        ('work', 'Work'),
-        ('formal-events', 'Formal Events'),
-        ('casual-outings', 'Casual Outings'),
-        ('date-night', 'Date Night'),
-        ('workout', 'Workout'),
-    ]
-    
+    # Choices match the model's, so every selection maps onto a preference bit
     favorite_colors = forms.MultipleChoiceField(
-        choices=FAVORITE_COLORS,
+        choices=[choice for choice in COLOR_CHOICES if choice[0] != 'multi'],
         widget=forms.CheckboxSelectMultiple(),
         required=False
     )
@@ -0,0 +1,99 @@
+import io
+import os
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.uploadhandler import FileUploadHandler, StopUpload
+
+# Ingest defaults, overridable from settings
+DEFAULT_MAX_UPLOAD_SIZE = 25 * 1024 * 1024  # bytes
+DEFAULT_MAX_IMAGE_PIXELS = 50_000_000  # Reject larger images before decoding them
+DEFAULT_MAX_STORED_DIMENSION = 2048  # Longest side of the original kept in MEDIA_ROOT
+ALLOWED_IMAGE_FORMATS = {'JPEG', 'PNG', 'WEBP', 'GIF', 'BMP', 'MPO'}
+
+class ImageRejected(Exception):
+    """Raised when an upload is not an acceptable image"""
+    pass
+
+class UploadSizeLimitHandler(FileUploadHandler):
+    """Abort file uploads that exceed MAX_IMAGE_UPLOAD_SIZE while they stream in
+
+    Sits in front of Django's default handlers and passes every chunk on
+    unchanged, so oversize uploads are cut off without being buffered.
+    """
+    def new_file(self, *args, **kwargs):
+        super().new_file(*args, **kwargs)
+        self.received = 0
+        self.limit = getattr(settings, 'MAX_IMAGE_UPLOAD_SIZE', DEFAULT_MAX_UPLOAD_SIZE)
+
+    def receive_data_chunk(self, raw_data, start):
+        self.received += len(raw_data)
+        if self.received > self.limit:
+            raise StopUpload(connection_reset=True)
+        return raw_data
+
+    def file_complete(self, file_size):
+        return None
+
+def inspect_image(image_file):
+    """Check an upload from its header only and return (format, width, height)
+
+    Image.open reads just the header, so oversize and decompression-bomb
+    images are rejected before any pixel data is decoded.
+    """
+    max_size = getattr(settings, 'MAX_IMAGE_UPLOAD_SIZE', DEFAULT_MAX_UPLOAD_SIZE)
+    max_pixels = getattr(settings, 'MAX_IMAGE_PIXELS', DEFAULT_MAX_IMAGE_PIXELS)
+
+    size = getattr(image_file, 'size', None)
+    if size is not None and size > max_size:
+        raise ImageRejected(f'Image files must be smaller than {max_size // (1024 * 1024)} MB.')
+
+    try:
+        image_file.seek(0)
+        with Image.open(image_file) as img:
+            image_format, (width, height) = img.format, img.size
+    except (Image.DecompressionBombError, OSError, SyntaxError, ValueError):
+        raise ImageRejected('Upload a valid image.')
+    finally:
+        image_file.seek(0)
+
+    if image_format not in ALLOWED_IMAGE_FORMATS:
+        raise ImageRejected(f'{image_format} images are not supported.')
+    if width * height > max_pixels:
+        raise ImageRejected(f'Images must be at most {max_pixels // 1_000_000} megapixels.')
+
+    return image_format, width, height
+
+def normalize_image(image_file):
+    """Return an upload ready to store: EXIF-rotated and capped in size
+
+    Images within MAX_STORED_IMAGE_DIMENSION with no EXIF rotation are kept
+    as uploaded. Larger JPEGs are decoded at a reduced DCT scale (draft
+    mode), so even a 48 MP photo never expands to full resolution in memory.
+    """
+    max_dimension = getattr(settings, 'MAX_STORED_IMAGE_DIMENSION', DEFAULT_MAX_STORED_DIMENSION)
+
+    image_file.seek(0)
+    with Image.open(image_file) as img:
+        orientation = img.getexif().get(0x0112, 1)
+        if max(img.size) <= max_dimension and orientation == 1:
+            image_file.seek(0)
+            return image_file
+
+        image_format = img.format
+        img.draft('RGB', (max_dimension, max_dimension))
+        img.thumbnail((max_dimension, max_dimension), Image.LANCZOS)
+        img = ImageOps.exif_transpose(img)
+
+        if image_format not in ('PNG', 'GIF') and img.mode != 'RGB':
+            img = img.convert('RGB')
+        if image_format in ('MPO', 'BMP'):
+            image_format = 'JPEG'
+
+        buffer = io.BytesIO()
+        save_kwargs = {'quality': 90, 'optimize': True} if image_format in ('JPEG', 'WEBP') else {}
+        img.save(buffer, format=image_format, **save_kwargs)
+
+    extension = '.jpg' if image_format == 'JPEG' else f'.{image_format.lower()}'
+    name = os.path.splitext(os.path.basename(image_file.name))[0] + extension
+    return ContentFile(buffer.getvalue(), name=name)
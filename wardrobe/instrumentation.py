@@ -0,0 +1,259 @@
+import cProfile
+import itertools
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction, sync_to_async
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from django.template.backends.django import DjangoTemplates, Template
+from .metrics import registry, DURATION_BUCKETS_MS, COUNT_BUCKETS
+
+# Profiling defaults, overridable from settings
+DEFAULT_PROFILE_SAMPLE_RATE = 0  # Profile 1 in N requests; 0 turns profiling off
+DEFAULT_PROFILE_DIR = 'profiles'
+
+# Timings of the request being handled in the current thread or task
+_current = ContextVar('request_timings', default=None)
+
+# Budgets registered by query_budgets() blocks that are currently open
+_active_budgets = []
+
+class QueryBudgetExceeded(AssertionError):
+    """Raised when a view runs more queries than its declared budget"""
+    pass
+
+class RequestTimings:
+    """Query count and time split of a single request"""
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = 0
+        self.sql_time = 0.0
+        self.template_time = 0.0  # Excludes SQL run while rendering
+        self.total_time = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        """Database execute wrapper counting every query"""
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.sql_time += time.perf_counter() - start
+            self.queries += 1
+
+    def finish(self):
+        self.total_time = time.perf_counter() - self.started
+
+    @property
+    def python_time(self):
+        return max(self.total_time - self.sql_time - self.template_time, 0.0)
+
+    def server_timing(self):
+        """Value for the Server-Timing response header"""
+        return ', '.join([
+            f'db;dur={self.sql_time * 1000:.1f};desc="{self.queries} queries"',
+            f'tpl;dur={self.template_time * 1000:.1f}',
+            f'app;dur={self.python_time * 1000:.1f}',
+            f'total;dur={self.total_time * 1000:.1f}',
+        ])
+
+def _execute_wrapper(execute, sql, params, many, context):
+    """Count a query against the request it runs for, if any"""
+    timings = _current.get()
+    if timings is None:
+        return execute(sql, params, many, context)
+    return timings(execute, sql, params, many, context)
+
+@receiver(connection_created)
+def install_execute_wrapper(sender, connection, **kwargs):
+    """Time every query on every connection
+
+    Installed per connection rather than per request because async views
+    run their queries on sync_to_async threads with their own connections;
+    the request's timings reach those threads through the context variable.
+    """
+    if _execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(_execute_wrapper)
+
+class TimedTemplate(Template):
+    """Django template that adds its render time to the current request's timings"""
+    def render(self, context=None, request=None):
+        timings = _current.get()
+        if timings is None:
+            return super().render(context, request)
+
+        start, sql_before = time.perf_counter(), timings.sql_time
+        try:
+            return super().render(context, request)
+        finally:
+            elapsed = time.perf_counter() - start
+            timings.template_time += elapsed - (timings.sql_time - sql_before)
+
+class TimedDjangoTemplates(DjangoTemplates):
+    """DjangoTemplates backend whose templates report their render time"""
+    def from_string(self, template_code):
+        return TimedTemplate(self.engine.from_string(template_code), self)
+
+    def get_template(self, template_name):
+        template = super().get_template(template_name)
+        return TimedTemplate(template.template, self)
+
+def _view_name(request):
+    match = getattr(request, 'resolver_match', None)
+    return match.view_name if match else 'unresolved'
+
+def record_request(view_name, timings):
+    """Add a finished request to the per-view histograms and check budgets"""
+    registry.observe('request_queries', timings.queries, COUNT_BUCKETS, view=view_name)
+    registry.observe('request_sql_ms', timings.sql_time * 1000, DURATION_BUCKETS_MS, view=view_name)
+    registry.observe('request_template_ms', timings.template_time * 1000, DURATION_BUCKETS_MS, view=view_name)
+    registry.observe('request_python_ms', timings.python_time * 1000, DURATION_BUCKETS_MS, view=view_name)
+    registry.observe('request_total_ms', timings.total_time * 1000, DURATION_BUCKETS_MS, view=view_name)
+
+    for budgets, violations in _active_budgets:
+        if view_name in budgets and timings.queries > budgets[view_name]:
+            violations.append((view_name, timings.queries, budgets[view_name]))
+
+    if getattr(settings, 'QUERY_BUDGET_ENFORCE', False):
+        budget = getattr(settings, 'VIEW_QUERY_BUDGETS', {}).get(view_name)
+        if budget is not None and timings.queries > budget:
+            raise QueryBudgetExceeded(f'{view_name} ran {timings.queries} queries (budget {budget})')
+
+class RequestTimingMiddleware:
+    """Record query count, SQL, template and Python time per resolved view
+
+    Adds a Server-Timing header to every response and feeds the per-view
+    histograms in wardrobe.metrics.registry.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        if not getattr(settings, 'REQUEST_TIMING_ENABLED', True):
+            return self.get_response(request)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = self.get_response(request)
+            # Template responses render after the view returns
+            if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+                response.render()
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    async def __acall__(self, request):
+        if not getattr(settings, 'REQUEST_TIMING_ENABLED', True):
+            return await self.get_response(request)
+
+        timings = RequestTimings()
+        token = _current.set(timings)
+        try:
+            response = await self.get_response(request)
+            if hasattr(response, 'render') and not getattr(response, 'is_rendered', True):
+                await sync_to_async(response.render)()
+        finally:
+            _current.reset(token)
+        return self.finish(request, response, timings)
+
+    def finish(self, request, response, timings):
+        timings.finish()
+        response['Server-Timing'] = timings.server_timing()
+        record_request(_view_name(request), timings)
+        return response
+
+class ProfilingMiddleware:
+    """Run cProfile on 1 in PROFILE_SAMPLE_RATE requests and dump the stats to PROFILE_DIR
+
+    Each dump is named <view>-<timestamp>-<pid>.prof; open it with pstats
+    or snakeviz. cProfile follows a single thread, so requests to async
+    views are passed through unprofiled.
+    """
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.rate = getattr(settings, 'PROFILE_SAMPLE_RATE', DEFAULT_PROFILE_SAMPLE_RATE)
+        if not self.rate:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.directory = getattr(settings, 'PROFILE_DIR', os.path.join(settings.BASE_DIR, DEFAULT_PROFILE_DIR))
+        self.counter = itertools.count()
+        if iscoroutinefunction(get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.get_response(request)
+        if next(self.counter) % self.rate:
+            return self.get_response(request)
+
+        profiler = cProfile.Profile()
+        profiler.enable()
+        try:
+            return self.get_response(request)
+        finally:
+            profiler.disable()
+            self.dump(request, profiler)
+
+    def dump(self, request, profiler):
+        os.makedirs(self.directory, exist_ok=True)
+        name = _view_name(request).replace(':', '_').replace('/', '_')
+        profiler.dump_stats(os.path.join(self.directory, f'{name}-{time.time():.6f}-{os.getpid()}.prof'))
+
+@contextmanager
+def query_budgets(budgets):
+    """Fail if any request handled inside the block exceeds its view's query budget
+
+    budgets maps URL names to the maximum number of queries, e.g. in a test:
+
+        with query_budgets({'dashboard': 6, 'outfit-suggestions': 5}):
+            self.client.get(reverse('dashboard'))
+
+    Raises QueryBudgetExceeded on exit, listing every offending request.
+    """
+    entry = (dict(budgets), [])
+    _active_budgets.append(entry)
+    try:
+        yield entry[1]
+    finally:
+        _active_budgets.remove(entry)
+
+    if entry[1]:
+        details = '; '.join(f'{view} ran {queries} queries (budget {budget})' for view, queries, budget in entry[1])
+        raise QueryBudgetExceeded(details)
+
+class QueryPlanError(AssertionError):
+    """Raised when a query does not use the index it was designed for"""
+    pass
+
+def query_plan_problems(queryset, index_name):
+    """Problems with how the database would run queryset, as a list of strings
+
+    Checks the EXPLAIN output names index_name and, on SQLite, that ordering
+    does not fall back to a temporary B-tree sort.
+    """
+    plan = queryset.explain()
+    problems = []
+    if index_name not in plan:
+        problems.append(f'does not use {index_name}')
+    if 'TEMP B-TREE FOR ORDER BY' in plan:
+        problems.append('sorts in a temporary B-tree')
+    return [f'{problem}:\n{plan}' for problem in problems]
+
+def assert_uses_index(queryset, index_name):
+    """Test helper failing when queryset's plan does not use index_name"""
+    problems = query_plan_problems(queryset, index_name)
+    if problems:
+        raise QueryPlanError('\n'.join(problems))
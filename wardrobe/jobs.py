@@ -0,0 +1,116 @@
+from datetime import timedelta
+from django.conf import settings
+from django.db import transaction
+from django.db.models import Count
+from django.utils import timezone
+from .features import save_item_features
+from .models import AnalysisJob, ClothingItem, JOB_STATUS_CHOICES, STATS_FIELDS
+from .stats import apply_item_changes
+
+# Queue defaults, overridable from settings
+DEFAULT_QUEUE_MAX_DEPTH = 500
+DEFAULT_MAX_ATTEMPTS = 3
+DEFAULT_RETRY_DELAY = 30  # seconds, doubled on every attempt
+DEFAULT_STALE_AFTER = 600  # seconds before a running job is considered abandoned
+
+class AnalysisQueueFull(Exception):
+    """Raised when the analysis queue has reached its configured depth"""
+    pass
+
+def queue_depth():
+    """Number of jobs waiting for or currently being processed"""
+    return AnalysisJob.objects.filter(status__in=['queued', 'running']).count()
+
+def enqueue_analysis(item):
+    """Queue background image analysis for a saved clothing item"""
+    max_depth = getattr(settings, 'ANALYSIS_QUEUE_MAX_DEPTH', DEFAULT_QUEUE_MAX_DEPTH)
+    if queue_depth() >= max_depth:
+        raise AnalysisQueueFull(f'Analysis queue is full ({max_depth} jobs)')
+
+    with transaction.atomic():
+        ClothingItem.objects.filter(pk=item.pk).update(analysis_status='pending')
+        item.analysis_status = 'pending'
+        return AnalysisJob.objects.create(
+            item=item,
+            max_attempts=getattr(settings, 'ANALYSIS_JOB_MAX_ATTEMPTS', DEFAULT_MAX_ATTEMPTS),
+        )
+
+def claim_jobs(worker_id, limit):
+    """Claim up to limit runnable jobs for this worker
+
+    SQLite has no SELECT ... FOR UPDATE SKIP LOCKED, so each job is claimed
+    with a conditional UPDATE; a job another worker got to first is skipped.
+    """
+    now = timezone.now()
+    candidate_ids = list(
+        AnalysisJob.objects.filter(status='queued', run_after__lte=now)
+        .order_by('run_after', 'id')
+        .values_list('id', flat=True)[:limit]
+    )
+
+    claimed = []
+    for job_id in candidate_ids:
+        updated = AnalysisJob.objects.filter(pk=job_id, status='queued').update(
+            status='running', locked_by=worker_id, locked_at=now
+        )
+        if updated:
+            claimed.append(job_id)
+
+    return list(AnalysisJob.objects.filter(pk__in=claimed).select_related('item'))
+
+def complete_job(job, results):
+    """Store analysis results and features on the item and mark the job done"""
+    item = job.item
+    update_fields = {'analysis_status': 'complete'}
+    if results.get('color'):
+        update_fields['color'] = results['color']
+    if results.get('pattern'):
+        update_fields['pattern'] = results['pattern']
+
+    with transaction.atomic():
+        ClothingItem.objects.filter(pk=item.pk).update(**update_fields)
+        # Queryset updates send no signals, so move the item's stats counts here
+        previous = {field: getattr(item, field) for field in STATS_FIELDS}
+        current = {field: update_fields.get(field, value) for field, value in previous.items()}
+        if current != previous:
+            apply_item_changes(item.user_id, removed=[previous], added=[current])
+        save_item_features(item, results)
+        AnalysisJob.objects.filter(pk=job.pk).update(
+            status='done', attempts=job.attempts + 1, last_error='',
+            locked_by='', locked_at=None, date_finished=timezone.now()
+        )
+
+def fail_job(job, error):
+    """Record a failed attempt, scheduling a retry with exponential backoff"""
+    attempts = job.attempts + 1
+    now = timezone.now()
+
+    if attempts >= job.max_attempts:
+        with transaction.atomic():
+            ClothingItem.objects.filter(pk=job.item_id).update(analysis_status='failed')
+            AnalysisJob.objects.filter(pk=job.pk).update(
+                status='failed', attempts=attempts, last_error=str(error),
+                locked_by='', locked_at=None, date_finished=now
+            )
+        return
+
+    delay = getattr(settings, 'ANALYSIS_JOB_RETRY_DELAY', DEFAULT_RETRY_DELAY) * 2 ** (attempts - 1)
+    AnalysisJob.objects.filter(pk=job.pk).update(
+        status='queued', attempts=attempts, last_error=str(error),
+        locked_by='', locked_at=None, run_after=now + timedelta(seconds=delay)
+    )
+
+def requeue_stale_jobs():
+    """Put jobs left running by a crashed worker back on the queue"""
+    stale_after = getattr(settings, 'ANALYSIS_JOB_STALE_AFTER', DEFAULT_STALE_AFTER)
+    cutoff = timezone.now() - timedelta(seconds=stale_after)
+    return AnalysisJob.objects.filter(status='running', locked_at__lt=cutoff).update(
+        status='queued', locked_by='', locked_at=None
+    )
+
+def job_counts():
+    """Count jobs per status for monitoring"""
+    counts = {status: 0 for status, _ in JOB_STATUS_CHOICES}
+    for row in AnalysisJob.objects.values('status').annotate(total=Count('id')):
+        counts[row['status']] = row['total']
+    return counts
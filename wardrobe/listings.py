@@ -0,0 +1,81 @@
+from django.db.models import Prefetch
+from .models import ClothingItem, Outfit, SavedOutfit
+from .renditions import rendition_url
+
+# Columns each listing renders; everything else stays deferred. Serializers
+# below only read these, so serializing a page never triggers extra queries.
+ITEM_SUMMARY_FIELDS = ('id', 'name', 'category', 'color', 'pattern', 'season', 'image', 'image_hash')
+ITEM_LIST_FIELDS = ITEM_SUMMARY_FIELDS + ('user', 'date_added', 'favorite', 'analysis_status')
+OUTFIT_LIST_FIELDS = ('id', 'user', 'name', 'occasion', 'season', 'style', 'ai_score', 'date_created')
+SAVED_OUTFIT_LIST_FIELDS = ('id', 'user', 'outfit', 'date_saved')
+SUGGESTION_ITEM_FIELDS = ('id', 'user', 'name', 'category', 'color', 'pattern', 'season')  # Read by the recommender
+
+LIST_RENDITION_SIZE = 256
+
+def outfit_items_prefetch(lookup='items'):
+    """Prefetch an outfit relation's items in one query, loading only summary columns"""
+    return Prefetch(lookup, queryset=ClothingItem.objects.only(*ITEM_SUMMARY_FIELDS).order_by('id'))
+
+def item_listing(user):
+    """A user's clothing items with the columns item listings show"""
+    return ClothingItem.objects.filter(user=user).only(*ITEM_LIST_FIELDS)
+
+def outfit_listing(user):
+    """A user's outfits with their items, in two queries per page"""
+    return (Outfit.objects.filter(user=user)
+            .only(*OUTFIT_LIST_FIELDS)
+            .prefetch_related(outfit_items_prefetch()))
+
+def saved_outfit_listing(user, with_items=True):
+    """A user's saved outfits joined to their outfits, plus one query for the items"""
+    saved = (SavedOutfit.objects.filter(user=user)
+             .select_related('outfit')
+             .only(*SAVED_OUTFIT_LIST_FIELDS, *[f'outfit__{field}' for field in OUTFIT_LIST_FIELDS]))
+    if with_items:
+        saved = saved.prefetch_related(outfit_items_prefetch('outfit__items'))
+    return saved
+
+# Serializable fields of each listing, and the ones sent when a client asks for none.
+# Nested items are kept to ids and image URLs; clients fetch full items separately.
+ITEM_FIELDS = {
+    'id': lambda item: item.id,
+    'name': lambda item: item.name,
+    'category': lambda item: item.category,
+    'color': lambda item: item.color,
+    'pattern': lambda item: item.pattern,
+    'season': lambda item: item.season,
+    'image': lambda item: rendition_url(item, LIST_RENDITION_SIZE),
+    'date_added': lambda item: item.date_added.isoformat(),
+    'favorite': lambda item: item.favorite,
+    'analysis_status': lambda item: item.analysis_status,
+}
+OUTFIT_FIELDS = {
+    'id': lambda outfit: outfit.id,
+    'name': lambda outfit: outfit.name,
+    'occasion': lambda outfit: outfit.occasion,
+    'season': lambda outfit: outfit.season,
+    'style': lambda outfit: outfit.style,
+    'ai_score': lambda outfit: outfit.ai_score,
+    'date_created': lambda outfit: outfit.date_created.isoformat(),
+    'items': lambda outfit: [serialize_item(item, OUTFIT_ITEM_FIELDS) for item in outfit.items.all()],
+}
+SAVED_OUTFIT_FIELDS = {
+    'id': lambda saved: saved.id,
+    'date_saved': lambda saved: saved.date_saved.isoformat(),
+    'outfit': lambda saved: serialize_outfit(saved.outfit),
+}
+DEFAULT_ITEM_FIELDS = ('id', 'name', 'category', 'color', 'pattern', 'season', 'image')
+DEFAULT_OUTFIT_FIELDS = ('id', 'name', 'occasion', 'season', 'style', 'ai_score', 'items')
+DEFAULT_SAVED_OUTFIT_FIELDS = ('id', 'date_saved', 'outfit')
+OUTFIT_ITEM_FIELDS = ('id', 'image')
+
+def serialize_item(item, fields=DEFAULT_ITEM_FIELDS):
+    """Compact dict for an item loaded by item_listing or outfit_items_prefetch"""
+    return {name: ITEM_FIELDS[name](item) for name in fields}
+
+def serialize_outfit(outfit, fields=DEFAULT_OUTFIT_FIELDS):
+    """Compact dict for an outfit loaded by outfit_listing or saved_outfit_listing"""
+    return {name: OUTFIT_FIELDS[name](outfit) for name in fields}
+
+def serialize_saved_outfit(saved, fields=DEFAULT_SAVED_OUTFIT_FIELDS):
+    return {name: SAVED_OUTFIT_FIELDS[name](saved) for name in fields}
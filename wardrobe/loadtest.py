@@ -0,0 +1,327 @@
+import asyncio
+import hashlib
+import random
+import threading
+import time
+from collections import defaultdict
+import numpy as np
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import OperationalError, connections, transaction
+from django.test import AsyncClient, Client
+from django.test.utils import override_settings
+from django.urls import reverse
+from .benchmarks import synthetic_image
+from .ml_utils import generate_outfit_suggestions
+from .models import (UserProfile, StylePreference, ClothingItem, Outfit, SavedOutfit, choice_mask,
+                     CATEGORY_CHOICES, COLOR_CHOICES, PATTERN_CHOICES, SEASON_CHOICES, OCCASION_CHOICES, STYLE_CHOICES)
+from .persistence import save_outfit_suggestions
+from .preferences import Preferences
+from .stats import rebuild_wardrobe_stats
+
+LOAD_USER_PREFIX = 'loaduser'
+LOAD_USER_PASSWORD = 'load-test-password'
+IMAGE_VARIANTS = 16  # Distinct seeded images, shared between items
+IMAGE_DIR = 'clothing_items/loadtest'
+
+# Share of requests per view in the replayed traffic
+DEFAULT_VIEW_MIX = {
+    'dashboard': 30,
+    'wardrobe_home': 35,
+    'outfit_detail': 20,
+    'generate_suggestions': 10,
+    'add_item': 5,
+}
+
+def _values(choices):
+    return [value for value, _ in choices]
+
+def _is_error(status):
+    return status >= 400 if isinstance(status, int) else status != 'ok'
+
+def seed_images(size=256):
+    """Store the shared seed images once; returns [(name, sha256)]"""
+    images = []
+    for i in range(IMAGE_VARIANTS):
+        data = synthetic_image(size, size * 4 // 3, seed=i)
+        name = f'{IMAGE_DIR}/variant-{size}-{i}.jpg'
+        if not default_storage.exists(name):
+            name = default_storage.save(name, ContentFile(data))
+        images.append((name, hashlib.sha256(data).hexdigest()))
+    return images
+
+def seed_users(count, items_per_user, outfits_per_user, saved_per_user, image_size=256,
+               prefix=LOAD_USER_PREFIX, password=LOAD_USER_PASSWORD, seed=0, progress=None):
+    """Create count users named prefix00000... with wardrobes, outfits and saved outfits
+
+    Users that already exist are left alone, so seeding can be re-run to
+    top up. Rows are bulk inserted one user per transaction; items share a
+    small set of stored images. Returns the number of users created.
+    """
+    rng = random.Random(seed)
+    images = seed_images(image_size)
+    usernames = [f'{prefix}{n:05d}' for n in range(count)]
+    existing = set(User.objects.filter(username__in=usernames).values_list('username', flat=True))
+    password_hash = make_password(password)  # Hashing is slow; every load user shares one
+
+    created = 0
+    for username in usernames:
+        if username in existing:
+            continue
+        with transaction.atomic():
+            user = User.objects.create(username=username, email=f'{username}@example.com', password=password_hash)
+            UserProfile.objects.create(user=user)
+            style_prefs = StylePreference.objects.create(
+                user=user,
+                favorite_color_mask=choice_mask(rng.sample(_values(COLOR_CHOICES), 3), COLOR_CHOICES),
+                pattern_mask=choice_mask(rng.sample(_values(PATTERN_CHOICES), 2), PATTERN_CHOICES),
+                season_mask=choice_mask(rng.sample(_values(SEASON_CHOICES)[:4], 2), SEASON_CHOICES),
+                occasion_mask=choice_mask(rng.sample(_values(OCCASION_CHOICES), 2), OCCASION_CHOICES),
+                style_preference=rng.choice(_values(STYLE_CHOICES)),
+            )
+
+            items = []
+            for i in range(items_per_user):
+                image_name, image_hash = rng.choice(images)
+                items.append(ClothingItem(
+                    user=user, name=f'Item {i + 1}', image=image_name, image_hash=image_hash,
+                    category=rng.choice(_values(CATEGORY_CHOICES)), color=rng.choice(_values(COLOR_CHOICES)),
+                    pattern=rng.choice(_values(PATTERN_CHOICES)), season=rng.choice(_values(SEASON_CHOICES)),
+                    analysis_status='complete',
+                ))
+            ClothingItem.objects.bulk_create(items)
+            rebuild_wardrobe_stats(user.pk)
+
+            suggestions = generate_outfit_suggestions(items, Preferences.from_model(style_prefs),
+                                                      num_suggestions=outfits_per_user, random_state=rng.getrandbits(32))
+            outfit_ids = save_outfit_suggestions(user, suggestions)['created']
+            SavedOutfit.objects.bulk_create([SavedOutfit(user=user, outfit_id=outfit_id)
+                                             for outfit_id in outfit_ids[:saved_per_user]])
+        created += 1
+        if progress:
+            progress(created)
+    return created
+
+def clear_users(prefix=LOAD_USER_PREFIX):
+    """Delete every load test user along with their wardrobes"""
+    deleted, _ = User.objects.filter(username__startswith=prefix).delete()
+    return deleted
+
+class LoadResults:
+    """Latencies and statuses of replayed requests, per view"""
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.latencies = defaultdict(list)
+        self.statuses = defaultdict(lambda: defaultdict(int))
+        self.started = self.finished = None
+
+    def record(self, view, status, seconds):
+        with self.lock:
+            self.latencies[view].append(seconds * 1000)
+            self.statuses[view][status] += 1
+
+    def summary(self):
+        """Per-view count, error count, p50/p95/p99 ms and requests per second"""
+        elapsed = max((self.finished or time.perf_counter()) - self.started, 1e-9)
+        rows = {}
+        for view in sorted(self.latencies):
+            ms = np.array(self.latencies[view])
+            errors = sum(count for status, count in self.statuses[view].items() if _is_error(status))
+            rows[view] = {
+                'requests': len(ms),
+                'errors': errors,
+                'p50_ms': float(np.percentile(ms, 50)),
+                'p95_ms': float(np.percentile(ms, 95)),
+                'p99_ms': float(np.percentile(ms, 99)),
+                'throughput': len(ms) / elapsed,
+                'statuses': {str(status): count for status, count in sorted(self.statuses[view].items(), key=str)},
+            }
+        return {'elapsed_s': elapsed, 'views': rows}
+
+class VirtualUser:
+    """A seeded user's session and the requests it replays"""
+    def __init__(self, username, outfit_ids, rng, view_mix, upload):
+        self.username = username
+        self.outfit_ids = outfit_ids
+        self.rng = rng
+        self.views, self.weights = zip(*view_mix.items())
+        self.upload = upload
+
+    def next_request(self):
+        """(view, method, path, data) of the next request to send"""
+        view = self.rng.choices(self.views, self.weights)[0]
+        if view == 'outfit_detail' and not self.outfit_ids:
+            view = 'dashboard'
+
+        if view == 'dashboard':
+            return view, 'get', reverse('dashboard'), None
+        if view == 'wardrobe_home':
+            data = {'category': self.rng.choice(_values(CATEGORY_CHOICES))} if self.rng.random() < 0.3 else None
+            return view, 'get', reverse('wardrobe-home'), data
+        if view == 'outfit_detail':
+            return view, 'get', reverse('outfit-detail', kwargs={'pk': self.rng.choice(self.outfit_ids)}), None
+        if view == 'generate_suggestions':
+            return view, 'get', reverse('generate-suggestions'), None
+        if view == 'add_item':
+            return view, 'post', reverse('add-item'), {
+                'name': 'Load test item', 'category': self.rng.choice(_values(CATEGORY_CHOICES)),
+                'color': self.rng.choice(_values(COLOR_CHOICES)), 'pattern': self.rng.choice(_values(PATTERN_CHOICES)),
+                'season': self.rng.choice(_values(SEASON_CHOICES)), 'description': '',
+                'image': SimpleUploadedFile('load.jpg', self.upload, 'image/jpeg'),
+            }
+        raise ValueError(f'Unknown view {view}')
+
+def load_virtual_users(count, prefix=LOAD_USER_PREFIX, view_mix=None, seed=0):
+    """Virtual users for the first count seeded users, each with its outfit ids"""
+    users = list(User.objects.filter(username__startswith=prefix).order_by('username')[:count])
+    if not users:
+        raise ValueError(f'No users named {prefix}*; run seed_load_data first')
+    outfits = defaultdict(list)
+    for user_id, outfit_id in Outfit.objects.filter(user__in=users).values_list('user_id', 'id'):
+        outfits[user_id].append(outfit_id)
+    upload = synthetic_image(320, 427, seed=seed)
+    return [VirtualUser(user.username, outfits[user.pk], random.Random(seed + i), view_mix or DEFAULT_VIEW_MIX, upload)
+            for i, user in enumerate(users)]
+
+def _test_host():
+    """Allow the test clients' Host header (AsyncClient always sends 'testserver')"""
+    return override_settings(ALLOWED_HOSTS=[*settings.ALLOWED_HOSTS, 'testserver'])
+
+def _login(virtual_user, password):
+    client = Client(raise_request_exception=False)
+    if not client.login(username=virtual_user.username, password=password):
+        raise ValueError(f'Could not log in as {virtual_user.username}')
+    return client
+
+@_test_host()
+def run_wsgi_load(virtual_users, concurrency, duration, password=LOAD_USER_PASSWORD):
+    """Replay requests through the WSGI request handler from concurrency threads for duration seconds"""
+    results = LoadResults()
+    clients = [_login(virtual_users[i % len(virtual_users)], password) for i in range(concurrency)]
+    connections.close_all()
+    deadline = None
+
+    def worker(i):
+        virtual_user, client = virtual_users[i % len(virtual_users)], clients[i]
+        try:
+            while time.perf_counter() < deadline:
+                view, method, path, data = virtual_user.next_request()
+                start = time.perf_counter()
+                try:
+                    status = getattr(client, method)(path, data).status_code
+                except Exception:
+                    status = 'error'
+                results.record(view, status, time.perf_counter() - start)
+        finally:
+            connections.close_all()
+
+    threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+    results.started = time.perf_counter()
+    deadline = results.started + duration
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.finished = time.perf_counter()
+    return results
+
+@_test_host()
+def run_asgi_load(virtual_users, concurrency, duration, password=LOAD_USER_PASSWORD):
+    """Replay requests through the ASGI request handler from concurrency tasks for duration seconds"""
+    results = LoadResults()
+    # Log in synchronously, then hand each session cookie to an async client
+    sessions = [_login(virtual_users[i % len(virtual_users)], password).cookies for i in range(concurrency)]
+    connections.close_all()
+
+    async def worker(i, deadline):
+        virtual_user = virtual_users[i % len(virtual_users)]
+        client = AsyncClient(raise_request_exception=False)
+        client.cookies = sessions[i]
+        while time.perf_counter() < deadline:
+            view, method, path, data = virtual_user.next_request()
+            start = time.perf_counter()
+            try:
+                status = (await getattr(client, method)(path, data)).status_code
+            except Exception:
+                status = 'error'
+            results.record(view, status, time.perf_counter() - start)
+
+    async def main():
+        results.started = time.perf_counter()
+        await asyncio.gather(*[worker(i, results.started + duration) for i in range(concurrency)])
+        results.finished = time.perf_counter()
+        await sync_to_async(connections.close_all)()
+
+    asyncio.run(main())
+    return results
+
+def run_write_contention(users, writers, readers, duration, seed=0):
+    """Hammer the database from writers and readers threads for duration seconds
+
+    Writers alternate between the two write paths that overlap in
+    production: adding an item (insert plus the stats update from the
+    post_save signal) and saving generated outfits. Readers run wardrobe
+    listing queries. Each thread works on users[i % len(users)], so with
+    fewer users than threads they contend on the same stats rows. Results
+    are keyed by operation with status 'ok', 'locked' (the database
+    refused the lock) or 'error'.
+    """
+    results = LoadResults()
+    connections.close_all()
+    deadline = None
+
+    def add_item(rng, user, items):
+        item = ClothingItem.objects.create(
+            user=user, name='Contention item', image=f'{IMAGE_DIR}/contention.jpg',
+            category=rng.choice(_values(CATEGORY_CHOICES)), color=rng.choice(_values(COLOR_CHOICES)),
+            pattern=rng.choice(_values(PATTERN_CHOICES)), season=rng.choice(_values(SEASON_CHOICES)),
+            analysis_status='complete',
+        )
+        items.append(item.pk)
+
+    def save_outfits(rng, user, items):
+        if len(items) < 3:
+            return add_item(rng, user, items)
+        save_outfit_suggestions(user, [{
+            'name': 'Contention outfit', 'occasion': rng.choice(_values(OCCASION_CHOICES)),
+            'season': rng.choice(_values(SEASON_CHOICES)), 'style': rng.choice(_values(STYLE_CHOICES)),
+            'style_notes': '', 'ai_score': rng.random(), 'items': rng.sample(items, 3),
+        }])
+
+    def read(rng, user, items):
+        list(ClothingItem.objects.filter(user=user).order_by('-date_added')[:24])
+        list(Outfit.objects.filter(user=user).order_by('-date_created')[:12])
+
+    def worker(i, operations):
+        rng, user = random.Random(seed + i), users[i % len(users)]
+        items = list(ClothingItem.objects.filter(user=user).values_list('pk', flat=True)[:50])
+        try:
+            while time.perf_counter() < deadline:
+                operation = rng.choice(operations)
+                start = time.perf_counter()
+                try:
+                    operation(rng, user, items)
+                    status = 'ok'
+                except OperationalError as e:
+                    status = 'locked' if 'locked' in str(e) else 'error'
+                except Exception:
+                    status = 'error'
+                results.record(operation.__name__, status, time.perf_counter() - start)
+        finally:
+            connections.close_all()
+
+    threads = ([threading.Thread(target=worker, args=(i, [add_item, save_outfits])) for i in range(writers)] +
+               [threading.Thread(target=worker, args=(writers + i, [read])) for i in range(readers)])
+    results.started = time.perf_counter()
+    deadline = results.started + duration
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    results.finished = time.perf_counter()
+    return results
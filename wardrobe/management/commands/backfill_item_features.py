@@ -0,0 +1,30 @@
+from django.core.management.base import BaseCommand
+from wardrobe.features import save_item_features
+from wardrobe.ml_utils import analyze_image, EMBEDDING_VERSION
+from wardrobe.models import ClothingItem
+
+class Command(BaseCommand):
+    help = 'Extract and store image features for items that have none for the current embedding version'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only process items of this username')
+
+    def handle(self, *args, **options):
+        items = (ClothingItem.objects.exclude(image='')
+                 .exclude(features__embedding_version=EMBEDDING_VERSION)
+                 .order_by('pk'))
+        if options['user']:
+            items = items.filter(user__username=options['user'])
+
+        saved, failed = 0, 0
+        for item in items.iterator():
+            # Only the features are stored; the item's color and pattern are left as they are
+            with item.image.open('rb') as f:
+                results = analyze_image(f)
+            if save_item_features(item, results):
+                saved += 1
+            else:
+                failed += 1
+                self.stderr.write(f'Could not extract features for item {item.pk}')
+
+        self.stdout.write(f'Stored features for {saved} items ({failed} failed)')
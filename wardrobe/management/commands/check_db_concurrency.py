@@ -0,0 +1,63 @@
+import json
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from wardrobe.loadtest import seed_users, clear_users, run_write_contention
+
+class Command(BaseCommand):
+    help = ('Run parallel writers (item uploads, outfit saves) and readers against the configured database '
+            'and fail if any of them hit "database is locked"')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--writers', type=int, default=8, help='Writing threads')
+        parser.add_argument('--readers', type=int, default=4, help='Reading threads')
+        parser.add_argument('--duration', type=float, default=10.0, help='Seconds to run for')
+        parser.add_argument('--users', type=int, default=2,
+                            help='Users the threads share; fewer users means more contention on the same rows')
+        parser.add_argument('--prefix', default='dbcheck', help='Username prefix of the temporary users')
+        parser.add_argument('--keep', action='store_true', help='Keep the temporary users and their rows')
+        parser.add_argument('--output', help='Also write the summary as JSON to this file')
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.describe_database())
+        clear_users(options['prefix'])
+        seed_users(options['users'], items_per_user=10, outfits_per_user=2, saved_per_user=0, prefix=options['prefix'])
+        try:
+            users = list(User.objects.filter(username__startswith=options['prefix']).order_by('username'))
+            self.stdout.write(f'{options["writers"]} writers and {options["readers"]} readers on {len(users)} users '
+                              f'for {options["duration"]:.0f}s')
+            summary = run_write_contention(users, options['writers'], options['readers'], options['duration']).summary()
+        finally:
+            if not options['keep']:
+                clear_users(options['prefix'])
+
+        self.stdout.write(f'\n{"operation":<14} {"count":>7} {"errors":>7} {"p50 ms":>9} {"p95 ms":>9} '
+                          f'{"p99 ms":>9} {"ops/s":>8}  statuses')
+        for operation, row in summary['views'].items():
+            statuses = ' '.join(f'{status}:{count}' for status, count in row['statuses'].items())
+            self.stdout.write(f'{operation:<14} {row["requests"]:>7} {row["errors"]:>7} {row["p50_ms"]:>9.1f} '
+                              f'{row["p95_ms"]:>9.1f} {row["p99_ms"]:>9.1f} {row["throughput"]:>8.1f}  {statuses}')
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(summary, f, indent=2)
+
+        locked = sum(row['statuses'].get('locked', 0) for row in summary['views'].values())
+        errors = sum(row['errors'] for row in summary['views'].values())
+        if locked:
+            raise CommandError(f'{locked} operations failed with "database is locked"')
+        if errors:
+            raise CommandError(f'{errors} operations failed')
+        self.stdout.write(self.style.SUCCESS('No lock errors'))
+
+    def describe_database(self):
+        if connection.vendor != 'sqlite':
+            return f'{connection.vendor} database {connection.settings_dict["NAME"]}'
+        with connection.cursor() as cursor:
+            pragmas = {}
+            for name in ('journal_mode', 'synchronous', 'busy_timeout', 'mmap_size', 'cache_size'):
+                cursor.execute(f'PRAGMA {name}')
+                pragmas[name] = cursor.fetchone()[0]
+        mode = getattr(connection, 'transaction_mode', None) or 'DEFERRED'
+        settings = ', '.join(f'{name}={value}' for name, value in pragmas.items())
+        return f'sqlite {connection.settings_dict["NAME"]}: {mode} transactions, {settings}'
@@ -0,0 +1,41 @@
+from django.core.management.base import BaseCommand, CommandError
+from django.utils import timezone
+from wardrobe.instrumentation import query_plan_problems
+from wardrobe.models import ClothingItem, Outfit, SavedOutfit
+from wardrobe.pagination import keyset_queryset, encode_cursor, ITEM_ORDERING, OUTFIT_ORDERING, SAVED_OUTFIT_ORDERING
+
+class Command(BaseCommand):
+    help = 'Check with EXPLAIN that the paginated wardrobe and outfit listings use their composite indexes'
+
+    def handle(self, *args, **options):
+        item_cursor = encode_cursor(ClothingItem(id=1, date_added=timezone.now()), ITEM_ORDERING)
+        outfit_cursor = encode_cursor(Outfit(id=1, ai_score=50), OUTFIT_ORDERING)
+        items = ClothingItem.objects.filter(user_id=1)
+        saved_cursor = encode_cursor(SavedOutfit(id=1, date_saved=timezone.now()), SAVED_OUTFIT_ORDERING)
+        outfits = Outfit.objects.filter(user_id=1)
+        saved = SavedOutfit.objects.filter(user_id=1)
+
+        # (listing, base queryset, ordering, cursor, expected index)
+        checks = [
+            ('wardrobe_home', items, ITEM_ORDERING, None, 'item_user_added_idx'),
+            ('wardrobe_home, later page', items, ITEM_ORDERING, item_cursor, 'item_user_added_idx'),
+            ('wardrobe_home by category', items.filter(category='tops'), ITEM_ORDERING, item_cursor,
+             'item_user_cat_added_idx'),
+            ('outfit_suggestions', outfits, OUTFIT_ORDERING, None, 'outfit_user_score_idx'),
+            ('outfit_suggestions, later page', outfits, OUTFIT_ORDERING, outfit_cursor, 'outfit_user_score_idx'),
+            ('outfit_suggestions by occasion and season', outfits.filter(occasion='casual', season='all'),
+             OUTFIT_ORDERING, outfit_cursor, 'outfit_user_occ_season_idx'),
+            ('saved_outfits, later page', saved, SAVED_OUTFIT_ORDERING, saved_cursor, 'saved_user_date_idx'),
+        ]
+
+        failures = 0
+        for listing, queryset, ordering, cursor, index_name in checks:
+            problems = query_plan_problems(keyset_queryset(queryset, ordering, cursor)[:25], index_name)
+            if problems:
+                failures += 1
+                self.stderr.write(f'{listing}: ' + '\n'.join(problems))
+            else:
+                self.stdout.write(f'{listing}: uses {index_name}')
+
+        if failures:
+            raise CommandError(f'{failures} listing queries do not use their index')
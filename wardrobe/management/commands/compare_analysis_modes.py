@@ -0,0 +1,61 @@
+import os
+import time
+import numpy as np
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from wardrobe.ml_utils import analyze_image, ANALYSIS_MODES
+
+IMAGE_EXTENSIONS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp', '.gif')
+
+class Command(BaseCommand):
+    help = 'Compare latency and agreement of the fast and accurate image analysis modes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('paths', nargs='*',
+                            help='Image files or directories (defaults to MEDIA_ROOT/clothing_items)')
+        parser.add_argument('--limit', type=int, default=200, help='Maximum number of images to analyze')
+        parser.add_argument('--show-disagreements', action='store_true')
+
+    def handle(self, *args, **options):
+        images = self.collect_images(options['paths'] or [os.path.join(settings.MEDIA_ROOT, 'clothing_items')])
+        images = images[:options['limit']]
+        if not images:
+            raise CommandError('No images found to compare')
+
+        timings = {mode: [] for mode in ANALYSIS_MODES}
+        results = {mode: [] for mode in ANALYSIS_MODES}
+        for path in images:
+            for mode in ANALYSIS_MODES:
+                start = time.perf_counter()
+                result = analyze_image(path, use_cache=False, mode=mode)
+                timings[mode].append((time.perf_counter() - start) * 1000)
+                results[mode].append(result)
+
+        self.stdout.write(f'Analyzed {len(images)} images\n')
+        self.stdout.write(f'{"mode":<10} {"mean ms":>10} {"p50 ms":>10} {"p95 ms":>10}')
+        for mode in ANALYSIS_MODES:
+            ms = np.array(timings[mode])
+            self.stdout.write(f'{mode:<10} {ms.mean():>10.2f} {np.percentile(ms, 50):>10.2f} {np.percentile(ms, 95):>10.2f}')
+
+        accurate, fast = results['accurate'], results['fast']
+        compared = [(a, f) for a, f in zip(accurate, fast) if a and f]
+        if compared:
+            agreement = sum(a['color'] == f['color'] for a, f in compared) / len(compared)
+            speedup = np.mean(timings['accurate']) / max(np.mean(timings['fast']), 1e-9)
+            self.stdout.write(f'\nColor agreement: {agreement:.1%} over {len(compared)} images')
+            self.stdout.write(f'Fast mode speedup: {speedup:.1f}x')
+
+        if options['show_disagreements']:
+            for path, a, f in zip(images, accurate, fast):
+                if a and f and a['color'] != f['color']:
+                    self.stdout.write(f'{path}: accurate={a["color"]} fast={f["color"]}')
+
+    def collect_images(self, paths):
+        images = []
+        for path in paths:
+            if os.path.isdir(path):
+                for root, _, files in os.walk(path):
+                    images.extend(os.path.join(root, f) for f in sorted(files) if f.lower().endswith(IMAGE_EXTENSIONS))
+            elif os.path.isfile(path):
+                images.append(path)
+        return images
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from wardrobe.persistence import collapse_duplicate_outfits
+
+class Command(BaseCommand):
+    help = 'Fingerprint outfits by item set and collapse duplicates into one outfit per user'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report duplicates without changing anything')
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            duplicates, item_sets = collapse_duplicate_outfits()
+            if options['dry_run']:
+                transaction.set_rollback(True)
+
+        action = 'Found' if options['dry_run'] else 'Removed'
+        self.stdout.write(f'{action} {duplicates} duplicate outfits across {item_sets} distinct item sets')
@@ -0,0 +1,27 @@
+from django.core.management.base import BaseCommand
+from wardrobe.models import ClothingItem
+from wardrobe.renditions import generate_renditions, RENDITION_SIZES
+
+class Command(BaseCommand):
+    help = 'Generate image renditions for clothing items that do not have them yet'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--sizes', type=int, nargs='+', default=list(RENDITION_SIZES))
+        parser.add_argument('--user', help='Only process items of this username')
+
+    def handle(self, *args, **options):
+        items = ClothingItem.objects.exclude(image='').order_by('pk')
+        if options['user']:
+            items = items.filter(user__username=options['user'])
+
+        generated, failed = 0, 0
+        for item in items.iterator():
+            try:
+                for size in options['sizes']:
+                    generate_renditions(item, size)
+                generated += 1
+            except (OSError, ValueError) as e:
+                failed += 1
+                self.stderr.write(f'Could not render item {item.pk}: {e}')
+
+        self.stdout.write(f'Rendered {generated} items ({failed} failed)')
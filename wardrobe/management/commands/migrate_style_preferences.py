@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+from wardrobe.models import StylePreference
+from wardrobe.preferences import legacy_masks
+
+class Command(BaseCommand):
+    help = ('Move style preferences from the legacy JSON string columns into the bitmask columns; '
+            'migration 0012 does this once, this catches rows written by older code since')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--dry-run', action='store_true', help='Report what would change without saving')
+
+    def handle(self, *args, **options):
+        legacy = (StylePreference.objects.exclude(favorite_colors='', preferred_patterns='',
+                                                  seasonal_preferences='', occasion_preferences='')
+                  .order_by('pk'))
+
+        migrated = 0
+        for style_prefs in legacy.iterator():
+            for field, mask in legacy_masks(style_prefs).items():
+                setattr(style_prefs, field, mask)
+            style_prefs.favorite_colors = style_prefs.preferred_patterns = ''
+            style_prefs.seasonal_preferences = style_prefs.occasion_preferences = ''
+            if not options['dry_run']:
+                style_prefs.save()
+            migrated += 1
+
+        verb = 'Would migrate' if options['dry_run'] else 'Migrated'
+        self.stdout.write(f'{verb} style preferences of {migrated} users')
@@ -0,0 +1,150 @@
+import json
+import os
+import time
+from collections import deque
+from datetime import timedelta
+from multiprocessing import Pool
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connections, transaction
+from django.utils import timezone
+from wardrobe.listings import SUGGESTION_ITEM_FIELDS
+from wardrobe.models import ClothingItem, StylePreference, WardrobeStats
+from wardrobe.persistence import save_outfit_suggestions
+from wardrobe.preferences import get_preferences
+from wardrobe.stats import rebuild_wardrobe_stats
+from wardrobe.suggestion_pool import store_pools, suggest_from_pool
+
+def _init_worker():
+    """Give each worker process its own database connection"""
+    import django
+    django.setup()
+    connections.close_all()
+
+def _precompute_chunk(user_ids):
+    """Generate suggestions for a chunk of users; returns (last user id, [(user id, suggestions, pool)])
+
+    Workers only read. Writes all go through the parent process, since
+    concurrent write transactions from several processes deadlock on SQLite;
+    that includes the candidate pools, which live in the database cache.
+    """
+    users = User.objects.in_bulk(user_ids)
+    stats = {s.user_id: s for s in WardrobeStats.objects.filter(user_id__in=user_ids)}
+    results = []
+    for user_id in user_ids:
+        user, user_stats = users.get(user_id), stats.get(user_id)
+        if user is None or user_stats is None or user_stats.total_items < 2:
+            results.append((user_id, None, None))
+            continue
+        items = ClothingItem.objects.filter(user=user).only(*SUGGESTION_ITEM_FIELDS)
+        suggestions, info = suggest_from_pool(user, items, get_preferences(user), user_stats.version, store=False)
+        results.append((user_id, suggestions, info['pool']))
+    return user_ids[-1], results
+
+def _store_chunk(results):
+    """Write a chunk's suggestions in one transaction of bulk inserts, then cache its pools"""
+    counts = {'users': 0, 'skipped': 0, 'created': 0, 'refreshed': 0}
+    users = User.objects.in_bulk([user_id for user_id, suggestions, _ in results if suggestions is not None])
+    with transaction.atomic():
+        for user_id, suggestions, _ in results:
+            if suggestions is None:
+                counts['skipped'] += 1
+                continue
+            saved = save_outfit_suggestions(users[user_id], suggestions)
+            counts['users'] += 1
+            counts['created'] += len(saved['created'])
+            counts['refreshed'] += len(saved['refreshed'])
+    store_pools({user_id: pool for user_id, _, pool in results if pool is not None})
+    return counts
+
+def _read_checkpoint(path):
+    try:
+        with open(path) as f:
+            return json.load(f).get('last_user_id', 0)
+    except (OSError, ValueError):
+        return 0
+
+def _write_checkpoint(path, last_user_id):
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'last_user_id': last_user_id, 'updated': timezone.now().isoformat()}, f)
+    os.replace(tmp_path, path)
+
+class Command(BaseCommand):
+    help = 'Precompute and store outfit suggestions for all users with a pool of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int, default=os.cpu_count() or 1)
+        parser.add_argument('--chunk-size', type=int, default=50, help='Users per worker task')
+        parser.add_argument('--active-days', type=int,
+                            help='Only users who logged in within this many days')
+        parser.add_argument('--max-seconds', type=float,
+                            help='Stop handing out chunks after this much wall time')
+        parser.add_argument('--checkpoint', default=os.path.join(settings.BASE_DIR, 'precompute_suggestions.checkpoint'),
+                            help='File recording the last finished user, so an interrupted run resumes')
+        parser.add_argument('--restart', action='store_true', help='Ignore the checkpoint and start from the first user')
+
+    def handle(self, *args, **options):
+        last_user_id = 0 if options['restart'] else _read_checkpoint(options['checkpoint'])
+        users = User.objects.filter(is_active=True, pk__gt=last_user_id).order_by('pk')
+        if options['active_days'] is not None:
+            users = users.filter(last_login__gte=timezone.now() - timedelta(days=options['active_days']))
+        user_ids = list(users.values_list('pk', flat=True))
+        if not user_ids:
+            self.stdout.write('No users to process')
+            return
+
+        # Workers only read, so create any missing stats and preference rows up front
+        for user_id in users.filter(wardrobe_stats__isnull=True).values_list('pk', flat=True):
+            rebuild_wardrobe_stats(user_id)
+        StylePreference.objects.bulk_create([
+            StylePreference(user_id=user_id)
+            for user_id in users.filter(stylepreference__isnull=True).values_list('pk', flat=True)
+        ])
+
+        chunk_size = max(1, options['chunk_size'])
+        chunks = [user_ids[i:i + chunk_size] for i in range(0, len(user_ids), chunk_size)]
+        resuming = f' (resuming after user {last_user_id})' if last_user_id else ''
+        self.stdout.write(f'Precomputing suggestions for {len(user_ids)} users in {len(chunks)} chunks{resuming}')
+
+        started = time.monotonic()
+        deadline = started + options['max_seconds'] if options['max_seconds'] else None
+
+        totals = {'users': 0, 'skipped': 0, 'created': 0, 'refreshed': 0}
+        remaining = iter(chunks)
+        in_flight = deque()
+
+        def submit_next():
+            # Chunks are handed out a few at a time, so the time limit stops new work promptly
+            if deadline and time.monotonic() > deadline:
+                return
+            chunk = next(remaining, None)
+            if chunk is not None:
+                in_flight.append(pool.apply_async(_precompute_chunk, (chunk,)))
+
+        connections.close_all()  # Workers must not share the parent's connection
+        with Pool(processes=options['processes'], initializer=_init_worker) as pool:
+            for _ in range(options['processes'] * 2):
+                submit_next()
+            # Results are stored in submission order, so the checkpoint never skips an unfinished chunk
+            while in_flight:
+                last_user_id, results = in_flight.popleft().get()
+                counts = _store_chunk(results)
+                for key in totals:
+                    totals[key] += counts[key]
+                _write_checkpoint(options['checkpoint'], last_user_id)
+                submit_next()
+
+        elapsed = max(time.monotonic() - started, 1e-9)
+        outfits = totals['created'] + totals['refreshed']
+        done = totals['users'] + totals['skipped']
+        self.stdout.write(
+            f'Processed {done} users ({totals["skipped"]} skipped) in {elapsed:.1f}s: '
+            f'{totals["created"]} outfits created, {totals["refreshed"]} refreshed; '
+            f'{done / elapsed:.1f} users/s, {outfits / elapsed:.1f} outfits/s'
+        )
+        if done < len(user_ids):
+            self.stdout.write(f'Stopped at the time limit; {len(user_ids) - done} users left for the next run')
+        else:
+            os.remove(options['checkpoint'])
@@ -0,0 +1,21 @@
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from wardrobe.stats import rebuild_wardrobe_stats
+
+class Command(BaseCommand):
+    help = 'Recount per-user wardrobe statistics from the clothing items table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--user', help='Only rebuild the stats of this username')
+
+    def handle(self, *args, **options):
+        users = User.objects.order_by('pk')
+        if options['user']:
+            users = users.filter(username=options['user'])
+
+        rebuilt = 0
+        for user_id in users.values_list('pk', flat=True).iterator():
+            rebuild_wardrobe_stats(user_id)
+            rebuilt += 1
+
+        self.stdout.write(f'Rebuilt wardrobe stats for {rebuilt} users')
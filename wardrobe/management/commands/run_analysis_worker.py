@@ -0,0 +1,79 @@
+import os
+import socket
+import time
+from functools import partial
+from multiprocessing import Pool, TimeoutError
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+from wardrobe.jobs import claim_jobs, complete_job, fail_job, requeue_stale_jobs, job_counts
+from wardrobe.ml_utils import analyze_image
+
+class Command(BaseCommand):
+    help = 'Process queued clothing image analysis jobs with a pool of worker processes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--processes', type=int,
+                            default=getattr(settings, 'ANALYSIS_WORKER_PROCESSES', os.cpu_count() or 1))
+        parser.add_argument('--batch-size', type=int, default=20,
+                            help='Maximum number of jobs claimed per poll')
+        parser.add_argument('--poll-interval', type=float, default=2.0,
+                            help='Seconds to sleep when the queue is empty')
+        parser.add_argument('--job-timeout', type=float, default=120.0,
+                            help='Seconds before a single analysis is treated as failed')
+        parser.add_argument('--once', action='store_true',
+                            help='Drain the currently runnable jobs and exit')
+
+    def handle(self, *args, **options):
+        worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        analyze = partial(analyze_image, raise_errors=True)
+
+        pool = self.start_pool(options['processes'])
+        self.stdout.write(f'Analysis worker {worker_id} started with {options["processes"]} processes')
+
+        try:
+            while True:
+                requeue_stale_jobs()
+                jobs = claim_jobs(worker_id, options['batch_size'])
+
+                if not jobs:
+                    if options['once']:
+                        break
+                    time.sleep(options['poll_interval'])
+                    continue
+
+                pending = [(job, pool.apply_async(analyze, (job.item.image.path,))) for job in jobs]
+                while pending:
+                    job, async_result = pending.pop(0)
+                    try:
+                        results = async_result.get(timeout=options['job_timeout'])
+                    except TimeoutError:
+                        fail_job(job, f'Timed out after {options["job_timeout"]}s')
+                        # The timed out analysis keeps running and holds its
+                        # process, so replace the pool. Finished results are
+                        # kept and the rest of the batch is resubmitted
+                        unfinished = [other for other, result in pending if not result.ready()]
+                        pending = [(other, result) for other, result in pending if result.ready()]
+                        pool.terminate()
+                        pool.join()
+                        pool = self.start_pool(options['processes'])
+                        pending += [(other, pool.apply_async(analyze, (other.item.image.path,))) for other in unfinished]
+                        continue
+                    except Exception as e:
+                        fail_job(job, f'{type(e).__name__}: {e}')
+                        continue
+                    complete_job(job, results)
+
+                self.stdout.write(f'Processed {len(jobs)} jobs; queue status: {job_counts()}')
+        except KeyboardInterrupt:
+            self.stdout.write('Stopping analysis worker')
+        finally:
+            pool.terminate()
+            pool.join()
+
+    def start_pool(self, processes):
+        # Children are forked without the parent's connections and open
+        # their own: analyze_image reads and writes the analysis cache
+        # tables (ImageAnalysisCache, AnalysisCacheCounter) from them
+        connections.close_all()
+        return Pool(processes=processes, maxtasksperchild=100)
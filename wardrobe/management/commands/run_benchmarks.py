@@ -0,0 +1,63 @@
+import os
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from wardrobe.benchmarks import run_benchmarks, save_results, load_results, compare_results, environment, DEFAULT_THRESHOLD
+
+class Command(BaseCommand):
+    help = ('Benchmark image analysis and outfit suggestions on synthetic images and wardrobes, '
+            'and flag regressions against a stored baseline')
+
+    def add_arguments(self, parser):
+        parser.add_argument('-k', '--filter', default=None,
+                            help='Only run benchmarks whose name contains this text')
+        parser.add_argument('--repeat', type=int, default=5, help='Timing loops per benchmark')
+        parser.add_argument('--min-time', type=float, default=0.2,
+                            help='Minimum seconds per timing loop')
+        parser.add_argument('--baseline', default=getattr(settings, 'BENCHMARK_BASELINE',
+                                                          os.path.join(settings.BASE_DIR, 'benchmark_baseline.json')),
+                            help='Stored results to compare against')
+        parser.add_argument('--save-baseline', action='store_true',
+                            help='Store these results as the new baseline (merged into the existing file)')
+        parser.add_argument('--output', help='Also write these results to this file')
+        parser.add_argument('--threshold', type=float, default=DEFAULT_THRESHOLD,
+                            help='Fraction a result may be worse than the baseline before it is flagged')
+
+    def handle(self, *args, **options):
+        baseline = {}
+        if os.path.exists(options['baseline']):
+            stored = load_results(options['baseline'])
+            baseline = stored['results']
+            if stored.get('environment') != environment():
+                self.stdout.write(self.style.WARNING(
+                    f'Baseline was measured on {stored.get("environment")}; timings may not be comparable'))
+
+        self.stdout.write(f'{"benchmark":<44} {"median ms":>10} {"best ms":>10} {"peak KiB":>10} '
+                          f'{"kept KiB":>9} {"kept blocks":>11} {"vs base":>8}')
+
+        def report(name, result):
+            previous = baseline.get(name)
+            change = f'{result["best_ms"] / previous["best_ms"] - 1:+.0%}' if previous else 'new'
+            self.stdout.write(f'{name:<44} {result["time_ms"]:>10.3f} {result["best_ms"]:>10.3f} '
+                              f'{result["peak_kib"]:>10.1f} {result["retained_kib"]:>9.1f} '
+                              f'{result["retained_blocks"]:>11} {change:>8}')
+
+        results = run_benchmarks(options['filter'], options['repeat'], options['min_time'], report)
+        if not results:
+            raise CommandError(f'No benchmarks match "{options["filter"]}"')
+
+        if options['output']:
+            save_results(options['output'], results)
+        if options['save_baseline']:
+            save_results(options['baseline'], {**baseline, **results})
+            self.stdout.write(self.style.SUCCESS(f'Saved {len(results)} results to {options["baseline"]}'))
+            return
+
+        regressions = compare_results(results, baseline, options['threshold'])
+        if not baseline:
+            self.stdout.write(f'No baseline at {options["baseline"]}; run with --save-baseline to store one')
+        elif regressions:
+            for name, metric, before, after in regressions:
+                self.stdout.write(self.style.ERROR(f'REGRESSION {name} {metric}: {before:.3f} -> {after:.3f}'))
+            raise CommandError(f'{len(regressions)} benchmark regressions over {options["threshold"]:.0%}')
+        else:
+            self.stdout.write(self.style.SUCCESS('No regressions against the baseline'))
@@ -0,0 +1,65 @@
+import json
+import logging
+from django.core.management.base import BaseCommand, CommandError
+from wardrobe.loadtest import (load_virtual_users, run_wsgi_load, run_asgi_load,
+                               DEFAULT_VIEW_MIX, LOAD_USER_PREFIX, LOAD_USER_PASSWORD)
+
+def parse_mix(value):
+    """'dashboard=30,wardrobe_home=70' -> {'dashboard': 30, 'wardrobe_home': 70}"""
+    mix = {}
+    for part in value.split(','):
+        view, _, weight = part.partition('=')
+        if view.strip() not in DEFAULT_VIEW_MIX or not weight.strip().isdigit():
+            raise CommandError(f'Bad --mix entry "{part}"; views are {", ".join(DEFAULT_VIEW_MIX)}')
+        mix[view.strip()] = int(weight)
+    return mix
+
+class Command(BaseCommand):
+    help = ('Replay a mix of dashboard, wardrobe, outfit, suggestion and upload requests from seeded users '
+            'at a target concurrency, and report latency percentiles and throughput per view')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--concurrency', type=int, default=8, help='Simultaneous clients')
+        parser.add_argument('--duration', type=float, default=30.0, help='Seconds to run for')
+        parser.add_argument('--users', type=int, default=50, help='Seeded users to spread the clients over')
+        parser.add_argument('--asgi', action='store_true',
+                            help='Drive the ASGI handler from async tasks instead of the WSGI handler from threads '
+                                 '(set ASYNC_VIEWS=1 to serve the async views)')
+        parser.add_argument('--mix', type=parse_mix, default=DEFAULT_VIEW_MIX,
+                            help='Request weights per view, e.g. dashboard=30,wardrobe_home=70')
+        parser.add_argument('--prefix', default=LOAD_USER_PREFIX)
+        parser.add_argument('--password', default=LOAD_USER_PASSWORD)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--output', help='Also write the summary as JSON to this file')
+
+    def handle(self, *args, **options):
+        try:
+            virtual_users = load_virtual_users(options['users'], options['prefix'], options['mix'], options['seed'])
+        except ValueError as e:
+            raise CommandError(str(e))
+
+        # Failed requests are counted per view; their tracebacks are only logged at -v 2
+        if options['verbosity'] < 2:
+            logging.getLogger('django.request').setLevel(logging.CRITICAL)
+
+        run = run_asgi_load if options['asgi'] else run_wsgi_load
+        self.stdout.write(f'Replaying requests from {options["concurrency"]} {"ASGI" if options["asgi"] else "WSGI"} '
+                          f'clients as {len(virtual_users)} users for {options["duration"]:.0f}s')
+        try:
+            results = run(virtual_users, options['concurrency'], options['duration'], options['password'])
+        except ValueError as e:
+            raise CommandError(str(e))
+        summary = results.summary()
+
+        self.stdout.write(f'\n{"view":<22} {"requests":>9} {"errors":>7} {"p50 ms":>9} {"p95 ms":>9} '
+                          f'{"p99 ms":>9} {"req/s":>8}  statuses')
+        for view, row in summary['views'].items():
+            statuses = ' '.join(f'{status}:{count}' for status, count in row['statuses'].items())
+            self.stdout.write(f'{view:<22} {row["requests"]:>9} {row["errors"]:>7} {row["p50_ms"]:>9.1f} '
+                              f'{row["p95_ms"]:>9.1f} {row["p99_ms"]:>9.1f} {row["throughput"]:>8.1f}  {statuses}')
+        total = sum(row['requests'] for row in summary['views'].values())
+        self.stdout.write(f'\n{total} requests in {summary["elapsed_s"]:.1f}s ({total / summary["elapsed_s"]:.1f} req/s)')
+
+        if options['output']:
+            with open(options['output'], 'w') as f:
+                json.dump(summary, f, indent=2)
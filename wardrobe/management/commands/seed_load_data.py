@@ -0,0 +1,35 @@
+import time
+from django.core.management.base import BaseCommand
+from wardrobe.loadtest import seed_users, clear_users, LOAD_USER_PREFIX, LOAD_USER_PASSWORD
+
+class Command(BaseCommand):
+    help = 'Create synthetic users with wardrobes, outfits and saved outfits for load testing'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--items', type=int, default=40, help='Clothing items per user')
+        parser.add_argument('--outfits', type=int, default=10, help='Generated outfits per user')
+        parser.add_argument('--saved', type=int, default=3, help='Saved outfits per user')
+        parser.add_argument('--image-size', type=int, default=256,
+                            help='Width in px of the generated item images')
+        parser.add_argument('--prefix', default=LOAD_USER_PREFIX, help='Username prefix of the load test users')
+        parser.add_argument('--password', default=LOAD_USER_PASSWORD)
+        parser.add_argument('--seed', type=int, default=0, help='Random seed, for reproducible data')
+        parser.add_argument('--clear', action='store_true',
+                            help='Delete existing load test users before seeding')
+
+    def handle(self, *args, **options):
+        if options['clear']:
+            self.stdout.write(f'Deleted {clear_users(options["prefix"])} rows of earlier load test data')
+
+        started = time.perf_counter()
+
+        def progress(created):
+            if created % 50 == 0:
+                self.stdout.write(f'  {created} users created')
+
+        created = seed_users(options['users'], options['items'], options['outfits'], options['saved'],
+                             options['image_size'], options['prefix'], options['password'], options['seed'], progress)
+        self.stdout.write(f'Created {created} users ({options["users"] - created} already existed) '
+                          f'in {time.perf_counter() - started:.1f}s; log in as {options["prefix"]}00000 '
+                          f'with password {options["password"]!r}')
@@ -0,0 +1,135 @@
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+
+# Bucket upper bounds; the last bucket catches everything above them
+DURATION_BUCKETS_MS = (1, 2.5, 5, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+COUNT_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200, 500)
+SIZE_BUCKETS = (0, 10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000)
+
+# Prefix of every metric on the Prometheus /metrics endpoint
+PROMETHEUS_PREFIX = 'wardrobe_'
+
+class Histogram:
+    """Fixed-bucket histogram, cheap enough to update on every request"""
+    def __init__(self, buckets):
+        self.buckets = tuple(buckets)
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self):
+        return {
+            'buckets': dict(zip([str(b) for b in self.buckets] + ['+Inf'], self.counts)),
+            'count': self.count,
+            'sum': round(self.sum, 3),
+            'mean': round(self.sum / self.count, 3) if self.count else 0.0,
+        }
+
+class MetricsRegistry:
+    """In-process histograms and counters keyed by metric name and label values
+
+    Each process keeps its own registry; with several workers, collect from
+    each of them.
+    """
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._histograms = {}
+        self._counters = {}
+
+    def observe(self, name, value, buckets, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            histogram = self._histograms.get(key)
+            if histogram is None:
+                histogram = self._histograms[key] = Histogram(buckets)
+            histogram.observe(value)
+
+    def increment(self, name, amount=1, **labels):
+        key = (name, tuple(sorted(labels.items())))
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + amount
+
+    def snapshot(self):
+        """Copy of every histogram as {name: [{'labels': ..., **histogram}]}"""
+        with self._lock:
+            items = [(name, dict(labels), histogram.snapshot())
+                     for (name, labels), histogram in sorted(self._histograms.items())]
+        snapshot = {}
+        for name, labels, histogram in items:
+            snapshot.setdefault(name, []).append({'labels': labels, **histogram})
+        return snapshot
+
+    def counters(self):
+        """Copy of every counter as {name: [{'labels': ..., 'value': n}]}"""
+        with self._lock:
+            items = sorted(self._counters.items())
+        counters = {}
+        for (name, labels), value in items:
+            counters.setdefault(name, []).append({'labels': dict(labels), 'value': value})
+        return counters
+
+    def prometheus_text(self):
+        """Every metric in the Prometheus text exposition format"""
+        lines = []
+        for name, series in self.counters().items():
+            metric = f'{PROMETHEUS_PREFIX}{name}_total'
+            lines.append(f'# TYPE {metric} counter')
+            lines.extend(f'{metric}{_labels(entry["labels"])} {entry["value"]}' for entry in series)
+
+        with self._lock:
+            histograms = [(name, dict(labels), histogram.buckets, list(histogram.counts), histogram.count, histogram.sum)
+                          for (name, labels), histogram in sorted(self._histograms.items())]
+        typed = set()
+        for name, labels, buckets, counts, count, total in histograms:
+            metric = f'{PROMETHEUS_PREFIX}{name}'
+            if metric not in typed:
+                lines.append(f'# TYPE {metric} histogram')
+                typed.add(metric)
+            cumulative = 0
+            for bound, bucket_count in zip([str(b) for b in buckets] + ['+Inf'], counts):
+                cumulative += bucket_count
+                lines.append(f'{metric}_bucket{_labels({**labels, "le": bound})} {cumulative}')
+            lines.append(f'{metric}_sum{_labels(labels)} {total}')
+            lines.append(f'{metric}_count{_labels(labels)} {count}')
+        return '\n'.join(lines) + '\n'
+
+    def reset(self):
+        with self._lock:
+            self._histograms.clear()
+            self._counters.clear()
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _labels(labels):
+    if not labels:
+        return ''
+    return '{' + ','.join(f'{key}="{_escape(value)}"' for key, value in labels.items()) + '}'
+
+registry = MetricsRegistry()
+
+@contextmanager
+def stage(pipeline, name):
+    """Time a pipeline stage into stage_ms and count its exceptions by type
+
+        with stage('analyze_image', 'decode'):
+            img = Image.open(f)
+
+    Costs two perf_counter calls and a lock, so it can wrap every call.
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    except Exception as e:
+        registry.increment('stage_errors', pipeline=pipeline, stage=name, error=type(e).__name__)
+        raise
+    finally:
+        registry.observe('stage_ms', (time.perf_counter() - start) * 1000, DURATION_BUCKETS_MS,
+                         pipeline=pipeline, stage=name)
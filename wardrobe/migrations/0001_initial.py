@@ -0,0 +1,84 @@
+# Generated by Django 4.2.7
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ClothingItem',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('category', models.CharField(choices=[('tops', 'Tops'), ('bottoms', 'Bottoms'), ('dresses', 'Dresses'), ('outerwear', 'Outerwear'), ('shoes', 'Shoes'), ('accessories', 'Accessories')], max_length=20)),
+                ('color', models.CharField(choices=[('black', 'Black'), ('white', 'White'), ('gray', 'Gray'), ('blue', 'Blue'), ('red', 'Red'), ('green', 'Green'), ('yellow', 'Yellow'), ('purple', 'Purple'), ('pink', 'Pink'), ('brown', 'Brown'), ('orange', 'Orange'), ('multi', 'Multi')], max_length=20)),
+                ('pattern', models.CharField(choices=[('solid', 'Solid'), ('striped', 'Striped'), ('plaid', 'Plaid'), ('floral', 'Floral'), ('polka_dot', 'Polka Dot'), ('graphic', 'Graphic'), ('other', 'Other')], max_length=20)),
+                ('season', models.CharField(choices=[('spring', 'Spring'), ('summer', 'Summer'), ('fall', 'Fall'), ('winter', 'Winter'), ('all', 'All Seasons')], max_length=20)),
+                ('description', models.TextField(blank=True)),
+                ('image', models.ImageField(upload_to='clothing_items')),
+                ('date_added', models.DateTimeField(default=django.utils.timezone.now)),
+                ('favorite', models.BooleanField(default=False)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Outfit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=100)),
+                ('occasion', models.CharField(choices=[('casual', 'Casual'), ('formal', 'Formal'), ('business', 'Business'), ('party', 'Party'), ('date', 'Date Night'), ('workout', 'Workout'), ('beach', 'Beach'), ('everyday', 'Everyday')], max_length=20)),
+                ('season', models.CharField(choices=[('spring', 'Spring'), ('summer', 'Summer'), ('fall', 'Fall'), ('winter', 'Winter'), ('all', 'All Seasons')], max_length=20)),
+                ('style', models.CharField(choices=[('casual', 'Casual'), ('formal', 'Formal'), ('sporty', 'Sporty'), ('vintage', 'Vintage'), ('minimalist', 'Minimalist'), ('bohemian', 'Bohemian'), ('streetwear', 'Streetwear'), ('business', 'Business')], default='casual', max_length=20)),
+                ('style_notes', models.TextField(blank=True)),
+                ('ai_score', models.IntegerField(default=0)),
+                ('date_created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('items', models.ManyToManyField(to='wardrobe.clothingitem')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='UserProfile',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('bio', models.TextField(blank=True, max_length=500)),
+                ('avatar', models.ImageField(default='default.jpg', upload_to='profile_pics')),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='StylePreference',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('favorite_colors', models.CharField(blank=True, max_length=255)),
+                ('preferred_patterns', models.CharField(blank=True, max_length=255)),
+                ('style_preference', models.CharField(choices=[('casual', 'Casual'), ('formal', 'Formal'), ('sporty', 'Sporty'), ('vintage', 'Vintage'), ('minimalist', 'Minimalist'), ('bohemian', 'Bohemian'), ('streetwear', 'Streetwear'), ('business', 'Business')], default='casual', max_length=20)),
+                ('casual_formal_balance', models.IntegerField(default=50)),
+                ('seasonal_preferences', models.CharField(blank=True, max_length=255)),
+                ('occasion_preferences', models.CharField(blank=True, max_length=255)),
+                ('sustainability_focus', models.BooleanField(default=False)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='SavedOutfit',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date_saved', models.DateTimeField(default=django.utils.timezone.now)),
+                ('outfit', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to='wardrobe.outfit')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'unique_together': {('user', 'outfit')},
+            },
+        ),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 4.2.7
+
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clothingitem',
+            name='analysis_status',
+            field=models.CharField(choices=[('pending', 'Analysis Pending'), ('complete', 'Analysis Complete'), ('failed', 'Analysis Failed'), ('skipped', 'Analysis Skipped')], default='pending', max_length=20),
+        ),
+        migrations.CreateModel(
+            name='AnalysisJob',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('status', models.CharField(choices=[('queued', 'Queued'), ('running', 'Running'), ('done', 'Done'), ('failed', 'Failed')], default='queued', max_length=20)),
+                ('attempts', models.IntegerField(default=0)),
+                ('max_attempts', models.IntegerField(default=3)),
+                ('last_error', models.TextField(blank=True)),
+                ('run_after', models.DateTimeField(default=django.utils.timezone.now)),
+                ('locked_by', models.CharField(blank=True, max_length=100)),
+                ('locked_at', models.DateTimeField(blank=True, null=True)),
+                ('date_created', models.DateTimeField(default=django.utils.timezone.now)),
+                ('date_finished', models.DateTimeField(blank=True, null=True)),
+                ('item', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='analysis_jobs', to='wardrobe.clothingitem')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['status', 'run_after'], name='wardrobe_an_status_188712_idx')],
+            },
+        ),
+    ]
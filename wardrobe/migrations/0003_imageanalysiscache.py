@@ -0,0 +1,44 @@
+# Generated by Django 4.2.7
+
+from django.db import migrations, models
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0002_analysisjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AnalysisCacheCounter',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=50, unique=True)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='ImageAnalysisCache',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64)),
+                ('dhash', models.BigIntegerField()),
+                ('dhash_band0', models.IntegerField()),
+                ('dhash_band1', models.IntegerField()),
+                ('dhash_band2', models.IntegerField()),
+                ('dhash_band3', models.IntegerField()),
+                ('version', models.CharField(max_length=20)),
+                ('color', models.CharField(choices=[('black', 'Black'), ('white', 'White'), ('gray', 'Gray'), ('blue', 'Blue'), ('red', 'Red'), ('green', 'Green'), ('yellow', 'Yellow'), ('purple', 'Purple'), ('pink', 'Pink'), ('brown', 'Brown'), ('orange', 'Orange'), ('multi', 'Multi')], max_length=20)),
+                ('pattern', models.CharField(choices=[('solid', 'Solid'), ('striped', 'Striped'), ('plaid', 'Plaid'), ('floral', 'Floral'), ('polka_dot', 'Polka Dot'), ('graphic', 'Graphic'), ('other', 'Other')], max_length=20)),
+                ('hits', models.IntegerField(default=0)),
+                ('last_used', models.DateTimeField(default=django.utils.timezone.now)),
+                ('date_created', models.DateTimeField(default=django.utils.timezone.now)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['last_used'], name='wardrobe_im_last_us_95ba54_idx'), models.Index(fields=['dhash_band0'], name='wardrobe_im_dhash_b_fea994_idx'), models.Index(fields=['dhash_band1'], name='wardrobe_im_dhash_b_866837_idx'), models.Index(fields=['dhash_band2'], name='wardrobe_im_dhash_b_93db4e_idx'), models.Index(fields=['dhash_band3'], name='wardrobe_im_dhash_b_653a4d_idx')],
+                'unique_together': {('content_hash', 'version')},
+            },
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0004_imageanalysiscache_palette'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='clothingitem',
+            name='image_hash',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+    ]
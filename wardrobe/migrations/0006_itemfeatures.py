@@ -0,0 +1,38 @@
+# Generated by Django 4.2.7
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('wardrobe', '0005_clothingitem_image_hash'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageanalysiscache',
+            name='features',
+            field=models.JSONField(default=dict),
+        ),
+        migrations.CreateModel(
+            name='ItemFeatures',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('palette', models.JSONField(default=list)),
+                ('pattern_stats', models.JSONField(default=dict)),
+                ('embedding', models.BinaryField()),
+                ('embedding_version', models.CharField(max_length=20)),
+                ('date_updated', models.DateTimeField(default=django.utils.timezone.now)),
+                ('item', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='features', to='wardrobe.clothingitem')),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'indexes': [models.Index(fields=['user', 'embedding_version'], name='wardrobe_it_user_id_8156b1_idx')],
+            },
+        ),
+    ]
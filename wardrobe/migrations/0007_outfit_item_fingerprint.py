@@ -0,0 +1,25 @@
+# Generated by Django 4.2.7
+
+from django.db import migrations, models
+
+
+def fingerprint_outfits(apps, schema_editor):
+    """Fill item_fingerprint and drop duplicate item sets before 0008 makes them unique"""
+    from wardrobe.persistence import collapse_duplicate_outfits
+    collapse_duplicate_outfits(apps.get_model('wardrobe', 'Outfit'), apps.get_model('wardrobe', 'SavedOutfit'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0006_itemfeatures'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='outfit',
+            name='item_fingerprint',
+            field=models.CharField(blank=True, db_index=True, max_length=64),
+        ),
+        migrations.RunPython(fingerprint_outfits, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0007_outfit_item_fingerprint'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='outfit',
+            constraint=models.UniqueConstraint(condition=models.Q(('item_fingerprint', ''), _negated=True), fields=('user', 'item_fingerprint'), name='unique_outfit_items_per_user'),
+        ),
+    ]
@@ -0,0 +1,31 @@
+# Generated by Django 4.2.7
+
+from django.conf import settings
+from django.db import migrations, models
+import django.db.models.deletion
+import django.utils.timezone
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+        ('wardrobe', '0008_outfit_unique_item_set'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='WardrobeStats',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('total_items', models.IntegerField(default=0)),
+                ('category_counts', models.JSONField(default=dict)),
+                ('color_counts', models.JSONField(default=dict)),
+                ('pattern_counts', models.JSONField(default=dict)),
+                ('season_counts', models.JSONField(default=dict)),
+                ('style_score', models.IntegerField(default=0)),
+                ('date_updated', models.DateTimeField(default=django.utils.timezone.now)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, related_name='wardrobe_stats', to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 4.2.7
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0009_wardrobestats'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='clothingitem',
+            index=models.Index(fields=['user', 'date_added'], name='item_user_added_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='clothingitem',
+            index=models.Index(fields=['user', 'category', 'date_added'], name='item_user_cat_added_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outfit',
+            index=models.Index(fields=['user', 'ai_score'], name='outfit_user_score_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='outfit',
+            index=models.Index(fields=['user', 'occasion', 'season', 'ai_score'], name='outfit_user_occ_season_idx'),
+        ),
+    ]
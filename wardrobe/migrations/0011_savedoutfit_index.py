@@ -0,0 +1,17 @@
+# Generated by Django 4.2.7
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0010_listing_indexes'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='savedoutfit',
+            index=models.Index(fields=['user', 'date_saved'], name='saved_user_date_idx'),
+        ),
+    ]
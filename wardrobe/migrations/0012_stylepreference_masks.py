@@ -0,0 +1,69 @@
+# Generated by Django 4.2.7
+
+from django.db import migrations, models
+
+
+def fill_masks(apps, schema_editor):
+    """Parse the legacy JSON string columns into the new bitmask columns"""
+    from wardrobe.preferences import legacy_masks
+    StylePreference = apps.get_model('wardrobe', 'StylePreference')
+    legacy = StylePreference.objects.exclude(favorite_colors='', preferred_patterns='',
+                                             seasonal_preferences='', occasion_preferences='')
+    for style_prefs in legacy.iterator():
+        for field, mask in legacy_masks(style_prefs).items():
+            setattr(style_prefs, field, mask)
+        style_prefs.favorite_colors = style_prefs.preferred_patterns = ''
+        style_prefs.seasonal_preferences = style_prefs.occasion_preferences = ''
+        style_prefs.version = 1
+        style_prefs.save()
+
+
+def restore_legacy(apps, schema_editor):
+    """Write the bitmasks back as JSON strings before the columns are dropped"""
+    import json
+    from wardrobe.models import choice_values, COLOR_CHOICES, PATTERN_CHOICES, SEASON_CHOICES, OCCASION_CHOICES
+    StylePreference = apps.get_model('wardrobe', 'StylePreference')
+    for style_prefs in StylePreference.objects.iterator():
+        seasons = choice_values(style_prefs.season_mask, SEASON_CHOICES)
+        style_prefs.favorite_colors = json.dumps(choice_values(style_prefs.favorite_color_mask, COLOR_CHOICES))
+        style_prefs.preferred_patterns = json.dumps(choice_values(style_prefs.pattern_mask, PATTERN_CHOICES))
+        style_prefs.seasonal_preferences = json.dumps({season: season in seasons for season, _ in SEASON_CHOICES
+                                                       if season != 'all'})
+        style_prefs.occasion_preferences = json.dumps(choice_values(style_prefs.occasion_mask, OCCASION_CHOICES))
+        style_prefs.save()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0011_savedoutfit_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='stylepreference',
+            name='favorite_color_mask',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='stylepreference',
+            name='occasion_mask',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='stylepreference',
+            name='pattern_mask',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='stylepreference',
+            name='season_mask',
+            field=models.IntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='stylepreference',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_masks, restore_legacy),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0012_stylepreference_masks'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='wardrobestats',
+            name='version',
+            field=models.PositiveIntegerField(default=0),
+        ),
+    ]
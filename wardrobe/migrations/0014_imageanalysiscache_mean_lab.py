@@ -0,0 +1,18 @@
+# Generated by Django 4.2.7
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0013_wardrobestats_version'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='imageanalysiscache',
+            name='mean_lab',
+            field=models.JSONField(default=list),
+        ),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 4.2.7
+
+from django.core.management import call_command
+from django.db import migrations
+
+
+def create_cache_tables(apps, schema_editor):
+    # The suggestion pools live in a DatabaseCache shared by every process
+    call_command('createcachetable', database=schema_editor.connection.alias, verbosity=0)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('wardrobe', '0014_imageanalysiscache_mean_lab'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_cache_tables, migrations.RunPython.noop),
+    ]
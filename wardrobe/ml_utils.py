@@ -1,10 +1,17 @@
 import numpy as np
 import pandas as pd
-from PIL import Image
-import io
-import random
-from sklearn.cluster import KMeans
+from PIL import Image, ImageOps
+import heapq
+import logging
+import time
+from sklearn.cluster import KMeans, MiniBatchKMeans
 from collections import Counter
+from functools import lru_cache, reduce
+from itertools import combinations
+from concurrent.futures import ThreadPoolExecutor
+from .metrics import registry, stage
+
+logger = logging.getLogger(__name__)
 
 # Define color mapping for dominant colors
 COLOR_MAP = {
@@ -21,6 +28,39 @@ COLOR_MAP = {
     'orange': [(255, 100, 0), (255, 150, 50)],
 }
 
+# Category order used by the color lookup table
+COLOR_CATEGORIES = list(COLOR_MAP)
+
+# Bits kept per channel by the color lookup table (5 bits -> 32x32x32 cells)
+COLOR_LUT_BITS = 5
+
+# Number of colors reported in an item's palette
+PALETTE_SIZE = 3
+
+# Per-item feature embedding written at ingest (see feature_embedding)
+EMBEDDING_VERSION = 'v1'
+EMBEDDING_DIM = len(COLOR_MAP) + 3 + 3 + 2 + 4
+
+# Outfit scoring engine encodings; lists match the *_CHOICES tuples in models.py
+OUTFIT_CATEGORIES = ['tops', 'bottoms', 'dresses', 'outerwear', 'shoes', 'accessories']
+ITEM_COLORS = ['black', 'white', 'gray', 'blue', 'red', 'green', 'yellow', 'purple', 'pink', 'brown', 'orange', 'multi']
+ITEM_PATTERNS = ['solid', 'striped', 'plaid', 'floral', 'polka_dot', 'graphic', 'other']
+SEASON_BITS = {'spring': 1, 'summer': 2, 'fall': 4, 'winter': 8}
+ALL_SEASONS_MASK = 15
+NEUTRAL_COLOR_BITS = np.uint16(sum(1 << ITEM_COLORS.index(c) for c in ('black', 'white', 'gray')))
+SOLID_PATTERN_BIT = np.uint8(1 << ITEM_PATTERNS.index('solid'))
+COLOR_POPCOUNT = np.array([bin(i).count('1') for i in range(1 << len(ITEM_COLORS))], dtype=np.int8)
+MAX_OUTFIT_ITEMS = 4
+HARMONY_WEIGHT = 0.5  # Rank points per harmony penalty; less than one score point
+DEFAULT_CANDIDATE_BUDGET = 20000  # Candidate outfits scored per season
+
+# Outfit search: 'broadcast' scores a budgeted candidate set, 'branch_and_bound'
+# searches all combinations with pruning
+OUTFIT_SEARCH_STRATEGIES = ['broadcast', 'branch_and_bound']
+DEFAULT_SEARCH_STRATEGY = 'broadcast'
+DEFAULT_SEARCH_MAX_NODES = 200000
+DEFAULT_SEARCH_TIME_LIMIT = 0.5  # seconds per season
+
 # Pattern detection thresholds
 PATTERN_VARIANCE_THRESHOLDS = {
     'solid': 0.05,
@@ -31,66 +71,355 @@ PATTERN_VARIANCE_THRESHOLDS = {
     'graphic': 0.35,
 }
 
-def analyze_image(image_file):
-    """Analyze clothing item image to detect color and pattern"""
-    try:
-        # Open image and convert to RGB
-        img = Image.open(image_file)
+# Size images are downsampled to before analysis
+ANALYSIS_SIZE = (100, 100)
+
+# Analysis modes: 'accurate' clusters with KMeans, 'fast' uses a coarse color histogram
+ANALYSIS_MODES = ['accurate', 'fast']
+DEFAULT_ANALYSIS_MODE = 'accurate'
+
+# Bump when an analysis algorithm changes so cached results are not reused
+ANALYSIS_VERSIONS = {
+    'accurate': 'kmeans-4',
+    'fast': 'hist-3',
+}
+
+# Bits kept per channel by the fast histogram (3 bits -> 8x8x8 = 512 bins)
+HISTOGRAM_BITS = 3
+
+# Batch analysis settings
+BATCH_DECODE_WORKERS = 8
+BATCH_CODEBOOK_SIZE = 32  # Shared color codebook learned across a whole batch
+BATCH_SAMPLE_PIXELS = 200  # Pixels sampled per image to fit the codebook
+
+def load_image_pixels(image_file, pipeline='analyze_image'):
+    """Decode an image and downsample it to an RGB uint8 array for analysis
+
+    JPEGs are decoded straight at the smallest DCT scale that still covers
+    ANALYSIS_SIZE (draft mode), and other formats are shrunk with
+    Image.reduce before resampling, so a large photo is never held in memory
+    at full resolution. EXIF orientation is applied to the small image.
+    """
+    with stage(pipeline, 'decode'), Image.open(image_file) as img:
+        img.draft('RGB', ANALYSIS_SIZE)
+        # reduce() rejects palette, bilevel and 16-bit modes (PNG, GIF, TIFF)
+        if img.mode not in ('RGB', 'L'):
+            img = img.convert('RGB')
+        factor = min(img.width // ANALYSIS_SIZE[0], img.height // ANALYSIS_SIZE[1])
+        if factor >= 2:
+            img = img.reduce(factor)
         img = img.convert('RGB')
+    with stage(pipeline, 'resize'):
+        img = img.resize(ANALYSIS_SIZE)
+        img = ImageOps.exif_transpose(img)
+    return np.array(img)
+
+def compute_dhash(img_array):
+    """64-bit difference hash of an image array, robust to resizing and recompression"""
+    gray = Image.fromarray(img_array).convert('L').resize((9, 8))
+    pixels = np.asarray(gray, dtype=np.int16)
+    bits = (pixels[:, 1:] > pixels[:, :-1]).ravel()
+    return int(np.packbits(bits).view('>u8')[0])
+
+def mean_lab_color(img_array):
+    """Mean CIELAB color of an image array; tells apart images whose dHashes match"""
+    return rgb_to_lab(img_array.reshape(-1, 3)).mean(axis=0)
+
+def get_analysis_cache():
+    """Return the analysis cache module, or None when Django or the cache is unavailable"""
+    try:
+        from django.conf import settings
+        if not settings.configured:
+            return None
+        from . import analysis_cache
+    except ImportError:
+        return None
+    return analysis_cache if analysis_cache.cache_enabled() else None
+
+def get_analysis_mode(mode=None):
+    """Resolve the analysis mode from the argument or the IMAGE_ANALYSIS_MODE setting"""
+    if mode is None:
+        mode = get_setting('IMAGE_ANALYSIS_MODE', DEFAULT_ANALYSIS_MODE)
+    if mode not in ANALYSIS_MODES:
+        raise ValueError(f"Unknown analysis mode '{mode}', expected one of {ANALYSIS_MODES}")
+    return mode
+
+def dominant_color_kmeans(pixels):
+    """Dominant RGB color of an (n, 3) pixel array using KMeans clustering"""
+    # Use K-means to find dominant colors
+    kmeans = KMeans(n_clusters=5, random_state=42, n_init=10)
+    kmeans.fit(pixels)
+    
+    # Get the dominant colors
+    dominant_colors = kmeans.cluster_centers_.astype(int)
+    
+    # Count pixels in each cluster
+    labels_count = Counter(kmeans.labels_)
+    
+    # Sort by count
+    dominant_color_counts = [(dominant_colors[i], count) for i, count in labels_count.items()]
+    dominant_color_counts.sort(key=lambda x: x[1], reverse=True)
+    
+    return dominant_color_counts[0][0]
+
+def dominant_color_histogram(pixels):
+    """Dominant RGB color of an (n, 3) uint8 pixel array in O(n)
+
+    Pixels are quantized to HISTOGRAM_BITS per channel and counted with
+    np.bincount; the result is the mean color of the pixels in the fullest
+    bin, so it is not snapped to the bin corner.
+    """
+    pixels = pixels.astype(np.int64)
+    shift = 8 - HISTOGRAM_BITS
+    q = pixels >> shift
+    bins = (q[:, 0] << (2 * HISTOGRAM_BITS)) | (q[:, 1] << HISTOGRAM_BITS) | q[:, 2]
+    n_bins = 1 << (3 * HISTOGRAM_BITS)
+
+    counts = np.bincount(bins, minlength=n_bins)
+    top = counts.argmax()
+    mask = bins == top
+    return pixels[mask].mean(axis=0).astype(int)
+
+def analyze_image(image_file, raise_errors=False, use_cache=True, mode=None):
+    """Analyze clothing item image to detect color and pattern
+
+    image_file may be an uploaded file or a filesystem path. Errors are
+    swallowed and an empty dict returned unless raise_errors is set, which
+    the background analysis worker uses to record failures and retry.
+    Results are looked up in the analysis cache by exact content hash and
+    then by perceptual hash before any clustering is done. mode selects
+    'accurate' (KMeans) or 'fast' (histogram) color detection and defaults
+    to the IMAGE_ANALYSIS_MODE setting. Besides the dominant color the
+    result carries a 'palette' of the top colors with their pixel shares
+    and 'features' (pattern statistics and a feature embedding).
+    """
+    try:
+        version = ANALYSIS_VERSIONS[get_analysis_mode(mode)]
+        cache = get_analysis_cache() if use_cache else None
+        if cache:
+            with stage('analyze_image', 'cache_lookup'):
+                digest = cache.content_hash(image_file)
+                cached = cache.get_exact(digest, version)
+            if cached:
+                return cached
         
-        # Resize for faster processing
-        img = img.resize((100, 100))
-        
-        # Convert image to numpy array
-        img_array = np.array(img)
-        
-        # Reshape for clustering
-        pixels = img_array.reshape(-1, 3)
-        
-        # Use K-means to find dominant colors
-        kmeans = KMeans(n_clusters=5, random_state=42, n_init=10)
-        kmeans.fit(pixels)
-        
-        # Get the dominant colors
-        dominant_colors = kmeans.cluster_centers_.astype(int)
-        
-        # Count pixels in each cluster
-        labels_count = Counter(kmeans.labels_)
+        # Open image, convert to RGB and resize for faster processing
+        img_array = load_image_pixels(image_file)
         
-        # Sort by count
-        dominant_color_counts = [(dominant_colors[i], count) for i, count in labels_count.items()]
-        dominant_color_counts.sort(key=lambda x: x[1], reverse=True)
+        if cache:
+            with stage('analyze_image', 'cache_lookup'):
+                dhash = compute_dhash(img_array)
+                mean_lab = mean_lab_color(img_array)
+                cached = cache.get_near(dhash, mean_lab, version)
+                if cached:
+                    # Remember the exact bytes too so the next upload is a direct hit
+                    cache.store(digest, dhash, mean_lab, version, cached)
+                    return cached
+                cache.record_miss()
         
-        # Map dominant color to our color categories
-        detected_color = map_color_to_category(dominant_color_counts[0][0])
+        # Find the dominant color and map it to our color categories
+        with stage('analyze_image', 'color'):
+            pixels = img_array.reshape(-1, 3)
+            if version == ANALYSIS_VERSIONS['fast']:
+                dominant_color = dominant_color_histogram(pixels)
+            else:
+                dominant_color = dominant_color_kmeans(pixels)
+            detected_color = map_color_to_category(dominant_color)
         
         # Detect pattern
-        detected_pattern = detect_pattern(img_array)
+        with stage('analyze_image', 'pattern'):
+            stats = pattern_statistics(img_array)
+            detected_pattern = detect_pattern(img_array, stats)
         
-        return {
-            'color': detected_color,
-            'pattern': detected_pattern
-        }
+        with stage('analyze_image', 'features'):
+            results = {
+                'color': detected_color,
+                'pattern': detected_pattern,
+                'palette': color_palette(img_array, PALETTE_SIZE),
+                'features': image_features(img_array, stats),
+            }
+        if cache:
+            with stage('analyze_image', 'cache_store'):
+                cache.store(digest, dhash, mean_lab, version, results)
+        return results
     except Exception as e:
-        print(f"Error analyzing image: {e}")
+        registry.increment('analysis_errors', pipeline='analyze_image', error=type(e).__name__)
+        if raise_errors:
+            raise
+        logger.warning('Error analyzing image %s', getattr(image_file, 'name', image_file), exc_info=True)
         return {}
 
+def analyze_images(image_files, use_cache=True, mode=None):
+    """Analyze a batch of clothing images in one pass
+
+    Images are decoded in parallel threads (Pillow releases the GIL while
+    decoding) and stacked into a single pixel array. Instead of one KMeans
+    fit per image, a shared MiniBatchKMeans codebook is learned from a pixel
+    sample of the whole batch; every pixel is then quantized in one
+    vectorized predict. Each codeword is mapped to its color category and
+    an image's color is the category holding most of its pixels, so it does
+    not depend on the rest of the batch. In 'fast' mode each image's histogram estimate is used
+    instead and no clustering happens at all. Images already in the
+    analysis cache (by exact content hash) are skipped. Returns one result
+    dict per input, in order, with an empty dict for images that could not
+    be decoded.
+    """
+    image_files = list(image_files)
+    if not image_files:
+        return []
+
+    mode = get_analysis_mode(mode)
+    version = ANALYSIS_VERSIONS[mode]
+
+    results = [{} for _ in image_files]
+    cache = get_analysis_cache() if use_cache else None
+    pending = list(range(len(image_files)))
+    if cache:
+        with stage('analyze_images', 'cache_lookup'):
+            digests = [cache.content_hash(f) for f in image_files]
+            cached = cache.get_exact_many(digests, version)
+        for i, digest in enumerate(digests):
+            if digest in cached:
+                results[i] = cached[digest]
+        pending = [i for i in pending if not results[i]]
+
+    def decode(image_file):
+        try:
+            return load_image_pixels(image_file, pipeline='analyze_images')
+        except Exception as e:
+            registry.increment('analysis_errors', pipeline='analyze_images', error=type(e).__name__)
+            logger.warning('Error decoding image %s', getattr(image_file, 'name', image_file), exc_info=True)
+            return None
+
+    if not pending:
+        return results
+
+    with ThreadPoolExecutor(max_workers=min(BATCH_DECODE_WORKERS, len(pending))) as executor:
+        arrays = dict(zip(pending, executor.map(decode, [image_files[i] for i in pending])))
+
+    decoded = [i for i in pending if arrays[i] is not None]
+    if not decoded:
+        return results
+
+    # (n_images, pixels_per_image, 3)
+    stacked = np.stack([arrays[i] for i in decoded])
+    pixels = stacked.reshape(len(decoded), -1, 3)
+
+    with stage('analyze_images', 'color'):
+        if mode == 'fast':
+            detected_colors = [map_color_to_category(dominant_color_histogram(image_pixels)) for image_pixels in pixels]
+        else:
+            detected_colors = _dominant_colors_shared_codebook(pixels)
+
+    for position, i in enumerate(decoded):
+        with stage('analyze_images', 'pattern'):
+            stats = pattern_statistics(stacked[position])
+            detected_pattern = detect_pattern(stacked[position], stats)
+        with stage('analyze_images', 'features'):
+            results[i] = {
+                'color': detected_colors[position],
+                'pattern': detected_pattern,
+                'palette': color_palette(stacked[position], PALETTE_SIZE),
+                'features': image_features(stacked[position], stats),
+            }
+        if cache:
+            with stage('analyze_images', 'cache_store'):
+                cache.record_miss()
+                cache.store(digests[i], compute_dhash(stacked[position]), mean_lab_color(stacked[position]),
+                            version, results[i])
+
+    return results
+
+def _dominant_colors_shared_codebook(pixels):
+    """Dominant color category per image of an (n_images, n_pixels, 3) array via one shared codebook
+
+    Codewords are mapped to COLOR_CATEGORIES and each image takes the
+    category holding most of its pixels. Taking the most common codeword
+    instead made an image's color depend on which other images shared the
+    batch, since the batch decides how finely each color is split.
+    """
+    n_images, pixels_per_image, _ = pixels.shape
+
+    # Fit a shared codebook on a per-image sample of pixels
+    rng = np.random.default_rng(42)
+    sample_idx = rng.choice(pixels_per_image, size=min(BATCH_SAMPLE_PIXELS, pixels_per_image), replace=False)
+    sample = pixels[:, sample_idx].reshape(-1, 3).astype(np.float32)
+    n_clusters = min(BATCH_CODEBOOK_SIZE, len(np.unique(sample, axis=0)))
+    codebook = MiniBatchKMeans(n_clusters=n_clusters, random_state=42, n_init=3, batch_size=2048)
+    codebook.fit(sample)
+
+    # Quantize every pixel of every image at once
+    labels = codebook.predict(pixels.reshape(-1, 3).astype(np.float32)).reshape(n_images, -1)
+
+    # Per-image codeword histograms, summed per color category of the codeword
+    offsets = np.arange(n_images)[:, None] * n_clusters
+    counts = np.bincount((labels + offsets).ravel(), minlength=n_images * n_clusters).reshape(n_images, n_clusters)
+    codeword_categories = np.eye(len(COLOR_CATEGORIES), dtype=np.int64)[classify_pixels(codebook.cluster_centers_)]
+    dominant = (counts @ codeword_categories).argmax(axis=1)
+    return [COLOR_CATEGORIES[i] for i in dominant]
+
+def rgb_to_lab(rgb):
+    """Convert an (..., 3) array of sRGB values in 0-255 to CIELAB (D65)"""
+    rgb = np.asarray(rgb, dtype=np.float64) / 255.0
+    linear = np.where(rgb > 0.04045, ((rgb + 0.055) / 1.055) ** 2.4, rgb / 12.92)
+    xyz = linear @ np.array([
+        [0.4124564, 0.2126729, 0.0193339],
+        [0.3575761, 0.7151522, 0.1191920],
+        [0.1804375, 0.0721750, 0.9503041],
+    ])
+    xyz /= np.array([0.95047, 1.0, 1.08883])
+    f = np.where(xyz > 216 / 24389, np.cbrt(xyz), (24389 / 27 * xyz + 16) / 116)
+    return np.stack([
+        116 * f[..., 1] - 16,
+        500 * (f[..., 0] - f[..., 1]),
+        200 * (f[..., 1] - f[..., 2]),
+    ], axis=-1)
+
+@lru_cache(maxsize=None)
+def get_color_lut():
+    """Quantized RGB -> color category lookup table
+
+    Each channel is quantized to COLOR_LUT_BITS bits and every cell is
+    assigned the COLOR_MAP category whose reference color is nearest to the
+    cell center in CIELAB, so whole pixel arrays classify with one indexing
+    step. Built once per process (32x32x32 uint8, 32 KB).
+    """
+    levels = 1 << COLOR_LUT_BITS
+    step = 256 // levels
+    centers = np.arange(levels) * step + step // 2
+    grid = np.stack(np.meshgrid(centers, centers, centers, indexing='ij'), axis=-1).reshape(-1, 3)
+
+    references = [(index, ref) for index, refs in enumerate(COLOR_MAP.values()) for ref in refs]
+    reference_lab = rgb_to_lab([ref for _, ref in references])
+    reference_category = np.array([index for index, _ in references], dtype=np.uint8)
+
+    distances = ((rgb_to_lab(grid)[:, None, :] - reference_lab[None, :, :]) ** 2).sum(axis=-1)
+    lut = reference_category[distances.argmin(axis=1)]
+    lut.flags.writeable = False
+    return lut.reshape(levels, levels, levels)
+
+def classify_pixels(pixels):
+    """Map an (..., 3) array of RGB pixels to COLOR_CATEGORIES indices in one step"""
+    q = np.clip(np.asarray(pixels), 0, 255).astype(np.uint8) >> (8 - COLOR_LUT_BITS)
+    return get_color_lut()[q[..., 0], q[..., 1], q[..., 2]]
+
 def map_color_to_category(rgb_color):
     """Map RGB color to predefined color category"""
-    min_distance = float('inf')
-    closest_color = 'other'
-    
-    for color_name, color_ranges in COLOR_MAP.items():
-        for color_range in color_ranges:
-            distance = np.sqrt(sum((rgb_color - color_range) ** 2))
-            if distance < min_distance:
-                min_distance = distance
-                closest_color = color_name
-    
-    return closest_color
+    return COLOR_CATEGORIES[int(classify_pixels(rgb_color))]
 
-def detect_pattern(img_array):
-    """Detect pattern in image using variance analysis"""
+def color_palette(pixels, top_k=3):
+    """Top-k color categories of an image with their share of pixels"""
+    labels = classify_pixels(pixels.reshape(-1, 3))
+    counts = np.bincount(labels, minlength=len(COLOR_CATEGORIES))
+    order = np.argsort(counts)[::-1][:top_k]
+    total = counts.sum()
+    return [
+        {'color': COLOR_CATEGORIES[i], 'share': round(float(counts[i] / total), 3)}
+        for i in order if counts[i]
+    ]
+
+def pattern_statistics(img_array):
+    """Variance statistics of the four image quadrants used for pattern detection"""
     # Calculate variance in different regions of the image
     h, w, _ = img_array.shape
     
@@ -103,9 +432,20 @@ def detect_pattern(img_array):
     ]
     
     # Calculate variance for each region
-    variances = [np.var(region) for region in regions]
-    avg_variance = np.mean(variances)
-    variance_ratio = np.std(variances) / (avg_variance + 1e-10)  # Avoid division by zero
+    variances = [float(np.var(region)) for region in regions]
+    avg_variance = float(np.mean(variances))
+    variance_ratio = float(np.std(variances) / (avg_variance + 1e-10))  # Avoid division by zero
+    
+    return {
+        'region_variances': variances,
+        'avg_variance': avg_variance,
+        'variance_ratio': variance_ratio,
+    }
+
+def detect_pattern(img_array, stats=None):
+    """Detect pattern in image using variance analysis"""
+    stats = stats or pattern_statistics(img_array)
+    variance_ratio = stats['variance_ratio']
     
     # Determine pattern based on variance
     if variance_ratio < PATTERN_VARIANCE_THRESHOLDS['solid']:
@@ -121,131 +461,367 @@ def detect_pattern(img_array):
     else:
         return 'floral'
 
-def generate_outfit_suggestions(items, style_prefs):
-    """Generate outfit suggestions based on user's wardrobe and preferences"""
-    # Convert QuerySet to list for easier manipulation
-    items_list = list(items)
-    
-    if len(items_list) < 2:
-        return []
-    
-    # Get user preferences
-    favorite_colors = style_prefs.get_favorite_colors()
-    preferred_patterns = style_prefs.get_preferred_patterns()
-    style_preference = style_prefs.style_preference
-    casual_formal_balance = style_prefs.casual_formal_balance
-    seasonal_prefs = style_prefs.get_seasonal_preferences()
-    occasion_prefs = style_prefs.get_occasion_preferences()
-    
-    # Determine seasons to prioritize based on preferences
-    prioritized_seasons = []
-    for season, is_preferred in seasonal_prefs.items():
-        if is_preferred:
-            prioritized_seasons.append(season)
-    
-    if not prioritized_seasons:
-        prioritized_seasons = ['spring', 'summer', 'fall', 'winter']
-    
-    # Determine occasions to prioritize
-    prioritized_occasions = occasion_prefs if occasion_prefs else ['casual', 'formal', 'business']
-    
-    # Generate outfit suggestions
-    suggestions = []
-    num_suggestions = min(6, len(items_list) // 2 + 1)  # Generate up to 6 suggestions
-    
-    for i in range(num_suggestions):
-        # Randomly select a season and occasion from priorities
-        season = random.choice(prioritized_seasons)
-        occasion = random.choice(prioritized_occasions)
-        
-        # Filter items by season (include 'all' season items)
-        seasonal_items = [item for item in items_list if item.season == season or item.season == 'all']
-        
-        if len(seasonal_items) < 2:
-            seasonal_items = items_list  # Fallback to all items if not enough seasonal items
-        
-        # Determine number of items for this outfit (2-4 items)
-        num_items = min(random.randint(2, 4), len(seasonal_items))
-        
-        # Select items for the outfit
-        outfit_items = select_compatible_items(seasonal_items, num_items, favorite_colors, preferred_patterns)
-        
-        if not outfit_items or len(outfit_items) < 2:
-            continue  # Skip if we couldn't find compatible items
-        
-        # Generate outfit name
-        outfit_name = generate_outfit_name(outfit_items, occasion, season)
-        
-        # Generate style notes
-        style_notes = generate_style_notes(outfit_items, occasion, season)
-        
-        # Calculate AI score
-        ai_score = calculate_outfit_score(outfit_items, favorite_colors, preferred_patterns, occasion, season)
-        
-        # Create suggestion
-        suggestion = {
-            'name': outfit_name,
-            'items': [item.id for item in outfit_items],
-            'occasion': occasion,
-            'season': season,
-            'style': style_preference,
-            'style_notes': style_notes,
-            'ai_score': ai_score
-        }
-        
-        suggestions.append(suggestion)
-    
-    return suggestions
+def feature_embedding(img_array, stats):
+    """Compact float32 feature vector describing an item's colors and texture
 
-def select_compatible_items(items, num_items, favorite_colors, preferred_patterns):
-    """Select compatible items for an outfit"""
-    # Group items by category
-    categories = {}
-    for item in items:
-        if item.category not in categories:
-            categories[item.category] = []
-        categories[item.category].append(item)
-    
-    # Ensure we have at least 2 different categories
-    if len(categories) < 2:
+    Layout (EMBEDDING_DIM values): share of pixels in each COLOR_CATEGORIES
+    entry, mean and standard deviation of the image in CIELAB (scaled to
+    roughly 0-1), log average quadrant variance, variance ratio, and the
+    four quadrant variances normalized by their sum.
+    """
+    labels = classify_pixels(img_array.reshape(-1, 3))
+    color_shares = np.bincount(labels, minlength=len(COLOR_CATEGORIES)) / labels.size
+
+    lab = rgb_to_lab(img_array.reshape(-1, 3))
+    lab_scale = np.array([100.0, 128.0, 128.0])
+    lab_mean = lab.mean(axis=0) / lab_scale
+    lab_std = lab.std(axis=0) / lab_scale
+
+    variances = np.array(stats['region_variances'])
+    variance_shares = variances / (variances.sum() + 1e-10)
+    texture = [np.log1p(stats['avg_variance']) / 10.0, stats['variance_ratio']]
+
+    return np.concatenate([color_shares, lab_mean, lab_std, texture, variance_shares]).astype(np.float32)
+
+def image_features(img_array, stats):
+    """Feature record stored alongside an analysis result"""
+    return {
+        'pattern_stats': stats,
+        'embedding': [round(float(v), 6) for v in feature_embedding(img_array, stats)],
+        'embedding_version': EMBEDDING_VERSION,
+    }
+
+def get_setting(name, default):
+    """Read a Django setting, falling back to default when Django is not configured"""
+    try:
+        from django.conf import settings
+        if settings.configured:
+            return getattr(settings, name, default)
+    except ImportError:
+        pass
+    return default
+
+def outfit_category_combos():
+    """Category index combinations that make a valid outfit (2-4 items)
+
+    A dress replaces a top and bottom, so it is never combined with them.
+    """
+    dresses = OUTFIT_CATEGORIES.index('dresses')
+    separates = {OUTFIT_CATEGORIES.index('tops'), OUTFIT_CATEGORIES.index('bottoms')}
+    combos = []
+    for size in range(2, MAX_OUTFIT_ITEMS + 1):
+        for combo in combinations(range(len(OUTFIT_CATEGORIES)), size):
+            if dresses in combo and separates & set(combo):
+                continue
+            combos.append(combo)
+    return combos
+
+OUTFIT_CATEGORY_COMBOS = outfit_category_combos()
+
+def encode_items(items, color_mask=0, pattern_mask=0):
+    """Encode clothing items as integer/bitmask arrays for vectorized scoring
+
+    color_mask and pattern_mask are the user's favorite colors and preferred
+    patterns as bitmasks over ITEM_COLORS and ITEM_PATTERNS.
+    """
+    category_index = {category: i for i, category in enumerate(OUTFIT_CATEGORIES)}
+    color_bit = {color: 1 << i for i, color in enumerate(ITEM_COLORS)}
+    pattern_bit = {pattern: 1 << i for i, pattern in enumerate(ITEM_PATTERNS)}
+
+    color_bits = np.array([color_bit.get(item.color, 0) for item in items], dtype=np.uint16)
+    pattern_bits = np.array([pattern_bit.get(item.pattern, 0) for item in items], dtype=np.uint8)
+    return {
+        'category': np.array([category_index.get(item.category, -1) for item in items], dtype=np.int8),
+        'color_bits': color_bits,
+        'pattern_bits': pattern_bits,
+        'season_mask': np.array([ALL_SEASONS_MASK if item.season == 'all' else SEASON_BITS.get(item.season, 0)
+                                 for item in items], dtype=np.uint8),
+        # Per-item contribution to calculate_outfit_score before averaging
+        'preference': (10 * ((color_bits & np.uint16(color_mask)) != 0) +
+                       10 * ((pattern_bits & np.uint8(pattern_mask)) != 0)).astype(np.float32),
+    }
+
+def seasonal_mask(encoded, season):
+    """Items wearable in a season (including 'all'), or every item if fewer than two are"""
+    in_season = (encoded['season_mask'] & SEASON_BITS.get(season, ALL_SEASONS_MASK)) != 0
+    if in_season.sum() < 2:
+        in_season = np.ones(len(encoded['category']), dtype=bool)  # Fallback to all items if not enough seasonal items
+    return in_season
+
+def score_outfit_candidates(encoded, season, candidate_budget, top_n, rng):
+    """Score candidate outfits for a season with NumPy broadcasting
+
+    For every valid category combination the best items of each category
+    (by preference, ties broken randomly) are crossed with np.ix_, so each
+    combination is scored as one dense array. The number of items kept per
+    category is chosen so the total candidate count stays within
+    candidate_budget, which bounds latency for very large wardrobes.
+    Returns up to top_n (rank, score, item_indices) tuples, best first.
+    The score reproduces calculate_outfit_score; rank adds a color/pattern
+    harmony tie-breaker and a little noise so repeated runs vary.
+    """
+    n_items = len(encoded['category'])
+    in_season = seasonal_mask(encoded, season)
+
+    # Rank items within each category by preference, breaking ties randomly
+    order_key = encoded['preference'] + rng.random(n_items).astype(np.float32) * 0.5
+    ranked = {}
+    for category in range(len(OUTFIT_CATEGORIES)):
+        members = np.flatnonzero(in_season & (encoded['category'] == category))
+        if len(members):
+            ranked[category] = members[np.argsort(-order_key[members])]
+
+    combos = [combo for combo in OUTFIT_CATEGORY_COMBOS if all(c in ranked for c in combo)]
+    if not combos:
         return []
+
+    tops, bottoms = OUTFIT_CATEGORIES.index('tops'), OUTFIT_CATEGORIES.index('bottoms')
+    per_combo_budget = max(1, candidate_budget // len(combos))
+    candidates = []
+    for combo in combos:
+        per_category = max(1, int(per_combo_budget ** (1.0 / len(combo))))
+        pools = [ranked[c][:per_category] for c in combo]
+        grids = np.ix_(*pools)
+
+        preference = sum(encoded['preference'][g] for g in grids)
+        category_bonus = 10 if tops in combo and bottoms in combo else 0
+        score = np.minimum(70 + preference / len(combo) + category_bonus, 100).astype(np.int16)
+
+        # Harmony: penalize more than two non-neutral colors or more than one loud pattern
+        colors = reduce(np.bitwise_or, [encoded['color_bits'][g] & ~NEUTRAL_COLOR_BITS for g in grids])
+        loud_patterns = sum((encoded['pattern_bits'][g] & ~SOLID_PATTERN_BIT) != 0 for g in grids)
+        harmony = -np.maximum(COLOR_POPCOUNT[colors] - 2, 0) - np.maximum(loud_patterns - 1, 0)
+
+        rank = score + HARMONY_WEIGHT * harmony + rng.random(score.shape) * 0.1
+        flat_rank = rank.ravel()
+        keep = min(top_n, flat_rank.size)
+        best = np.argpartition(-flat_rank, keep - 1)[:keep]
+        coords = np.unravel_index(best, rank.shape)
+        for position, flat_index in enumerate(best):
+            item_indices = tuple(int(pools[d][coords[d][position]]) for d in range(len(combo)))
+            candidates.append((float(flat_rank[flat_index]), int(score.flat[flat_index]), item_indices))
+
+    candidates.sort(key=lambda c: c[0], reverse=True)
+    return candidates[:top_n]
+
+def search_best_outfits(encoded, season, top_n, max_nodes=None, time_limit=None, rng=None):
+    """Branch-and-bound search for the top_n outfits by calculate_outfit_score
+
+    Category slots are visited in a fixed order; at each slot the search
+    either adds one item of that category (best preference first) or skips
+    the slot. A node is pruned when an admissible upper bound on the score
+    of any completion cannot beat the current top_n. That bound is the best
+    mean preference reachable by adding the best remaining item of each
+    open slot, plus the tops/bottoms bonus if it is still reachable.
+    The search stops early when max_nodes or time_limit (seconds) runs
+    out; stats['complete'] says whether the result is provably optimal.
+    Returns (candidates, stats) with candidates in the format of
+    score_outfit_candidates.
+    """
+    if max_nodes is None:
+        max_nodes = get_setting('OUTFIT_SEARCH_MAX_NODES', DEFAULT_SEARCH_MAX_NODES)
+    if time_limit is None:
+        time_limit = get_setting('OUTFIT_SEARCH_TIME_LIMIT', DEFAULT_SEARCH_TIME_LIMIT)
+    rng = rng or np.random.default_rng()
+
+    in_season = seasonal_mask(encoded, season)
+    preference = encoded['preference']
+    tops, bottoms, dresses = (OUTFIT_CATEGORIES.index(c) for c in ('tops', 'bottoms', 'dresses'))
+
+    # Items of each category, best preference first (ties shuffled for variety)
+    slots = []
+    for category in range(len(OUTFIT_CATEGORIES)):
+        members = np.flatnonzero(in_season & (encoded['category'] == category))
+        if len(members):
+            members = members[rng.permutation(len(members))]
+            members = members[np.argsort(-preference[members], kind='stable')]
+            slots.append((category, [int(i) for i in members], [float(preference[i]) for i in members]))
+
+    stats = {'nodes_expanded': 0, 'nodes_pruned': 0, 'outfits_scored': 0, 'complete': True}
+    best = []  # Min-heap of (score, tiebreak, item_indices)
+    deadline = time.perf_counter() + time_limit
+
+    def allowed(category, chosen_categories):
+        if category == dresses:
+            return tops not in chosen_categories and bottoms not in chosen_categories
+        if category in (tops, bottoms):
+            return dresses not in chosen_categories
+        return True
+
+    def upper_bound(position, chosen_categories, total, count):
+        open_slots = [slot for slot in slots[position:] if allowed(slot[0], chosen_categories)]
+        remaining = sorted((slot[2][0] for slot in open_slots), reverse=True)
+        best_mean = None
+        running = total
+        for extra in range(0, min(MAX_OUTFIT_ITEMS - count, len(remaining)) + 1):
+            if extra:
+                running += remaining[extra - 1]
+            if count + extra >= 2:
+                mean = running / (count + extra)
+                best_mean = mean if best_mean is None else max(best_mean, mean)
+        if best_mean is None:
+            return None
+        open_categories = {slot[0] for slot in open_slots} | set(chosen_categories)
+        bonus = 10 if tops in open_categories and bottoms in open_categories else 0
+        return int(min(70 + best_mean + bonus, 100))
+
+    def threshold():
+        return best[0][0] if len(best) >= top_n else -1
+
+    def visit(position, chosen, chosen_categories, total):
+        if stats['nodes_expanded'] >= max_nodes or time.perf_counter() > deadline:
+            stats['complete'] = False
+            return
+        stats['nodes_expanded'] += 1
+
+        if position == len(slots) or len(chosen) == MAX_OUTFIT_ITEMS:
+            if len(chosen) >= 2:
+                bonus = 10 if tops in chosen_categories and bottoms in chosen_categories else 0
+                score = int(min(70 + total / len(chosen) + bonus, 100))
+                stats['outfits_scored'] += 1
+                entry = (score, rng.random(), tuple(chosen))
+                if len(best) < top_n:
+                    heapq.heappush(best, entry)
+                elif score > best[0][0]:
+                    heapq.heapreplace(best, entry)
+            return
+
+        category, members, prefs = slots[position]
+        if allowed(category, chosen_categories):
+            for item, pref in zip(members, prefs):
+                bound = upper_bound(position + 1, chosen_categories + [category], total + pref, len(chosen) + 1)
+                if bound is None or bound <= threshold():
+                    # Later items have lower or equal preference, so they cannot do better
+                    stats['nodes_pruned'] += 1
+                    break
+                visit(position + 1, chosen + [item], chosen_categories + [category], total + pref)
+
+        # Skip this slot
+        bound = upper_bound(position + 1, chosen_categories, total, len(chosen))
+        if bound is None or bound <= threshold():
+            stats['nodes_pruned'] += 1
+            return
+        visit(position + 1, chosen, chosen_categories, total)
+
+    visit(0, [], [], 0.0)
+    candidates = [(score + tiebreak * 0.1, score, item_indices)
+                  for score, tiebreak, item_indices in sorted(best, reverse=True)]
+    return candidates, stats
+
+def prioritized_seasons(style_prefs):
+    """Seasons to suggest outfits for: the preferred ones, or all four"""
+    return [season for season in style_prefs.seasons if season in SEASON_BITS] or ['spring', 'summer', 'fall', 'winter']
+
+def prioritized_occasions(style_prefs):
+    """Occasions to suggest outfits for: the preferred ones, or a default mix"""
+    return list(style_prefs.occasions) or ['casual', 'formal', 'business']
+
+def find_outfit_candidates(encoded, seasons, top_n, candidate_budget=None, strategy=None, rng=None, stats=None):
+    """Best candidate outfits for each season as {season: [item_indices, ...]}, best first
+
+    Candidates come from score_outfit_candidates (strategy 'broadcast') or
+    search_best_outfits ('branch_and_bound'); the default comes from the
+    OUTFIT_SEARCH_STRATEGY setting. The score does not depend on the
+    occasion, so candidates are found once per season. If a stats dict is
+    passed, per-season search statistics are stored in it.
+    """
+    if candidate_budget is None:
+        candidate_budget = get_setting('OUTFIT_CANDIDATE_BUDGET', DEFAULT_CANDIDATE_BUDGET)
+    if strategy is None:
+        strategy = get_setting('OUTFIT_SEARCH_STRATEGY', DEFAULT_SEARCH_STRATEGY)
+    if strategy not in OUTFIT_SEARCH_STRATEGIES:
+        raise ValueError(f"Unknown outfit search strategy '{strategy}', expected one of {OUTFIT_SEARCH_STRATEGIES}")
+    rng = rng if rng is not None else np.random.default_rng()
+
+    candidates = {}
+    for season in seasons:
+        if strategy == 'branch_and_bound':
+            season_candidates, season_stats = search_best_outfits(encoded, season, top_n, rng=rng)
+            if stats is not None:
+                stats[season] = season_stats
+        else:
+            season_candidates = score_outfit_candidates(encoded, season, candidate_budget, top_n, rng)
+        candidates[season] = [tuple(int(i) for i in item_indices) for _, _, item_indices in season_candidates]
+    return candidates
+
+def deal_outfit_suggestions(items_list, style_prefs, candidates, num_suggestions, rng, skip=None):
+    """Turn per-season candidates into suggestion dicts
+
+    The best unused candidates are dealt out round-robin over shuffled
+    season/occasion pairs. Candidates whose item id set is in skip (a set
+    of frozensets of item ids) are passed over, as are repeats.
+    """
+    favorite_colors = style_prefs.favorite_colors
+    preferred_patterns = style_prefs.preferred_patterns
+    occasions = prioritized_occasions(style_prefs)
+    remaining = {season: iter(season_candidates) for season, season_candidates in candidates.items()}
+    
+    slots = [(season, occasion) for occasion in occasions for season in remaining]
+    rng.shuffle(slots)
     
-    # Select one item from each category until we have enough
-    selected_items = []
-    selected_categories = []
-    
-    # Prioritize essential categories: tops and bottoms
-    essential_categories = ['tops', 'bottoms']
-    for category in essential_categories:
-        if category in categories and categories[category]:
-            # Prioritize favorite colors and patterns
-            category_items = categories[category]
-            preferred_items = [item for item in category_items 
-                              if item.color in favorite_colors or item.pattern in preferred_patterns]
+    suggestions = []
+    seen = set(skip or ())
+    while len(suggestions) < num_suggestions and slots:
+        for season, occasion in list(slots):
+            if len(suggestions) >= num_suggestions:
+                break
             
-            if preferred_items:
-                selected_item = random.choice(preferred_items)
+            # Take the season's best candidate not already suggested
+            for item_indices in remaining[season]:
+                item_ids = frozenset(items_list[i].id for i in item_indices)
+                if item_ids not in seen:
+                    break
             else:
-                selected_item = random.choice(category_items)
+                slots.remove((season, occasion))
+                continue
+            seen.add(item_ids)
+            outfit_items = [items_list[i] for i in item_indices]
             
-            selected_items.append(selected_item)
-            selected_categories.append(category)
+            suggestions.append({
+                'name': generate_outfit_name(outfit_items, occasion, season, rng),
+                'items': [item.id for item in outfit_items],
+                'occasion': occasion,
+                'season': season,
+                'style': style_prefs.style,
+                'style_notes': generate_style_notes(outfit_items, occasion, season),
+                'ai_score': calculate_outfit_score(outfit_items, favorite_colors, preferred_patterns, occasion, season),
+            })
     
-    # If we still need more items, add from other categories
-    remaining_categories = [cat for cat in categories.keys() if cat not in selected_categories]
+    return suggestions
+
+def generate_outfit_suggestions(items, style_prefs, num_suggestions=None, candidate_budget=None,
+                                random_state=None, strategy=None, stats=None):
+    """Generate outfit suggestions based on user's wardrobe and preferences
+
+    Finds candidate outfits for each prioritized season with
+    find_outfit_candidates, then deals them out over season/occasion pairs
+    with deal_outfit_suggestions.
+
+    style_prefs is a preferences.Preferences (any object with its masks,
+    favorite_colors, preferred_patterns, seasons, occasions and style).
+    """
+    # Convert QuerySet to list for easier manipulation
+    items_list = list(items)
     
-    while len(selected_items) < num_items and remaining_categories:
-        category = random.choice(remaining_categories)
-        remaining_categories.remove(category)
-        
-        if categories[category]:
-            selected_item = random.choice(categories[category])
-            selected_items.append(selected_item)
+    if len(items_list) < 2:
+        return []
     
-    return selected_items
+    if num_suggestions is None:
+        num_suggestions = min(6, len(items_list) // 2 + 1)  # Generate up to 6 suggestions
+    rng = np.random.default_rng(random_state)
+    
+    with stage('suggestions', 'encode'):
+        encoded = encode_items(items_list, style_prefs.color_mask, style_prefs.pattern_mask)
+    top_n = num_suggestions * len(prioritized_occasions(style_prefs))
+    with stage('suggestions', 'search'):
+        candidates = find_outfit_candidates(encoded, prioritized_seasons(style_prefs), top_n,
+                                            candidate_budget, strategy, rng, stats)
+    with stage('suggestions', 'deal'):
+        return deal_outfit_suggestions(items_list, style_prefs, candidates, num_suggestions, rng)
 
-def generate_outfit_name(items, occasion, season):
-    """Generate a name for the outfit"""
+def generate_outfit_name(items, occasion, season, rng=None):
+    """Generate a name for the outfit, picking adjectives with the NumPy Generator rng"""
+    rng = rng if rng is not None else np.random.default_rng()
     occasion_adjectives = {
         'casual': ['Relaxed', 'Casual', 'Everyday', 'Laid-back'],
         'formal': ['Elegant', 'Formal', 'Sophisticated', 'Polished'],
@@ -264,8 +840,8 @@ def generate_outfit_name(items, occasion, season):
     }
     
     # Get adjectives for this occasion and season
-    occasion_adj = random.choice(occasion_adjectives.get(occasion, ['Stylish']))
-    season_adj = random.choice(season_adjectives.get(season, ['Seasonal']))
+    occasion_adj = str(rng.choice(occasion_adjectives.get(occasion, ['Stylish'])))
+    season_adj = str(rng.choice(season_adjectives.get(season, ['Seasonal'])))
     
     # Generate name
     return f"{occasion_adj} {season_adj} Ensemble"
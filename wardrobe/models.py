@@ -1,7 +1,7 @@
 from django.db import models
 from django.contrib.auth.models import User
 from django.utils import timezone
-import json
+import hashlib
 
 CATEGORY_CHOICES = [
     ('tops', 'Tops'),
@@ -67,6 +67,20 @@ STYLE_CHOICES = [
     ('business', 'Business'),
 ]
 
+ANALYSIS_STATUS_CHOICES = [
+    ('pending', 'Analysis Pending'),
+    ('complete', 'Analysis Complete'),
+    ('failed', 'Analysis Failed'),
+    ('skipped', 'Analysis Skipped'),
+]
+
+JOB_STATUS_CHOICES = [
+    ('queued', 'Queued'),
+    ('running', 'Running'),
+    ('done', 'Done'),
+    ('failed', 'Failed'),
+]
+
 class UserProfile(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
     bio = models.TextField(max_length=500, blank=True)
@@ -84,12 +98,136 @@ class ClothingItem(models.Model):
     season = models.CharField(max_length=20, choices=SEASON_CHOICES)
     description = models.TextField(blank=True)
     image = models.ImageField(upload_to='clothing_items')
+    image_hash = models.CharField(max_length=64, blank=True, db_index=True)  # SHA-256, names renditions
     date_added = models.DateTimeField(default=timezone.now)
     favorite = models.BooleanField(default=False)
+    analysis_status = models.CharField(max_length=20, choices=ANALYSIS_STATUS_CHOICES, default='pending')
+    
+    class Meta:
+        # Listings page through (date_added, id); id is implicit in SQLite indexes
+        indexes = [
+            models.Index(fields=['user', 'date_added'], name='item_user_added_idx'),
+            models.Index(fields=['user', 'category', 'date_added'], name='item_user_cat_added_idx'),
+        ]
     
     def __str__(self):
         return self.name
 
+class AnalysisJob(models.Model):
+    """Queued image analysis for a clothing item, processed by run_analysis_worker"""
+    item = models.ForeignKey(ClothingItem, on_delete=models.CASCADE, related_name='analysis_jobs')
+    status = models.CharField(max_length=20, choices=JOB_STATUS_CHOICES, default='queued')
+    attempts = models.IntegerField(default=0)
+    max_attempts = models.IntegerField(default=3)
+    last_error = models.TextField(blank=True)
+    run_after = models.DateTimeField(default=timezone.now)  # Retry backoff
+    locked_by = models.CharField(max_length=100, blank=True)
+    locked_at = models.DateTimeField(null=True, blank=True)
+    date_created = models.DateTimeField(default=timezone.now)
+    date_finished = models.DateTimeField(null=True, blank=True)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['status', 'run_after']),
+        ]
+    
+    def __str__(self):
+        return f'Analysis of {self.item.name} ({self.status})'
+
+class ItemFeatures(models.Model):
+    """Image features of a clothing item, extracted once at ingest"""
+    item = models.OneToOneField(ClothingItem, on_delete=models.CASCADE, related_name='features')
+    user = models.ForeignKey(User, on_delete=models.CASCADE)  # Denormalized for one-query loads
+    palette = models.JSONField(default=list)  # [{'color': ..., 'share': ...}, ...]
+    pattern_stats = models.JSONField(default=dict)  # Output of ml_utils.pattern_statistics
+    embedding = models.BinaryField()  # Packed little-endian float32 vector
+    embedding_version = models.CharField(max_length=20)
+    date_updated = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        indexes = [
+            models.Index(fields=['user', 'embedding_version']),
+        ]
+    
+    def __str__(self):
+        return f'Features of {self.item_id} ({self.embedding_version})'
+
+STATS_FIELDS = ['category', 'color', 'pattern', 'season']
+
+class WardrobeStats(models.Model):
+    """Per-user wardrobe counts, kept in sync by signals on ClothingItem"""
+    user = models.OneToOneField(User, on_delete=models.CASCADE, related_name='wardrobe_stats')
+    total_items = models.IntegerField(default=0)
+    category_counts = models.JSONField(default=dict)  # {'tops': 4, ...}; zero counts are dropped
+    color_counts = models.JSONField(default=dict)
+    pattern_counts = models.JSONField(default=dict)
+    season_counts = models.JSONField(default=dict)
+    style_score = models.IntegerField(default=0)
+    version = models.PositiveIntegerField(default=0)  # Bumped on every item change; keys cached suggestions
+    date_updated = models.DateTimeField(default=timezone.now)
+    
+    def __str__(self):
+        return f'Wardrobe stats of {self.user.username}'
+    
+    def counts(self, field):
+        return getattr(self, f'{field}_counts')
+    
+    def calculate_style_score(self):
+        """Style score based on wardrobe variety"""
+        if not self.total_items:
+            return 0
+        
+        category_score = min(len(self.category_counts) * 10, 30)  # Max 30 points
+        color_score = min(len(self.color_counts) * 5, 30)  # Max 30 points
+        pattern_score = min(len(self.pattern_counts) * 10, 30)  # Max 30 points
+        season_score = min(len(self.season_counts) * 2.5, 10)  # Max 10 points
+        return int(category_score + color_score + pattern_score + season_score)
+
+class ImageAnalysisCache(models.Model):
+    """Stored analysis result for an image, keyed by content and perceptual hash"""
+    content_hash = models.CharField(max_length=64)  # SHA-256 of the uploaded bytes
+    dhash = models.BigIntegerField()  # 64-bit difference hash, stored signed
+    # 16-bit bands of the dHash; near duplicates share at least one band
+    dhash_band0 = models.IntegerField()
+    dhash_band1 = models.IntegerField()
+    dhash_band2 = models.IntegerField()
+    dhash_band3 = models.IntegerField()
+    mean_lab = models.JSONField(default=list)  # Mean CIELAB color, checked on near-duplicate hits
+    version = models.CharField(max_length=20)  # Analysis algorithm that produced the result
+    color = models.CharField(max_length=20, choices=COLOR_CHOICES)
+    pattern = models.CharField(max_length=20, choices=PATTERN_CHOICES)
+    palette = models.JSONField(default=list)  # Top colors with pixel shares
+    features = models.JSONField(default=dict)  # Pattern statistics and embedding
+    hits = models.IntegerField(default=0)
+    last_used = models.DateTimeField(default=timezone.now)
+    date_created = models.DateTimeField(default=timezone.now)
+    
+    class Meta:
+        unique_together = ('content_hash', 'version')
+        indexes = [
+            models.Index(fields=['last_used']),
+            models.Index(fields=['dhash_band0']),
+            models.Index(fields=['dhash_band1']),
+            models.Index(fields=['dhash_band2']),
+            models.Index(fields=['dhash_band3']),
+        ]
+    
+    def __str__(self):
+        return f'{self.content_hash[:12]} -> {self.color}/{self.pattern}'
+
+class AnalysisCacheCounter(models.Model):
+    """Persistent hit/miss counters for the image analysis cache"""
+    name = models.CharField(max_length=50, unique=True)
+    value = models.BigIntegerField(default=0)
+    
+    def __str__(self):
+        return f'{self.name}: {self.value}'
+
+def outfit_fingerprint(item_ids):
+    """Canonical identity of an outfit: SHA-256 of its sorted, de-duplicated item ids"""
+    canonical = ','.join(str(item_id) for item_id in sorted(set(int(i) for i in item_ids)))
+    return hashlib.sha256(canonical.encode()).hexdigest()
+
 class Outfit(models.Model):
     user = models.ForeignKey(User, on_delete=models.CASCADE)
     name = models.CharField(max_length=100)
@@ -100,6 +238,22 @@ class Outfit(models.Model):
     style_notes = models.TextField(blank=True)
     ai_score = models.IntegerField(default=0)  # 0-100 score
     date_created = models.DateTimeField(default=timezone.now)
+    # outfit_fingerprint of the item set; blank for outfits not yet fingerprinted
+    item_fingerprint = models.CharField(max_length=64, blank=True, db_index=True)
+    
+    class Meta:
+        # Listings page through (ai_score, id) under the occasion/season filters
+        indexes = [
+            models.Index(fields=['user', 'ai_score'], name='outfit_user_score_idx'),
+            models.Index(fields=['user', 'occasion', 'season', 'ai_score'], name='outfit_user_occ_season_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(
+                fields=['user', 'item_fingerprint'],
+                condition=~models.Q(item_fingerprint=''),
+                name='unique_outfit_items_per_user',
+            ),
+        ]
     
     def __str__(self):
         return self.name
@@ -111,43 +265,72 @@ class SavedOutfit(models.Model):
     
     class Meta:
         unique_together = ('user', 'outfit')
+        indexes = [
+            models.Index(fields=['user', 'date_saved'], name='saved_user_date_idx'),
+        ]
     
     def __str__(self):
         return f'{self.user.username} - {self.outfit.name}'
 
+def choice_mask(values, choices):
+    """Bitmask of values, where bit i stands for the i-th entry of choices"""
+    positions = {value: i for i, (value, _) in enumerate(choices)}
+    mask = 0
+    for value in values:
+        if value in positions:
+            mask |= 1 << positions[value]
+    return mask
+
+def choice_values(mask, choices):
+    """Values of choices whose bits are set in mask, in choices order"""
+    return [value for i, (value, _) in enumerate(choices) if mask & (1 << i)]
+
 class StylePreference(models.Model):
     user = models.OneToOneField(User, on_delete=models.CASCADE)
-    favorite_colors = models.CharField(max_length=255, blank=True)  # Stored as JSON
-    preferred_patterns = models.CharField(max_length=255, blank=True)  # Stored as JSON
+    # Bitmasks over the matching *_CHOICES; bit i set means the i-th choice is preferred
+    favorite_color_mask = models.IntegerField(default=0)
+    pattern_mask = models.IntegerField(default=0)
+    season_mask = models.IntegerField(default=0)
+    occasion_mask = models.IntegerField(default=0)
     style_preference = models.CharField(max_length=20, choices=STYLE_CHOICES, default='casual')
     casual_formal_balance = models.IntegerField(default=50)  # 0-100 scale
-    seasonal_preferences = models.CharField(max_length=255, blank=True)  # Stored as JSON
-    occasion_preferences = models.CharField(max_length=255, blank=True)  # Stored as JSON
     sustainability_focus = models.BooleanField(default=False)
+    version = models.PositiveIntegerField(default=0)  # Bumped on every save
+    # Legacy JSON string storage, only read by the migrate_style_preferences command
+    favorite_colors = models.CharField(max_length=255, blank=True)
+    preferred_patterns = models.CharField(max_length=255, blank=True)
+    seasonal_preferences = models.CharField(max_length=255, blank=True)
+    occasion_preferences = models.CharField(max_length=255, blank=True)
     
     def __str__(self):
         return f'{self.user.username} Style Preferences'
     
+    def save(self, *args, **kwargs):
+        self.version += 1
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = set(kwargs['update_fields']) | {'version'}
+        super().save(*args, **kwargs)
+    
     def set_favorite_colors(self, colors_list):
-        self.favorite_colors = json.dumps(colors_list)
+        self.favorite_color_mask = choice_mask(colors_list, COLOR_CHOICES)
     
     def get_favorite_colors(self):
-        return json.loads(self.favorite_colors) if self.favorite_colors else []
+        return choice_values(self.favorite_color_mask, COLOR_CHOICES)
     
     def set_preferred_patterns(self, patterns_list):
-        self.preferred_patterns = json.dumps(patterns_list)
+        self.pattern_mask = choice_mask(patterns_list, PATTERN_CHOICES)
     
     def get_preferred_patterns(self):
-        return json.loads(self.preferred_patterns) if self.preferred_patterns else []
+        return choice_values(self.pattern_mask, PATTERN_CHOICES)
     
     def set_seasonal_preferences(self, seasons_dict):
-        self.seasonal_preferences = json.dumps(seasons_dict)
+        self.season_mask = choice_mask([season for season, preferred in seasons_dict.items() if preferred], SEASON_CHOICES)
     
     def get_seasonal_preferences(self):
-        return json.loads(self.seasonal_preferences) if self.seasonal_preferences else {}
+        return {season: bool(self.season_mask & (1 << i)) for i, (season, _) in enumerate(SEASON_CHOICES) if season != 'all'}
     
     def set_occasion_preferences(self, occasions_list):
-        self.occasion_preferences = json.dumps(occasions_list)
+        self.occasion_mask = choice_mask(occasions_list, OCCASION_CHOICES)
     
     def get_occasion_preferences(self):
-        return json.loads(self.occasion_preferences) if self.occasion_preferences else []
+        return choice_values(self.occasion_mask, OCCASION_CHOICES)
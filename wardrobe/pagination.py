@@ -0,0 +1,98 @@
+import base64
+import json
+from django.db.models import Q
+
+# Page sizes; the views read WARDROBE_PAGE_SIZE and OUTFITS_PAGE_SIZE from settings
+DEFAULT_ITEMS_PAGE_SIZE = 24
+DEFAULT_OUTFITS_PAGE_SIZE = 12
+MAX_PAGE_SIZE = 100
+
+# Listing orders; the trailing id makes every position unique
+ITEM_ORDERING = ('-date_added', '-id')
+OUTFIT_ORDERING = ('-ai_score', '-id')
+SAVED_OUTFIT_ORDERING = ('-date_saved', '-id')
+
+class InvalidCursor(ValueError):
+    """Raised when a pagination cursor cannot be decoded"""
+    pass
+
+class KeysetPage:
+    """One page of a keyset-paginated listing"""
+    def __init__(self, object_list, next_cursor, cursor=None):
+        self.object_list = object_list
+        self.next_cursor = next_cursor
+        self.cursor = cursor
+
+    @property
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def __iter__(self):
+        return iter(self.object_list)
+
+    def __len__(self):
+        return len(self.object_list)
+
+    def __bool__(self):
+        return bool(self.object_list)
+
+def _fields(model, ordering):
+    return [(model._meta.get_field(name.lstrip('-')), name.startswith('-')) for name in ordering]
+
+def encode_cursor(obj, ordering):
+    """Opaque cursor pointing just past obj in the given ordering"""
+    values = [field.value_to_string(obj) for field, _ in _fields(type(obj), ordering)]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip('=')
+
+def decode_cursor(cursor, model, ordering):
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4))
+        values = json.loads(raw)
+        fields = _fields(model, ordering)
+        if not isinstance(values, list) or len(values) != len(fields):
+            raise ValueError('cursor does not match the ordering')
+        return [field.to_python(value) for (field, _), value in zip(fields, values)]
+    except Exception as e:
+        raise InvalidCursor(f'Invalid cursor: {e}')
+
+def _after(fields, values):
+    """Rows strictly after the cursor position, compared column by column"""
+    (field, descending), value = fields[0], values[0]
+    strict = Q(**{f'{field.name}__{"lt" if descending else "gt"}': value})
+    if len(fields) == 1:
+        return strict
+    return strict | (Q(**{field.name: value}) & _after(fields[1:], values[1:]))
+
+def keyset_queryset(queryset, ordering, cursor=None):
+    """queryset ordered by ordering and starting just after cursor"""
+    queryset = queryset.order_by(*ordering)
+    if not cursor:
+        return queryset
+
+    fields = _fields(queryset.model, ordering)
+    values = decode_cursor(cursor, queryset.model, ordering)
+    # The inclusive bound on the leading column lets the index range-scan
+    (first, descending), first_value = fields[0], values[0]
+    bound = Q(**{f'{first.name}__{"lte" if descending else "gte"}': first_value})
+    return queryset.filter(bound & _after(fields, values))
+
+def paginate_keyset(queryset, ordering, cursor=None, page_size=DEFAULT_ITEMS_PAGE_SIZE):
+    """Return the page of queryset that follows cursor
+
+    Each page is a range scan from the cursor position, so its cost does not
+    grow with the page number, and rows inserted meanwhile never shift or
+    repeat the rows on later pages.
+    """
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    rows = list(keyset_queryset(queryset, ordering, cursor)[:page_size + 1])
+    return _page(rows, ordering, cursor, page_size)
+
+async def apaginate_keyset(queryset, ordering, cursor=None, page_size=DEFAULT_ITEMS_PAGE_SIZE):
+    """Async paginate_keyset, for async views"""
+    page_size = max(1, min(page_size, MAX_PAGE_SIZE))
+    rows = [obj async for obj in keyset_queryset(queryset, ordering, cursor)[:page_size + 1]]
+    return _page(rows, ordering, cursor, page_size)
+
+def _page(rows, ordering, cursor, page_size):
+    next_cursor = encode_cursor(rows[page_size - 1], ordering) if len(rows) > page_size else None
+    return KeysetPage(rows[:page_size], next_cursor, cursor)
@@ -0,0 +1,107 @@
+from collections import defaultdict
+from django.db import IntegrityError, transaction
+from .models import Outfit, SavedOutfit, outfit_fingerprint
+
+def save_outfit_suggestions(user, suggestions):
+    """Write a batch of generated suggestions in one transaction
+
+    Suggestions whose item set matches an outfit the user already has
+    refresh that outfit's score and style notes; the rest are inserted.
+    The write costs a fixed number of queries however large the batch is.
+    There is one SELECT for existing fingerprints, one bulk_update, one
+    bulk_create for the outfits and one for their Outfit.items.through rows.
+    Returns {'created': [ids], 'refreshed': [ids]}.
+    """
+    # Collapse suggestions that share an item set, keeping the first
+    by_fingerprint = {}
+    for suggestion in suggestions:
+        by_fingerprint.setdefault(outfit_fingerprint(suggestion['items']), suggestion)
+
+    try:
+        return _save_outfit_batch(user, by_fingerprint)
+    except IntegrityError:
+        # A concurrent generation inserted one of these item sets first;
+        # on retry it is found as existing and refreshed instead
+        return _save_outfit_batch(user, by_fingerprint)
+
+def _save_outfit_batch(user, by_fingerprint):
+    with transaction.atomic():
+        existing = {
+            outfit.item_fingerprint: outfit
+            for outfit in Outfit.objects.filter(user=user, item_fingerprint__in=list(by_fingerprint))
+        }
+
+        refreshed = []
+        new_outfits = []
+        new_item_ids = []
+        for fingerprint, suggestion in by_fingerprint.items():
+            outfit = existing.get(fingerprint)
+            if outfit:
+                outfit.ai_score = suggestion['ai_score']
+                outfit.style_notes = suggestion['style_notes']
+                refreshed.append(outfit)
+                continue
+
+            new_outfits.append(Outfit(
+                user=user,
+                name=suggestion['name'],
+                occasion=suggestion['occasion'],
+                season=suggestion['season'],
+                style=suggestion['style'],
+                style_notes=suggestion['style_notes'],
+                ai_score=suggestion['ai_score'],
+                item_fingerprint=fingerprint,
+            ))
+            new_item_ids.append(sorted(set(suggestion['items'])))
+
+        if refreshed:
+            Outfit.objects.bulk_update(refreshed, ['ai_score', 'style_notes'])
+
+        if new_outfits:
+            # Primary keys are set on the objects (RETURNING on SQLite 3.35+ and PostgreSQL)
+            Outfit.objects.bulk_create(new_outfits)
+            Through = Outfit.items.through
+            Through.objects.bulk_create([
+                Through(outfit_id=outfit.pk, clothingitem_id=item_id)
+                for outfit, item_ids in zip(new_outfits, new_item_ids)
+                for item_id in item_ids
+            ])
+
+    return {
+        'created': [outfit.pk for outfit in new_outfits],
+        'refreshed': [outfit.pk for outfit in refreshed],
+    }
+
+def collapse_duplicate_outfits(outfit_model=Outfit, saved_model=SavedOutfit):
+    """Fingerprint every outfit and keep one outfit per user and item set
+
+    The kept outfit is a saved one if there is one, then the best scored,
+    then the newest; saves of the others move onto it. Takes the models so
+    the 0007 data migration can pass its historical versions. Run it in a
+    transaction. Returns (duplicates removed, distinct item sets).
+    """
+    saved_ids = set(saved_model.objects.values_list('outfit_id', flat=True))
+
+    groups = defaultdict(list)
+    for outfit in outfit_model.objects.prefetch_related('items').order_by('pk').iterator(chunk_size=1000):
+        item_ids = [item.pk for item in outfit.items.all()]
+        if item_ids:
+            groups[(outfit.user_id, outfit_fingerprint(item_ids))].append(outfit)
+
+    duplicates = 0
+    for (user_id, fingerprint), outfits in groups.items():
+        outfits.sort(key=lambda o: (o.pk in saved_ids, o.ai_score, o.date_created, o.pk), reverse=True)
+        keeper, extras = outfits[0], outfits[1:]
+        duplicates += len(extras)
+
+        if extras:
+            extra_ids = [o.pk for o in extras]
+            # Move saves onto the keeper, dropping ones the user already has
+            already_saved = set(saved_model.objects.filter(outfit=keeper).values_list('user_id', flat=True))
+            saved_model.objects.filter(outfit_id__in=extra_ids, user_id__in=already_saved).delete()
+            saved_model.objects.filter(outfit_id__in=extra_ids).update(outfit=keeper)
+            outfit_model.objects.filter(pk__in=extra_ids).delete()
+
+        if keeper.item_fingerprint != fingerprint:
+            outfit_model.objects.filter(pk=keeper.pk).update(item_fingerprint=fingerprint)
+    return duplicates, len(groups)
@@ -0,0 +1,116 @@
+import json
+from dataclasses import dataclass
+from functools import cached_property
+from django.conf import settings
+from django.core.cache import cache
+from .models import StylePreference, choice_mask, choice_values, COLOR_CHOICES, PATTERN_CHOICES, SEASON_CHOICES, OCCASION_CHOICES
+
+DEFAULT_CACHE_TIMEOUT = 3600  # seconds
+
+# Values the old preference form stored that differ from the model choices
+LEGACY_VALUES = {
+    'stripes': 'striped',
+    'polka-dots': 'polka_dot',
+    'minimal': 'solid',
+    'work': 'business',
+    'formal-events': 'formal',
+    'casual-outings': 'casual',
+    'date-night': 'date',
+}
+
+@dataclass(frozen=True)
+class Preferences:
+    """Parsed, immutable view of a user's StylePreference
+
+    Masks use the same bit order as the *_CHOICES tuples in models.py (and
+    the encodings in ml_utils), so membership tests are bitwise ANDs.
+    """
+    user_id: int
+    version: int
+    color_mask: int
+    pattern_mask: int
+    season_mask: int
+    occasion_mask: int
+    style: str
+    casual_formal_balance: int
+    sustainability_focus: bool
+
+    @classmethod
+    def from_model(cls, style_prefs):
+        return cls(
+            user_id=style_prefs.user_id,
+            version=style_prefs.version,
+            color_mask=style_prefs.favorite_color_mask,
+            pattern_mask=style_prefs.pattern_mask,
+            season_mask=style_prefs.season_mask,
+            occasion_mask=style_prefs.occasion_mask,
+            style=style_prefs.style_preference,
+            casual_formal_balance=style_prefs.casual_formal_balance,
+            sustainability_focus=style_prefs.sustainability_focus,
+        )
+
+    @cached_property
+    def favorite_colors(self):
+        return frozenset(choice_values(self.color_mask, COLOR_CHOICES))
+
+    @cached_property
+    def preferred_patterns(self):
+        return frozenset(choice_values(self.pattern_mask, PATTERN_CHOICES))
+
+    @cached_property
+    def seasons(self):
+        """Preferred seasons in SEASON_CHOICES order"""
+        return tuple(choice_values(self.season_mask, SEASON_CHOICES))
+
+    @cached_property
+    def occasions(self):
+        """Preferred occasions in OCCASION_CHOICES order"""
+        return tuple(choice_values(self.occasion_mask, OCCASION_CHOICES))
+
+def _cache_key(user_id):
+    return f'style-preferences:{user_id}'
+
+def get_preferences(user):
+    """A user's Preferences, from the cache when possible
+
+    The cached copy is dropped whenever the StylePreference row is saved or
+    deleted (see signals.py), but only in the process that saved it. Other
+    processes check the row's version with one indexed query before using
+    their copy, so they never serve masks older than the last save.
+    """
+    prefs = cache.get(_cache_key(user.pk))
+    if prefs is not None:
+        version = StylePreference.objects.filter(user_id=user.pk).values_list('version', flat=True).first()
+        if version != prefs.version:
+            prefs = None
+    if prefs is None:
+        style_prefs, _ = StylePreference.objects.get_or_create(user=user)
+        prefs = Preferences.from_model(style_prefs)
+        cache.set(_cache_key(user.pk), prefs, getattr(settings, 'STYLE_PREFERENCE_CACHE_TIMEOUT', DEFAULT_CACHE_TIMEOUT))
+    return prefs
+
+def invalidate_preferences(user_id):
+    cache.delete(_cache_key(user_id))
+
+def _load_legacy(raw, default):
+    try:
+        return json.loads(raw) if raw else default
+    except ValueError:
+        return default
+
+def _legacy_values(raw):
+    return [LEGACY_VALUES.get(value, value) for value in _load_legacy(raw, [])]
+
+def legacy_masks(style_prefs):
+    """Bitmask field values parsed from a StylePreference's legacy JSON strings
+
+    Works on historical models too, so the 0012 data migration and the
+    migrate_style_preferences command share it.
+    """
+    seasons = _load_legacy(style_prefs.seasonal_preferences, {})
+    return {
+        'favorite_color_mask': choice_mask(_legacy_values(style_prefs.favorite_colors), COLOR_CHOICES),
+        'pattern_mask': choice_mask(_legacy_values(style_prefs.preferred_patterns), PATTERN_CHOICES),
+        'season_mask': choice_mask([season for season, preferred in seasons.items() if preferred], SEASON_CHOICES),
+        'occasion_mask': choice_mask(_legacy_values(style_prefs.occasion_preferences), OCCASION_CHOICES),
+    }
@@ -0,0 +1,90 @@
+import hashlib
+import io
+from PIL import Image, ImageOps
+from django.conf import settings
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.urls import reverse
+
+# Rendition sizes (longest side in px) and formats generated for wardrobe images
+RENDITION_SIZES = (128, 256, 512)
+RENDITION_FORMATS = {
+    'jpeg': {'extension': 'jpg', 'pil_format': 'JPEG', 'options': {'quality': 82, 'optimize': True, 'progressive': True}},
+    'webp': {'extension': 'webp', 'pil_format': 'WEBP', 'options': {'quality': 80, 'method': 4}},
+}
+RENDITION_DIR = 'renditions'
+
+# Renditions known to exist in storage are remembered in the default cache,
+# so templates skip the filesystem check
+DEFAULT_KNOWN_RENDITION_TIMEOUT = 24 * 3600  # seconds
+
+def _known_key(name):
+    return f'rendition-exists:{name}'
+
+def _remember_rendition(name):
+    cache.set(_known_key(name), True, getattr(settings, 'KNOWN_RENDITION_CACHE_TIMEOUT', DEFAULT_KNOWN_RENDITION_TIMEOUT))
+
+def hash_image_file(image_file):
+    """SHA-256 of an image file's contents, read in chunks"""
+    digest = hashlib.sha256()
+    image_file.seek(0)
+    for chunk in iter(lambda: image_file.read(64 * 1024), b''):
+        digest.update(chunk)
+    image_file.seek(0)
+    return digest.hexdigest()
+
+def rendition_name(image_hash, size, fmt):
+    """Storage path of a rendition; the name changes whenever the image content does"""
+    extension = RENDITION_FORMATS[fmt]['extension']
+    return f'{RENDITION_DIR}/{image_hash[:2]}/{image_hash[:20]}-{size}.{extension}'
+
+def ensure_image_hash(item):
+    """Return the item's image hash, computing and saving it for older items"""
+    if not item.image_hash:
+        with item.image.open('rb') as f:
+            item.image_hash = hash_image_file(f)
+        type(item).objects.filter(pk=item.pk).update(image_hash=item.image_hash)
+    return item.image_hash
+
+def generate_renditions(item, size, formats=None):
+    """Render one size of an item's image in every format and store it"""
+    image_hash = ensure_image_hash(item)
+    formats = formats or list(RENDITION_FORMATS)
+
+    with item.image.open('rb') as f:
+        with Image.open(f) as img:
+            img.draft('RGB', (size, size))
+            img.thumbnail((size, size), Image.LANCZOS)
+            img = ImageOps.exif_transpose(img).convert('RGB')
+
+    names = {}
+    for fmt in formats:
+        name = rendition_name(image_hash, size, fmt)
+        if not default_storage.exists(name):
+            spec = RENDITION_FORMATS[fmt]
+            buffer = io.BytesIO()
+            img.save(buffer, format=spec['pil_format'], **spec['options'])
+            # Names are content-addressed, so an existing file is already correct
+            name = default_storage.save(name, ContentFile(buffer.getvalue()))
+        _remember_rendition(name)
+        names[fmt] = name
+    return names
+
+def rendition_url(item, size, fmt='jpeg'):
+    """URL of an item's image rendition
+
+    Points straight at the stored file when it exists. Otherwise points at
+    the rendition view, which generates the file on first request.
+    """
+    if size not in RENDITION_SIZES or fmt not in RENDITION_FORMATS:
+        raise ValueError(f'Unsupported rendition {size}/{fmt}')
+
+    image_hash = ensure_image_hash(item)
+    name = rendition_name(image_hash, size, fmt)
+    if cache.get(_known_key(name)):
+        return default_storage.url(name)
+    if default_storage.exists(name):
+        _remember_rendition(name)
+        return default_storage.url(name)
+    return reverse('item-rendition', kwargs={'image_hash': image_hash, 'size': size, 'fmt': fmt})
@@ -0,0 +1,44 @@
+from django.db.models.signals import pre_save, post_save, post_delete
+from django.dispatch import receiver
+from .models import ClothingItem, StylePreference, STATS_FIELDS
+from .preferences import invalidate_preferences
+from .stats import apply_item_changes, bump_wardrobe_version
+
+@receiver(pre_save, sender=ClothingItem)
+def remember_stats_values(sender, instance, raw=False, **kwargs):
+    """Record the counted fields as stored before an update"""
+    instance._stats_previous = None
+    if raw or instance._state.adding or instance.pk is None:
+        return
+    instance._stats_previous = (
+        ClothingItem.objects.filter(pk=instance.pk).values('user_id', *STATS_FIELDS).first()
+    )
+
+@receiver(post_save, sender=ClothingItem)
+def update_stats_on_save(sender, instance, created, raw=False, **kwargs):
+    if raw:
+        return
+    values = {field: getattr(instance, field) for field in STATS_FIELDS}
+    if created:
+        apply_item_changes(instance.user_id, added=[values])
+        return
+
+    previous = getattr(instance, '_stats_previous', None)
+    if previous is None:
+        return
+    previous_user = previous.pop('user_id')
+    if previous == values and previous_user == instance.user_id:
+        # Counts are unchanged, but cached suggestions may still depend on the item
+        bump_wardrobe_version(instance.user_id)
+        return
+    apply_item_changes(previous_user, removed=[previous])
+    apply_item_changes(instance.user_id, added=[values])
+
+@receiver(post_delete, sender=ClothingItem)
+def update_stats_on_delete(sender, instance, **kwargs):
+    apply_item_changes(instance.user_id, removed=[{field: getattr(instance, field) for field in STATS_FIELDS}])
+
+@receiver(post_save, sender=StylePreference)
+@receiver(post_delete, sender=StylePreference)
+def drop_cached_preferences(sender, instance, **kwargs):
+    invalidate_preferences(instance.user_id)
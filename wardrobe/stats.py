@@ -0,0 +1,91 @@
+from asgiref.sync import sync_to_async
+from django.db import transaction
+from django.db.models import Count, F
+from django.utils import timezone
+from .models import ClothingItem, WardrobeStats, STATS_FIELDS
+
+def _values(item):
+    return {field: getattr(item, field) for field in STATS_FIELDS}
+
+def rebuild_wardrobe_stats(user_id):
+    """Recount a user's wardrobe from scratch in one grouped query"""
+    stats = {f'{field}_counts': {} for field in STATS_FIELDS}
+    total = 0
+    rows = (ClothingItem.objects.filter(user_id=user_id)
+            .values(*STATS_FIELDS).annotate(n=Count('id')).order_by())
+    for row in rows:
+        total += row['n']
+        for field in STATS_FIELDS:
+            counts = stats[f'{field}_counts']
+            counts[row[field]] = counts.get(row[field], 0) + row['n']
+
+    wardrobe_stats = WardrobeStats(user_id=user_id, total_items=total, **stats)
+    wardrobe_stats.style_score = wardrobe_stats.calculate_style_score()
+    version = WardrobeStats.objects.filter(user_id=user_id).values_list('version', flat=True).first() or 0
+    wardrobe_stats, _ = WardrobeStats.objects.update_or_create(
+        user_id=user_id,
+        defaults={
+            'version': version + 1,
+            'total_items': total,
+            'style_score': wardrobe_stats.style_score,
+            'date_updated': timezone.now(),
+            **stats,
+        },
+    )
+    return wardrobe_stats
+
+def get_wardrobe_stats(user):
+    """A user's wardrobe stats row, built on first use"""
+    stats = WardrobeStats.objects.filter(user=user).first()
+    if stats is None:
+        stats = rebuild_wardrobe_stats(user.pk)
+    return stats
+
+async def aget_wardrobe_stats(user):
+    """Async get_wardrobe_stats, for async views"""
+    stats = await WardrobeStats.objects.filter(user=user).afirst()
+    if stats is None:
+        stats = await sync_to_async(rebuild_wardrobe_stats)(user.pk)
+    return stats
+
+def apply_item_changes(user_id, removed=(), added=()):
+    """Adjust a user's stats for items leaving and entering the counts
+
+    removed and added are lists of {field: value} dicts for STATS_FIELDS.
+    A user with no stats row yet is rebuilt from the table instead, which
+    already includes any added items.
+    """
+    with transaction.atomic():
+        stats = WardrobeStats.objects.select_for_update().filter(user_id=user_id).first()
+        if stats is None:
+            if added:
+                rebuild_wardrobe_stats(user_id)
+            return
+
+        for values, delta in [(v, -1) for v in removed] + [(v, 1) for v in added]:
+            stats.total_items += delta
+            for field in STATS_FIELDS:
+                counts = stats.counts(field)
+                count = counts.get(values[field], 0) + delta
+                if count > 0:
+                    counts[values[field]] = count
+                else:
+                    counts.pop(values[field], None)
+
+        stats.total_items = max(stats.total_items, 0)
+        stats.version += 1
+        stats.style_score = stats.calculate_style_score()
+        stats.date_updated = timezone.now()
+        stats.save()
+
+def bump_wardrobe_version(user_id):
+    """Mark a user's wardrobe as changed without touching the counts"""
+    WardrobeStats.objects.filter(user_id=user_id).update(version=F('version') + 1, date_updated=timezone.now())
+
+def items_added(items):
+    """Count newly created items, e.g. after a bulk_create that sends no signals"""
+    by_user = {}
+    for item in items:
+        by_user.setdefault(item.user_id, []).append(_values(item))
+    for user_id, added in by_user.items():
+        apply_item_changes(user_id, added=added)
@@ -0,0 +1,99 @@
+import numpy as np
+from django.conf import settings
+from django.core.cache import caches
+from .metrics import stage
+from .ml_utils import encode_items, find_outfit_candidates, deal_outfit_suggestions, prioritized_seasons
+
+# Pool defaults, overridable from settings
+DEFAULT_CACHE_ALIAS = 'default'
+DEFAULT_TIMEOUT = 24 * 3600  # seconds
+DEFAULT_POOL_SIZE = 40  # Candidates kept per season
+MAX_SERVED = 200  # Served outfits remembered so repeat clicks show new ones
+
+def _cache():
+    return caches[getattr(settings, 'SUGGESTION_CACHE_ALIAS', DEFAULT_CACHE_ALIAS)]
+
+def _key(user_id):
+    return f'suggestion-pool:{user_id}'
+
+def _new_pool(wardrobe_version, prefs):
+    return {
+        'wardrobe_version': wardrobe_version,
+        'masks': (prefs.color_mask, prefs.pattern_mask),
+        'seasons': {},  # {season: [[item ids], ...]}, best first
+        'served': [],  # Item id lists already suggested from this pool
+    }
+
+def fill_pool(pool, items_list, seasons, rng=None):
+    """Search candidates for the given seasons into pool; returns how many seasons were searched"""
+    if not seasons:
+        return 0
+    pool_size = getattr(settings, 'SUGGESTION_POOL_SIZE', DEFAULT_POOL_SIZE)
+    color_mask, pattern_mask = pool['masks']
+    with stage('suggestions', 'encode'):
+        encoded = encode_items(items_list, color_mask, pattern_mask)
+    with stage('suggestions', 'search'):
+        found = find_outfit_candidates(encoded, seasons, pool_size, rng=rng)
+    for season, candidates in found.items():
+        pool['seasons'][season] = [[items_list[i].id for i in item_indices] for item_indices in candidates]
+    return len(found)
+
+def get_suggestion_pool(user, items_list, prefs, wardrobe_version, rng=None):
+    """A user's candidate pool, reusing whatever is still valid
+
+    Candidates depend on the wardrobe and on the favorite color/pattern
+    masks, so a change to either discards the pool. Per-season candidates
+    are kept otherwise: changing preferred seasons or occasions only
+    searches seasons not in the pool yet. Returns (pool, seasons_searched).
+    """
+    pool = _cache().get(_key(user.pk))
+    if (pool is None or pool['wardrobe_version'] != wardrobe_version
+            or pool['masks'] != (prefs.color_mask, prefs.pattern_mask)):
+        pool = _new_pool(wardrobe_version, prefs)
+
+    missing = [season for season in prioritized_seasons(prefs) if season not in pool['seasons']]
+    return pool, fill_pool(pool, items_list, missing, rng)
+
+def store_pool(user, pool):
+    store_pools({user.pk: pool})
+
+def store_pools(pools):
+    """Cache several users' pools, given as {user id: pool}"""
+    _cache().set_many({_key(user_id): pool for user_id, pool in pools.items()},
+                      getattr(settings, 'SUGGESTION_CACHE_TIMEOUT', DEFAULT_TIMEOUT))
+
+def suggest_from_pool(user, items, prefs, wardrobe_version, num_suggestions=None, random_state=None, store=True):
+    """Outfit suggestions dealt from the user's cached candidate pool
+
+    Outfits already served from the pool are skipped; once every candidate
+    has been served the pool starts over. Returns (suggestions, info) where
+    info['seasons_searched'] is 0 when the pool was served as it was and
+    info['pool'] is the updated pool, which is only cached if store is set.
+    """
+    items_list = list(items)
+    if len(items_list) < 2:
+        return [], {'seasons_searched': 0, 'pool': None}
+    if num_suggestions is None:
+        num_suggestions = min(6, len(items_list) // 2 + 1)
+    rng = np.random.default_rng(random_state)
+
+    with stage('suggestions', 'pool_lookup'):
+        pool, searched = get_suggestion_pool(user, items_list, prefs, wardrobe_version, rng)
+
+    index = {item.id: i for i, item in enumerate(items_list)}
+    candidates = {
+        season: [tuple(index[item_id] for item_id in item_ids) for item_ids in pool['seasons'][season]
+                 if all(item_id in index for item_id in item_ids)]
+        for season in prioritized_seasons(prefs)
+    }
+    skip = {frozenset(item_ids) for item_ids in pool['served']}
+    with stage('suggestions', 'deal'):
+        suggestions = deal_outfit_suggestions(items_list, prefs, candidates, num_suggestions, rng, skip)
+        if len(suggestions) < num_suggestions and pool['served']:
+            pool['served'] = []
+            suggestions = deal_outfit_suggestions(items_list, prefs, candidates, num_suggestions, rng)
+
+    pool['served'] = (pool['served'] + [suggestion['items'] for suggestion in suggestions])[-MAX_SERVED:]
+    if store:
+        store_pool(user, pool)
+    return suggestions, {'seasons_searched': searched, 'pool': pool}
@@ -0,0 +1,9 @@
+from django import template
+from wardrobe.renditions import rendition_url as get_rendition_url
+
+register = template.Library()
+
+@register.simple_tag
+def rendition_url(item, size, fmt='jpeg'):
+    """URL of a resized rendition of a clothing item's image"""
+    return get_rendition_url(item, size, fmt)
@@ -0,0 +1,831 @@
+import asyncio
+import importlib
+import io
+import itertools
+import shutil
+import tempfile
+import threading
+import time
+from datetime import timedelta
+from types import SimpleNamespace
+from unittest import mock
+import numpy as np
+from PIL import Image
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.base import ContentFile
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.conf import settings
+from django.db import OperationalError, connection, transaction
+from django.db.models import F
+from django.test import AsyncClient, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import clear_url_caches, resolve, reverse
+from django.utils import timezone
+from .analysis_cache import cache_stats
+from .backends.sqlite3.base import DatabaseWrapper
+from . import executor, urls as wardrobe_urls
+from .benchmarks import synthetic_image
+from .jobs import (AnalysisQueueFull, claim_jobs, complete_job, enqueue_analysis, fail_job,
+                   requeue_stale_jobs)
+from .listings import outfit_listing, saved_outfit_listing, serialize_outfit, serialize_saved_outfit
+from .instrumentation import QueryBudgetExceeded, assert_uses_index, query_budgets
+from .models import (AnalysisJob, ClothingItem, ItemFeatures, Outfit, SavedOutfit, StylePreference, WardrobeStats, choice_mask,
+                     outfit_fingerprint, COLOR_CHOICES, STATS_FIELDS)
+from . import persistence
+from .persistence import collapse_duplicate_outfits, save_outfit_suggestions
+from outfit_recommender import urls as project_urls
+from .management.commands.precompute_suggestions import _precompute_chunk, _store_chunk
+from .preferences import Preferences, get_preferences
+from .renditions import ensure_image_hash, hash_image_file
+from .stats import items_added, rebuild_wardrobe_stats
+from .suggestion_pool import suggest_from_pool
+from .pagination import keyset_queryset, encode_cursor, ITEM_ORDERING, OUTFIT_ORDERING, SAVED_OUTFIT_ORDERING
+from .ml_utils import (analyze_image, analyze_images, load_image_pixels, encode_items, generate_outfit_suggestions,
+                       score_outfit_candidates, search_best_outfits, ANALYSIS_SIZE, ITEM_COLORS, ITEM_PATTERNS,
+                       OUTFIT_CATEGORIES)
+
+def solid_image(seed, size=(100, 120), fmt='PNG'):
+    """Encoded bytes of a noisy single-color image filling the frame"""
+    rng = np.random.default_rng(seed)
+    color = rng.integers(0, 256, 3)
+    pixels = np.clip(np.full((size[1], size[0], 3), color) + rng.integers(-10, 11, (size[1], size[0], 3)), 0, 255)
+    buffer = io.BytesIO()
+    Image.fromarray(pixels.astype(np.uint8)).save(buffer, format=fmt)
+    return buffer.getvalue()
+
+def shirt_image(color, fmt='PNG', quality=90):
+    """Encoded bytes of a shirt silhouette in color on a white background"""
+    pixels = np.full((120, 100, 3), 250, dtype=np.uint8)
+    pixels[5:118, 10:90] = color
+    pixels[5:40, :] = color
+    buffer = io.BytesIO()
+    Image.fromarray(pixels).save(buffer, format=fmt, **({'quality': quality} if fmt == 'JPEG' else {}))
+    return buffer.getvalue()
+
+def suggestion(item_ids, ai_score=70):
+    """A generated suggestion as deal_outfit_suggestions returns it"""
+    return {'name': 'Suggested outfit', 'items': list(item_ids), 'occasion': 'casual', 'season': 'all',
+            'style': 'casual', 'style_notes': f'Scored {ai_score}', 'ai_score': ai_score}
+
+class MediaMixin:
+    """Test case mixin sending uploads to a temporary MEDIA_ROOT"""
+    def setUp(self):
+        media_root = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, media_root, ignore_errors=True)
+        media = override_settings(MEDIA_ROOT=media_root)
+        media.enable()
+        self.addCleanup(media.disable)
+        cache.clear()
+
+    def create_item(self, user, **fields):
+        fields = {'name': 'Shirt', 'category': 'tops', 'color': 'red', 'pattern': 'solid', 'season': 'all',
+                  'analysis_status': 'complete', **fields}
+        item = ClothingItem(user=user, **fields)
+        if not item.image:
+            item.image.save('shirt.png', ContentFile(shirt_image((200, 30, 30))), save=False)
+            item.image_hash = hash_image_file(item.image)
+        item.save()
+        return item
+
+class MediaTestCase(MediaMixin, TestCase):
+    pass
+
+class BatchAnalysisTests(SimpleTestCase):
+    def setUp(self):
+        self.images = ([synthetic_image(320, 240, seed=i) for i in range(4)] +
+                       [solid_image(seed) for seed in range(8)])
+
+    def analyze_batch(self, images):
+        return [result['color'] for result in analyze_images([io.BytesIO(data) for data in images], use_cache=False)]
+
+    def test_batch_colors_match_single_image_analysis(self):
+        single = [analyze_image(io.BytesIO(data), raise_errors=True, use_cache=False)['color'] for data in self.images]
+        self.assertEqual(self.analyze_batch(self.images), single)
+
+    def test_batch_colors_do_not_depend_on_batch_members(self):
+        whole = self.analyze_batch(self.images)
+        self.assertEqual(self.analyze_batch(self.images[:4]), whole[:4])
+        self.assertEqual(self.analyze_batch(self.images[4:]), whole[4:])
+
+class AnalysisCacheTests(TestCase):
+    def analyze(self, data):
+        return analyze_image(io.BytesIO(data), raise_errors=True)
+
+    def test_recompressed_image_is_a_near_hit(self):
+        first = self.analyze(shirt_image((200, 30, 30), 'JPEG', quality=95))
+        second = self.analyze(shirt_image((200, 30, 30), 'JPEG', quality=60))
+        self.assertEqual(second, first)
+        self.assertEqual(cache_stats()['near_hits'], 1)
+
+    def test_same_silhouette_in_another_color_is_not_a_near_hit(self):
+        self.assertEqual(self.analyze(shirt_image((200, 30, 30)))['color'], 'red')
+        self.assertEqual(self.analyze(shirt_image((30, 30, 200)))['color'], 'blue')
+        self.assertEqual(cache_stats()['near_hits'], 0)
+        # Neither result was stored under the other image's digest
+        self.assertEqual(self.analyze(shirt_image((30, 30, 200)))['color'], 'blue')
+        self.assertEqual(cache_stats()['exact_hits'], 1)
+
+class ImageDecodeTests(SimpleTestCase):
+    def encode(self, mode, fmt):
+        # Large enough that load_image_pixels reduces it before resampling
+        img = Image.open(io.BytesIO(shirt_image((200, 30, 30)))).resize((400, 480)).convert(mode)
+        buffer = io.BytesIO()
+        img.save(buffer, format=fmt)
+        return buffer.getvalue()
+
+    def test_palette_and_bilevel_images_are_analyzed(self):
+        for mode, fmt in [('P', 'PNG'), ('P', 'GIF'), ('1', 'PNG'), ('LA', 'PNG'), ('RGBA', 'PNG')]:
+            with self.subTest(mode=mode, format=fmt):
+                data = self.encode(mode, fmt)
+                self.assertEqual(load_image_pixels(io.BytesIO(data)).shape, (*ANALYSIS_SIZE[::-1], 3))
+                self.assertTrue(analyze_image(io.BytesIO(data), raise_errors=True, use_cache=False))
+
+    def test_palette_png_keeps_its_colors(self):
+        data = self.encode('P', 'PNG')
+        self.assertEqual(analyze_image(io.BytesIO(data), raise_errors=True, use_cache=False)['color'], 'red')
+
+class OutfitSearchTests(SimpleTestCase):
+    """Branch and bound finds the same best scores as scoring every outfit"""
+    SEASONS = ['spring', 'summer', 'fall', 'winter', 'all']
+
+    def random_wardrobe(self, seed, size):
+        rng = np.random.default_rng(seed)
+        items = [SimpleNamespace(category=rng.choice(OUTFIT_CATEGORIES), color=rng.choice(ITEM_COLORS),
+                                 pattern=rng.choice(ITEM_PATTERNS), season=rng.choice(self.SEASONS))
+                 for _ in range(size)]
+        return encode_items(items, color_mask=int(rng.integers(0, 1 << len(ITEM_COLORS))),
+                            pattern_mask=int(rng.integers(0, 1 << len(ITEM_PATTERNS))))
+
+    def test_top_scores_match_exhaustive_search(self):
+        for seed in range(12):
+            encoded = self.random_wardrobe(seed, size=15 + 2 * seed)
+            for season, top_n in [('summer', 3), ('winter', 10)]:
+                with self.subTest(seed=seed, season=season, top_n=top_n):
+                    # A budget and top_n this large make the broadcast scorer try every outfit
+                    every_outfit = score_outfit_candidates(encoded, season, 10 ** 9, 10 ** 6, np.random.default_rng(seed))
+                    scores = {frozenset(item_indices): score for _, score, item_indices in every_outfit}
+
+                    found, stats = search_best_outfits(encoded, season, top_n, max_nodes=10 ** 7, time_limit=60,
+                                                       rng=np.random.default_rng(seed))
+                    self.assertTrue(stats['complete'])
+                    self.assertEqual([score for _, score, _ in found], sorted(scores.values(), reverse=True)[:top_n])
+                    for _, score, item_indices in found:
+                        self.assertEqual(scores[frozenset(item_indices)], score)
+
+class OutfitSuggestionTests(SimpleTestCase):
+    def test_random_state_makes_suggestions_repeatable(self):
+        rng = np.random.default_rng(3)
+        items = [SimpleNamespace(id=i, category=OUTFIT_CATEGORIES[i % 5], color=str(rng.choice(ITEM_COLORS)),
+                                 pattern=str(rng.choice(ITEM_PATTERNS)), season='all') for i in range(20)]
+        prefs = Preferences(user_id=1, version=1, color_mask=0b101, pattern_mask=0b1, season_mask=0, occasion_mask=0,
+                            style='casual', casual_formal_balance=50, sustainability_focus=False)
+
+        first = generate_outfit_suggestions(items, prefs, random_state=7)
+        self.assertEqual(len(first), 6)
+        self.assertEqual(generate_outfit_suggestions(items, prefs, random_state=7), first)
+        self.assertNotEqual([s['name'] for s in generate_outfit_suggestions(items, prefs, random_state=8)],
+                            [s['name'] for s in first])
+
+class SaveSuggestionsTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('saver', password='pw')
+        ClothingItem.objects.bulk_create([
+            ClothingItem(user=self.user, name=f'Item {i}', category='tops', color='red', pattern='solid',
+                         season='all', image='shirt.png')
+            for i in range(12)
+        ])
+        item_ids = ClothingItem.objects.filter(user=self.user).values_list('pk', flat=True)
+        self.item_sets = iter(itertools.combinations(sorted(item_ids), 3))
+
+    def new_suggestions(self, n):
+        return [suggestion(next(self.item_sets)) for _ in range(n)]
+
+    def saved(self, suggestions):
+        """suggestions, after saving them once so that saving them again refreshes them"""
+        save_outfit_suggestions(self.user, suggestions)
+        return suggestions
+
+    def count_save_queries(self, suggestions):
+        with CaptureQueriesContext(connection) as captured:
+            save_outfit_suggestions(self.user, suggestions)
+        return len(captured)
+
+    def test_query_count_does_not_depend_on_batch_size(self):
+        cases = {
+            'all new': lambda n: self.new_suggestions(n),
+            'all refreshed': lambda n: [{**s, 'ai_score': 90} for s in self.saved(self.new_suggestions(n))],
+            'mixed': lambda n: self.saved(self.new_suggestions(n)) + self.new_suggestions(n),
+        }
+        for case, make in cases.items():
+            with self.subTest(case):
+                small = self.count_save_queries(make(2))
+                self.assertEqual(self.count_save_queries(make(30)), small)
+
+    def test_saving_an_item_set_again_refreshes_its_outfit(self):
+        item_ids = next(self.item_sets)
+        first = save_outfit_suggestions(self.user, [suggestion(item_ids, 70)])
+        # Same items in another order, twice in one batch
+        second = save_outfit_suggestions(self.user, [suggestion(item_ids[::-1], 85), suggestion(item_ids, 60)])
+
+        self.assertEqual(second, {'created': [], 'refreshed': first['created']})
+        outfit = Outfit.objects.get(user=self.user)
+        self.assertEqual((outfit.ai_score, outfit.style_notes), (85, 'Scored 85'))
+        self.assertEqual(sorted(outfit.items.values_list('pk', flat=True)), sorted(item_ids))
+
+    def test_item_set_inserted_concurrently_is_refreshed_on_retry(self):
+        item_ids = next(self.item_sets)
+        save_batch = persistence._save_outfit_batch
+        calls = []
+        def racing_save_batch(user, by_fingerprint):
+            calls.append(by_fingerprint)
+            if len(calls) == 1:
+                # Another generation commits the same item set first, so this batch's insert fails
+                save_batch(user, {outfit_fingerprint(item_ids): suggestion(item_ids, 50)})
+                with transaction.atomic():
+                    Outfit.objects.create(user=user, name='Racing outfit', occasion='casual', season='all',
+                                          item_fingerprint=outfit_fingerprint(item_ids))
+            return save_batch(user, by_fingerprint)
+
+        with mock.patch.object(persistence, '_save_outfit_batch', racing_save_batch):
+            saved = save_outfit_suggestions(self.user, [suggestion(item_ids, 90)])
+
+        self.assertEqual(len(calls), 2)
+        outfit = Outfit.objects.get(user=self.user)
+        self.assertEqual(saved, {'created': [], 'refreshed': [outfit.pk]})
+        self.assertEqual(outfit.ai_score, 90)
+
+    def test_collapse_duplicate_outfits_keeps_one_outfit_and_its_saves(self):
+        friend = User.objects.create_user('friend', password='pw')
+        item_ids, other_item_ids = next(self.item_sets), next(self.item_sets)
+        # Rows from before fingerprints existed, so the unique constraint does not apply
+        outfits = {}
+        for name, score, items in [('best', 90, item_ids), ('saved', 50, item_ids), ('worst', 40, item_ids),
+                                   ('other', 60, other_item_ids)]:
+            outfits[name] = Outfit.objects.create(user=self.user, name=name, occasion='casual', season='all',
+                                                  ai_score=score)
+            outfits[name].items.set(items)
+        SavedOutfit.objects.create(user=friend, outfit=outfits['best'])
+        SavedOutfit.objects.create(user=self.user, outfit=outfits['saved'])
+        SavedOutfit.objects.create(user=friend, outfit=outfits['worst'])
+
+        self.assertEqual(collapse_duplicate_outfits(), (2, 2))
+        self.assertEqual(
+            set(Outfit.objects.values_list('name', 'item_fingerprint')),
+            {('best', outfit_fingerprint(item_ids)), ('other', outfit_fingerprint(other_item_ids))},
+        )
+        # The owner's save moved to the kept outfit; the friend's second save of it was dropped
+        self.assertEqual(set(SavedOutfit.objects.values_list('user__username', 'outfit__name')),
+                         {('friend', 'best'), ('saver', 'best')})
+
+class WardrobeStatsTests(TestCase):
+    def stats_snapshot(self, stats):
+        return {'total_items': stats.total_items, 'style_score': stats.style_score,
+                **{f'{field}_counts': stats.counts(field) for field in STATS_FIELDS}}
+
+    def assert_stats_match_rebuild(self, user):
+        maintained = self.stats_snapshot(WardrobeStats.objects.get(user=user))
+        self.assertEqual(maintained, self.stats_snapshot(rebuild_wardrobe_stats(user.pk)))
+
+    def test_signals_keep_stats_equal_to_a_rebuild(self):
+        user = User.objects.create_user('counted', password='pw')
+        other = User.objects.create_user('other', password='pw')
+        def item(owner=user, **fields):
+            return ClothingItem(user=owner, **{'name': 'Item', 'category': 'tops', 'color': 'red', 'pattern': 'solid',
+                                               'season': 'all', 'image': 'shirt.png', **fields})
+
+        first = item()
+        first.save()
+        second = item(category='bottoms', color='blue', pattern='striped', season='summer')
+        second.save()
+        self.assert_stats_match_rebuild(user)
+
+        second.category = 'shoes'
+        second.save()
+        first.name = 'Renamed'  # Not a counted field
+        first.save()
+        self.assert_stats_match_rebuild(user)
+
+        added = ClothingItem.objects.bulk_create([item(color='green', season='winter') for _ in range(3)] +
+                                                 [item(owner=other, category='dresses')])
+        items_added(added)
+        self.assert_stats_match_rebuild(user)
+        self.assert_stats_match_rebuild(other)
+
+        second.user = other  # Moves between wardrobes
+        second.save()
+        first.delete()
+        added[0].delete()
+        self.assert_stats_match_rebuild(user)
+        self.assert_stats_match_rebuild(other)
+        self.assertEqual(WardrobeStats.objects.get(user=user).category_counts, {'tops': 2})
+
+class PreferenceCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('styled', password='pw')
+
+    def test_save_in_another_process_is_seen_at_once(self):
+        self.assertEqual(get_preferences(self.user).favorite_colors, frozenset())
+        with self.assertNumQueries(1):
+            get_preferences(self.user)
+
+        # Another process saves: its signal only clears that process's cache
+        StylePreference.objects.filter(user=self.user).update(
+            favorite_color_mask=choice_mask(['red'], COLOR_CHOICES), version=F('version') + 1)
+        self.assertEqual(get_preferences(self.user).favorite_colors, {'red'})
+
+class RenditionTests(MediaTestCase):
+    def test_renditions_are_not_publicly_cacheable(self):
+        user = User.objects.create_user('owner', password='pw')
+        item = self.create_item(user)
+        self.client.force_login(user)
+        url = reverse('item-rendition', kwargs={'image_hash': ensure_image_hash(item), 'size': 128, 'fmt': 'jpeg'})
+        response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'private, max-age=31536000, immutable')
+        response.close()
+
+class AnalysisJobTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('queued', password='pw')
+        self.item = self.create_item(self.user, color='red', analysis_status='pending')
+
+    def test_claimed_job_completes_with_item_color_stats_and_features(self):
+        job = enqueue_analysis(self.item)
+        self.assertEqual(claim_jobs('worker-1', 10), [job])
+        self.assertEqual(claim_jobs('worker-2', 10), [])  # Already running
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.locked_by), ('running', 'worker-1'))
+
+        results = analyze_image(io.BytesIO(shirt_image((30, 30, 200))), raise_errors=True)
+        complete_job(job, results)
+        self.item.refresh_from_db()
+        job.refresh_from_db()
+        self.assertEqual((self.item.color, self.item.analysis_status), ('blue', 'complete'))
+        self.assertEqual((job.status, job.attempts), ('done', 1))
+        stats = WardrobeStats.objects.get(user=self.user)
+        self.assertEqual(stats.color_counts, {'blue': 1})
+        self.assertEqual(stats.color_counts, rebuild_wardrobe_stats(self.user.pk).color_counts)
+        self.assertTrue(ItemFeatures.objects.filter(item=self.item).exists())
+
+    @override_settings(ANALYSIS_JOB_RETRY_DELAY=30, ANALYSIS_JOB_STALE_AFTER=600)
+    def test_failed_and_stale_jobs_are_requeued(self):
+        job = enqueue_analysis(self.item)
+        [job] = claim_jobs('worker-1', 10)
+        fail_job(job, 'decoder crashed')
+        job.refresh_from_db()
+        self.assertEqual((job.status, job.attempts, job.last_error, job.locked_by),
+                         ('queued', 1, 'decoder crashed', ''))
+        self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=25))
+        self.assertEqual(claim_jobs('worker-1', 10), [])  # Backing off
+
+        AnalysisJob.objects.filter(pk=job.pk).update(run_after=timezone.now())
+        [job] = claim_jobs('worker-2', 10)
+        AnalysisJob.objects.filter(pk=job.pk).update(locked_at=timezone.now() - timedelta(seconds=601))
+        self.assertEqual(requeue_stale_jobs(), 1)
+        self.assertEqual(claim_jobs('worker-3', 10), [job])
+
+    @override_settings(ANALYSIS_QUEUE_MAX_DEPTH=2)
+    def test_enqueue_is_refused_past_the_queue_depth(self):
+        first = enqueue_analysis(self.item)
+        enqueue_analysis(self.create_item(self.user))
+        with self.assertRaises(AnalysisQueueFull):
+            enqueue_analysis(self.create_item(self.user))
+
+        [job] = claim_jobs('worker-1', 1)
+        self.assertEqual(job, first)
+        complete_job(job, {})
+        enqueue_analysis(self.create_item(self.user))
+        self.assertEqual(AnalysisJob.objects.count(), 3)
+
+class ListingQueryCountTests(MediaTestCase):
+    """Listings and the pages built on them cost a fixed number of queries however big the wardrobe is"""
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('counted', password='pw')
+        self.image = self.create_item(self.user)
+        self.client.force_login(self.user)
+
+    def add_wardrobe(self, n):
+        """n more items, outfits of three items and saved outfits, all sharing one stored image"""
+        categories = ['tops', 'bottoms', 'shoes']
+        items = [self.create_item(self.user, category=categories[i % 3], image=self.image.image.name,
+                                  image_hash=self.image.image_hash) for i in range(n)]
+        for i in range(n):
+            outfit = Outfit.objects.create(user=self.user, name=f'Outfit {i}', occasion='casual', season='all',
+                                           ai_score=i)
+            outfit.items.set(items[i:i + 3] or items[:3])
+            SavedOutfit.objects.create(user=self.user, outfit=outfit)
+
+    def assert_fixed_query_count(self, url_name):
+        self.add_wardrobe(8)
+        url = reverse(url_name)
+        self.client.get(url)  # Warm the stats row and rendition cache
+        with CaptureQueriesContext(connection) as captured:
+            self.assertEqual(self.client.get(url).status_code, 200)
+        queries = len(captured)  # Read now; later requests clear the connection's query log
+        self.assertLessEqual(queries, settings.VIEW_QUERY_BUDGETS[url_name])
+
+        self.add_wardrobe(16)
+        self.client.get(url)
+        with self.assertNumQueries(queries):
+            self.assertEqual(self.client.get(url).status_code, 200)
+
+    def test_dashboard_query_count_is_fixed(self):
+        self.assert_fixed_query_count('dashboard')
+
+    def test_wardrobe_listing_query_count_is_fixed(self):
+        self.assert_fixed_query_count('wardrobe-home')
+
+    def assert_serialized_in_two_queries(self, listing, serialize, rows):
+        """Loading and serializing every row, nested items included, takes one query plus one prefetch"""
+        with self.assertNumQueries(2):
+            serialized = [serialize(obj) for obj in listing]
+        self.assertEqual(len(serialized), rows)
+        return serialized
+
+    def test_outfit_listing_query_count_is_fixed(self):
+        for added, rows in [(2, 2), (18, 20)]:
+            self.add_wardrobe(added)
+            with self.subTest(rows=rows):
+                outfits = self.assert_serialized_in_two_queries(outfit_listing(self.user), serialize_outfit, rows)
+                self.assertTrue(all(outfit['items'] for outfit in outfits))
+
+    def test_saved_outfit_listing_query_count_is_fixed(self):
+        for added, rows in [(2, 2), (18, 20)]:
+            self.add_wardrobe(added)
+            with self.subTest(rows=rows):
+                saved = self.assert_serialized_in_two_queries(saved_outfit_listing(self.user), serialize_saved_outfit,
+                                                              rows)
+                self.assertTrue(all(s['outfit']['items'] for s in saved))
+
+class QueryBudgetTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('budgeted', password='pw')
+        self.create_item(self.user)
+        self.client.force_login(self.user)
+
+    def test_requests_within_budget_pass(self):
+        with query_budgets(settings.VIEW_QUERY_BUDGETS):
+            self.assertEqual(self.client.get(reverse('dashboard')).status_code, 200)
+            self.assertEqual(self.client.get(reverse('wardrobe-home')).status_code, 200)
+
+    def test_request_over_budget_is_reported_on_exit(self):
+        with self.assertRaisesMessage(QueryBudgetExceeded, 'dashboard'):
+            with query_budgets({'dashboard': 1, 'wardrobe-home': 1}):
+                self.assertEqual(self.client.get(reverse('dashboard')).status_code, 200)
+        # Views without a budget in the block are not checked
+        with query_budgets({'wardrobe-home': 1}):
+            self.client.get(reverse('dashboard'))
+
+    @override_settings(QUERY_BUDGET_ENFORCE=True, VIEW_QUERY_BUDGETS={'dashboard': 1})
+    def test_enforced_budget_fails_the_request(self):
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('dashboard'))
+
+class ApiTests(MediaTestCase):
+    def setUp(self):
+        super().setUp()
+        self.user = User.objects.create_user('api', password='pw')
+        self.item = self.create_item(self.user)
+        self.client.force_login(self.user)
+
+    def test_anonymous_requests_get_401(self):
+        self.client.logout()
+        for name in ['api-items', 'api-outfits', 'api-saved-outfits', 'api-preferences', 'api-dashboard']:
+            with self.subTest(name):
+                response = self.client.get(reverse(name))
+                self.assertEqual(response.status_code, 401)
+                self.assertEqual(response.json(), {'error': 'Authentication required'})
+
+    def test_bad_parameters_get_400(self):
+        for name, params in [('api-items', {'fields': 'name,secret'}), ('api-outfits', {'fields': 'owner'}),
+                             ('api-items', {'cursor': 'not-a-cursor'}), ('api-saved-outfits', {'cursor': 'e30'}),
+                             ('api-items', {'page_size': 'ten'})]:
+            with self.subTest(name, **params):
+                response = self.client.get(reverse(name), params)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('error', response.json())
+
+    def test_list_etag_answers_304_until_the_page_changes(self):
+        url = reverse('api-items')
+        response = self.client.get(url, {'fields': 'id,name'})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response['Cache-Control'], 'private, no-cache')
+        self.assertNotIn('Last-Modified', response)
+        etag = response['ETag']
+
+        self.assertEqual(self.client.get(url, {'fields': 'id,name'}, HTTP_IF_NONE_MATCH=etag).status_code, 304)
+        self.assertEqual(self.client.get(url, {'fields': 'id'}, HTTP_IF_NONE_MATCH=etag).status_code, 200)
+
+        self.item.delete()
+        response = self.client.get(url, {'fields': 'id,name'}, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['results'], [])
+
+    def test_dashboard_is_validated_by_the_stats_version(self):
+        url = reverse('api-dashboard')
+        response = self.client.get(url)
+        self.assertEqual(response.json()['total_items'], 1)
+        etag, last_modified = response['ETag'], response['Last-Modified']
+
+        with self.assertNumQueries(3):  # Session, user and stats row; the payload is not built
+            not_modified = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(not_modified.status_code, 304)
+        self.assertEqual((not_modified['ETag'], not_modified['Last-Modified']), (etag, last_modified))
+
+        self.create_item(self.user, name='Another shirt')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.json()['total_items'], 2)
+        self.assertNotEqual(response['ETag'], etag)
+
+class MetricsAccessTests(TestCase):
+    def get_metrics(self, **headers):
+        return self.client.get(reverse('prometheus-metrics'), **headers)
+
+    def test_local_requests_need_staff_or_token(self):
+        # The test client, like a request relayed by a local reverse proxy, comes from 127.0.0.1
+        self.assertEqual(self.get_metrics().status_code, 403)
+        self.client.force_login(User.objects.create_user('shopper', password='pw'))
+        self.assertEqual(self.get_metrics().status_code, 403)
+
+        self.client.force_login(User.objects.create_user('operator', password='pw', is_staff=True))
+        response = self.get_metrics()
+        self.assertEqual(response.status_code, 200)
+        self.assertTrue(response['Content-Type'].startswith('text/plain; version=0.0.4'))
+
+    @override_settings(METRICS_TOKEN='scrape-secret')
+    def test_scraper_token(self):
+        self.assertEqual(self.get_metrics(HTTP_AUTHORIZATION='Bearer scrape-secret').status_code, 200)
+        self.assertEqual(self.get_metrics(HTTP_AUTHORIZATION='Bearer guess').status_code, 403)
+        self.assertEqual(self.get_metrics().status_code, 403)
+
+    @override_settings(METRICS_ALLOWED_IPS=['127.0.0.1'])
+    def test_ip_allowlist_is_opt_in(self):
+        self.assertEqual(self.get_metrics().status_code, 200)
+        self.assertEqual(self.get_metrics(REMOTE_ADDR='203.0.113.7').status_code, 403)
+
+class ListingIndexTests(TestCase):
+    """Each paginated listing query is planned on its composite index without a sort"""
+    def test_listings_use_their_indexes(self):
+        items = ClothingItem.objects.filter(user_id=1)
+        outfits = Outfit.objects.filter(user_id=1)
+        saved = SavedOutfit.objects.filter(user_id=1)
+        item_cursor = encode_cursor(ClothingItem(id=1, date_added=timezone.now()), ITEM_ORDERING)
+        outfit_cursor = encode_cursor(Outfit(id=1, ai_score=50), OUTFIT_ORDERING)
+        saved_cursor = encode_cursor(SavedOutfit(id=1, date_saved=timezone.now()), SAVED_OUTFIT_ORDERING)
+
+        checks = [
+            (items, ITEM_ORDERING, None, 'item_user_added_idx'),
+            (items, ITEM_ORDERING, item_cursor, 'item_user_added_idx'),
+            (items.filter(category='tops'), ITEM_ORDERING, item_cursor, 'item_user_cat_added_idx'),
+            (outfits, OUTFIT_ORDERING, None, 'outfit_user_score_idx'),
+            (outfits, OUTFIT_ORDERING, outfit_cursor, 'outfit_user_score_idx'),
+            (outfits.filter(occasion='casual', season='all'), OUTFIT_ORDERING, outfit_cursor,
+             'outfit_user_occ_season_idx'),
+            (saved, SAVED_OUTFIT_ORDERING, None, 'saved_user_date_idx'),
+            (saved, SAVED_OUTFIT_ORDERING, saved_cursor, 'saved_user_date_idx'),
+        ]
+        for queryset, ordering, cursor, index_name in checks:
+            with self.subTest(index=index_name, later_page=cursor is not None):
+                assert_uses_index(keyset_queryset(queryset, ordering, cursor)[:25], index_name)
+
+class SuggestionPoolTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('pooled', password='pw')
+        prefs, _ = StylePreference.objects.get_or_create(user=self.user)
+        prefs.set_seasonal_preferences({'summer': True})
+        prefs.save()
+        for i in range(12):
+            ClothingItem.objects.create(user=self.user, name=f'Item {i}', category=['tops', 'bottoms', 'shoes'][i % 3],
+                                        color=['red', 'blue', 'black'][i // 4], pattern='solid', season='all',
+                                        image='shirt.png')
+
+    def suggest(self, random_state=None):
+        """(item id sets suggested, seasons searched) for one request"""
+        version = WardrobeStats.objects.get(user=self.user).version
+        items = ClothingItem.objects.filter(user=self.user)
+        suggestions, info = suggest_from_pool(self.user, items, get_preferences(self.user), version,
+                                              random_state=random_state)
+        return {frozenset(s['items']) for s in suggestions}, info['seasons_searched']
+
+    def test_pool_is_reused_without_repeating_served_outfits(self):
+        first, searched = self.suggest(random_state=1)
+        self.assertEqual(searched, 1)
+        second, searched = self.suggest(random_state=1)
+        self.assertEqual(searched, 0)
+        self.assertTrue(second)
+        self.assertFalse(first & second)
+
+    def test_new_season_is_searched_alone(self):
+        self.suggest()
+        prefs = StylePreference.objects.get(user=self.user)
+        prefs.set_seasonal_preferences({'summer': True, 'winter': True})
+        prefs.save()
+        self.assertEqual(self.suggest()[1], 1)
+
+    def test_pool_is_rebuilt_when_the_wardrobe_or_masks_change(self):
+        self.suggest()
+        ClothingItem.objects.create(user=self.user, name='New top', category='tops', color='green',
+                                    pattern='solid', season='all', image='shirt.png')
+        self.assertEqual(self.suggest()[1], 1)
+        self.assertEqual(self.suggest()[1], 0)
+
+        prefs = StylePreference.objects.get(user=self.user)
+        prefs.set_favorite_colors(['green'])
+        prefs.save()
+        self.assertEqual(self.suggest()[1], 1)
+
+        prefs.set_preferred_patterns(['striped'])
+        prefs.save()
+        self.assertEqual(self.suggest()[1], 1)
+
+class PrecomputedPoolTests(MediaTestCase):
+    def test_precomputed_pool_is_served_from_the_shared_cache(self):
+        user = User.objects.create_user('pooled', password='pw')
+        for i, category in enumerate(['tops', 'tops', 'bottoms', 'bottoms', 'shoes', 'shoes']):
+            self.create_item(user, name=f'Item {i}', category=category)
+        stats = rebuild_wardrobe_stats(user.pk)
+
+        _, results = _precompute_chunk([user.pk])
+        self.assertEqual(_store_chunk(results)['users'], 1)
+        # Stored in the database, where every web worker process reads it
+        with connection.cursor() as cursor:
+            cursor.execute(f'SELECT COUNT(*) FROM {settings.CACHES["suggestions"]["LOCATION"]}')
+            self.assertEqual(cursor.fetchone()[0], 1)
+
+        items = ClothingItem.objects.filter(user=user)
+        _, info = suggest_from_pool(user, items, get_preferences(user), stats.version)
+        self.assertEqual(info['seasons_searched'], 0)
+
+class AsyncViewTests(MediaMixin, TransactionTestCase):
+    """The ASYNC_VIEWS versions serve concurrent requests and run ML on the executor"""
+    def setUp(self):
+        super().setUp()
+        self.addCleanup(self.reload_urls)
+        async_views = override_settings(ASYNC_VIEWS=True)
+        async_views.enable()
+        self.addCleanup(async_views.disable)
+        self.reload_urls()
+
+        self.clients = []
+        for n in range(3):
+            user = User.objects.create_user(f'async{n}', password='pw')
+            for i, category in enumerate(['tops', 'tops', 'bottoms', 'bottoms', 'shoes', 'shoes']):
+                self.create_item(user, name=f'Item {i}', category=category)
+            client = AsyncClient()
+            client.force_login(user)
+            self.clients.append(client)
+
+        self.ml_threads = []
+        call = executor._call
+        def recording_call(func, args, kwargs):
+            self.ml_threads.append(threading.current_thread().name)
+            return call(func, args, kwargs)
+        patcher = mock.patch.object(executor, '_call', recording_call)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def reload_urls(self):
+        """Re-import the URLconfs, which pick views.py or async_views.py at import time"""
+        importlib.reload(wardrobe_urls)
+        importlib.reload(project_urls)
+        clear_url_caches()
+
+    async def test_concurrent_requests(self):
+        self.assertTrue(asyncio.iscoroutinefunction(resolve(reverse('dashboard')).func))
+        self.assertTrue(asyncio.iscoroutinefunction(resolve(reverse('wardrobe-home')).func))
+        responses = await asyncio.gather(*[
+            client.get(reverse(name)) for client in self.clients for name in ['dashboard', 'wardrobe-home']
+        ])
+        self.assertEqual([response.status_code for response in responses], [200] * len(responses))
+        self.assertContains(responses[1], 'Item 5')
+        self.assertEqual(self.ml_threads, [])
+
+    async def test_concurrent_suggestion_generation_runs_on_the_executor(self):
+        responses = await asyncio.gather(*[client.get(reverse('generate-suggestions')) for client in self.clients])
+        for response in responses:
+            self.assertRedirects(response, reverse('outfit-suggestions'), fetch_redirect_response=False)
+        self.assertEqual(len(self.ml_threads), len(self.clients))
+        self.assertTrue(all(name.startswith('ml') for name in self.ml_threads))
+
+        counts = await asyncio.gather(*[Outfit.objects.filter(user__username=f'async{n}').acount()
+                                        for n in range(len(self.clients))])
+        self.assertTrue(all(counts))
+
+    async def timed_listings(self):
+        """Seconds for every client's dashboard and wardrobe listing, requested together"""
+        started = time.perf_counter()
+        responses = await asyncio.gather(*[
+            client.get(reverse(name)) for client in self.clients for name in ['dashboard', 'wardrobe-home']
+        ])
+        self.assertEqual([response.status_code for response in responses], [200] * len(responses))
+        return time.perf_counter() - started
+
+    async def test_listings_stay_fast_while_analysis_fills_the_executor(self):
+        await self.timed_listings()  # Warm the stats rows and renditions
+        unloaded = await self.timed_listings()
+
+        workers = executor.ml_executor()._max_workers
+        analyzing = []
+        release = threading.Event()
+        def blocking_analysis(images, **kwargs):
+            analyzing.append(len(images))
+            release.wait(timeout=30)
+            return [{} for _ in images]
+
+        with mock.patch('wardrobe.async_views.analyze_images', blocking_analysis):
+            uploads = [asyncio.ensure_future(client.post(reverse('bulk-add-items'), {
+                'images': [SimpleUploadedFile('shirt.png', shirt_image((30, 30, 200)), 'image/png')],
+                'category': 'tops', 'season': 'all',
+            })) for client in itertools.islice(itertools.cycle(self.clients), workers)]
+            try:
+                deadline = time.monotonic() + 10
+                while len(analyzing) < workers and time.monotonic() < deadline:
+                    await asyncio.sleep(0.01)
+                self.assertEqual(len(analyzing), workers, 'the uploads did not fill the executor')
+
+                loaded = await self.timed_listings()
+                self.assertFalse(any(upload.done() for upload in uploads))
+            finally:
+                release.set()
+            responses = await asyncio.gather(*uploads)
+
+        self.assertEqual([response.status_code for response in responses], [302] * workers)
+        self.assertLess(loaded, unloaded * 2 + 0.25)
+
+class SQLiteBackendTests(SimpleTestCase):
+    """Parallel read-then-write transactions queue on the write lock instead of failing"""
+    databases = {'default'}
+    WRITERS = 4
+    TRANSACTIONS = 25
+
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory, ignore_errors=True)
+        self.settings_dict = {**connection.settings_dict, 'NAME': f'{directory}/concurrency.sqlite3'}
+        self.query('CREATE TABLE counter (n integer)')
+        self.query('INSERT INTO counter VALUES (0)')
+
+    def connect(self):
+        db = DatabaseWrapper(dict(self.settings_dict))
+        db.ensure_connection()
+        return db
+
+    def query(self, sql):
+        """First row of sql run on a new connection"""
+        db = self.connect()
+        try:
+            with db.cursor() as cursor:
+                cursor.execute(sql)
+                return cursor.fetchone()
+        finally:
+            db.close()
+
+    def test_connections_use_the_configured_pragmas(self):
+        pragmas = settings.DATABASES['default']['OPTIONS']['pragmas']
+        for db in [self.connect(), connection]:
+            with self.subTest(database=db.settings_dict['NAME']), db.cursor() as cursor:
+                cursor.execute('PRAGMA journal_mode')
+                self.assertEqual(cursor.fetchone()[0], 'wal')
+                cursor.execute('PRAGMA busy_timeout')
+                self.assertEqual(cursor.fetchone()[0], pragmas['busy_timeout'])
+                cursor.execute('PRAGMA synchronous')
+                self.assertEqual(cursor.fetchone()[0], 1)  # NORMAL
+            if db is not connection:
+                db.close()
+
+    def test_parallel_writers_are_not_locked_out(self):
+        errors = []
+        start = threading.Barrier(self.WRITERS)
+
+        def writer():
+            db = self.connect()
+            try:
+                start.wait()
+                for _ in range(self.TRANSACTIONS):
+                    # Starts a transaction with the backend's BEGIN, as atomic() does
+                    db.set_autocommit(False, force_begin_transaction_with_broken_autocommit=True)
+                    with db.cursor() as cursor:
+                        cursor.execute('SELECT n FROM counter')
+                        n = cursor.fetchone()[0]
+                        cursor.execute('UPDATE counter SET n = %s', [n + 1])
+                    db.commit()
+                    db.set_autocommit(True)
+            except OperationalError as e:
+                errors.append(str(e))
+            finally:
+                db.close()
+
+        threads = [threading.Thread(target=writer) for _ in range(self.WRITERS)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        self.assertEqual(self.query('SELECT n FROM counter'), (self.WRITERS * self.TRANSACTIONS,))
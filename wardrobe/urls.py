@@ -1,18 +1,30 @@
+from django.conf import settings
 from django.urls import path
-from . import views
+from . import api, async_views, views
+
+# Under an ASGI server the busiest views have async versions
+hot_views = async_views if getattr(settings, 'ASYNC_VIEWS', False) else views
 
 urlpatterns = [
-    path('', views.wardrobe_home, name='wardrobe-home'),
-    path('item/new/', views.add_item, name='add-item'),
+    path('', hot_views.wardrobe_home, name='wardrobe-home'),
+    path('item/new/', hot_views.add_item, name='add-item'),
+    path('item/bulk/', hot_views.bulk_add_items, name='bulk-add-items'),
     path('item/<int:pk>/', views.item_detail, name='item-detail'),
     path('item/<int:pk>/update/', views.update_item, name='update-item'),
     path('item/<int:pk>/delete/', views.delete_item, name='delete-item'),
-    path('outfit-suggestions/', views.outfit_suggestions, name='outfit-suggestions'),
+    path('rendition/<str:image_hash>/<int:size>.<str:fmt>', views.item_rendition, name='item-rendition'),
+    path('outfit-suggestions/', hot_views.outfit_suggestions, name='outfit-suggestions'),
     path('outfit/<int:pk>/', views.outfit_detail, name='outfit-detail'),
     path('outfit/<int:pk>/save/', views.save_outfit, name='save-outfit'),
     path('outfit/<int:pk>/delete/', views.delete_outfit, name='delete-outfit'),
-    path('saved-outfits/', views.saved_outfits, name='saved-outfits'),
+    path('saved-outfits/', hot_views.saved_outfits, name='saved-outfits'),
     path('profile/', views.profile, name='profile'),
     path('style-preferences/', views.style_preferences, name='style-preferences'),
-    path('generate-suggestions/', views.generate_suggestions, name='generate-suggestions'),
+    path('generate-suggestions/', hot_views.generate_suggestions, name='generate-suggestions'),
+    path('metrics/requests/', views.request_metrics, name='request-metrics'),
+    path('api/items/', api.items, name='api-items'),
+    path('api/outfits/', api.outfits, name='api-outfits'),
+    path('api/saved-outfits/', api.saved_outfits, name='api-saved-outfits'),
+    path('api/preferences/', api.preferences, name='api-preferences'),
+    path('api/dashboard/', api.dashboard, name='api-dashboard'),
 ]
@@ -1,10 +1,55 @@
 from django.shortcuts import render, redirect, get_object_or_404
+from django.conf import settings
 from django.contrib import messages
+from django.contrib.admin.views.decorators import staff_member_required
 from django.contrib.auth.decorators import login_required
 from django.contrib.auth.models import User
-from .forms import UserRegisterForm, UserUpdateForm, ProfileUpdateForm, ClothingItemForm, OutfitForm, StylePreferenceForm
-from .models import UserProfile, ClothingItem, Outfit, SavedOutfit, StylePreference
-from .ml_utils import analyze_image, generate_outfit_suggestions
+from django.core.files.storage import default_storage
+from django.core.exceptions import PermissionDenied
+from django.http import FileResponse, Http404, HttpResponse, JsonResponse
+from django.views.static import serve
+import hmac
+import os
+from .forms import UserRegisterForm, UserUpdateForm, ProfileUpdateForm, ClothingItemForm, BulkItemUploadForm, OutfitForm, StylePreferenceForm
+from .models import UserProfile, ClothingItem, ItemFeatures, Outfit, SavedOutfit, StylePreference
+from .ml_utils import analyze_images
+from .features import build_item_features
+from .jobs import enqueue_analysis, AnalysisQueueFull
+from .persistence import save_outfit_suggestions
+from .preferences import get_preferences
+from .suggestion_pool import suggest_from_pool
+from .stats import get_wardrobe_stats, items_added
+from .metrics import registry as metrics_registry, stage, COUNT_BUCKETS, SIZE_BUCKETS
+from .listings import item_listing, outfit_listing, saved_outfit_listing, SUGGESTION_ITEM_FIELDS
+from .pagination import paginate_keyset, InvalidCursor, ITEM_ORDERING, OUTFIT_ORDERING, SAVED_OUTFIT_ORDERING, DEFAULT_ITEMS_PAGE_SIZE, DEFAULT_OUTFITS_PAGE_SIZE
+from .renditions import generate_renditions, hash_image_file, RENDITION_SIZES, RENDITION_FORMATS
+
+DEFAULT_METRICS_ALLOWED_IPS = ()  # Opt-in; behind a local reverse proxy every client is 127.0.0.1
+DEFAULT_METRICS_TOKEN = ''
+
+def page_url(request, cursor=None):
+    """Current URL with its filters kept, pointing at the page after cursor"""
+    params = request.GET.copy()
+    params.pop('cursor', None)
+    if cursor:
+        params['cursor'] = cursor
+    return f'{request.path}?{params.urlencode()}' if params else request.path
+
+def listing_page(request, queryset, ordering, page_size):
+    """Keyset page for the request's cursor and its navigation context
+
+    An unreadable cursor starts over from the first page.
+    """
+    try:
+        page = paginate_keyset(queryset, ordering, request.GET.get('cursor'), page_size)
+    except InvalidCursor:
+        page = paginate_keyset(queryset, ordering, None, page_size)
+    
+    return page, {
+        'page': page,
+        'next_page_url': page_url(request, page.next_cursor) if page.has_next else None,
+        'first_page_url': page_url(request) if page.cursor else None,
+    }
 
 def home(request):
     """Home page view"""
@@ -30,110 +75,154 @@ def register(request):
 @login_required
 def dashboard(request):
     """User dashboard view"""
-    # Get user's wardrobe stats
-    wardrobe_count = ClothingItem.objects.filter(user=request.user).count()
-    recent_items = ClothingItem.objects.filter(user=request.user).order_by('-date_added')[:4]
-    saved_outfits = SavedOutfit.objects.filter(user=request.user).order_by('-date_saved')[:2]
-    
-    # Get outfit suggestions
-    outfit_suggestions = Outfit.objects.filter(user=request.user).order_by('-ai_score')[:3]
+    # Get user's wardrobe stats, maintained incrementally as items change
+    stats = get_wardrobe_stats(request.user)
+    recent_items = item_listing(request.user).order_by(*ITEM_ORDERING)[:4]
+    saved_outfits = saved_outfit_listing(request.user, with_items=False).order_by(*SAVED_OUTFIT_ORDERING)[:2]
     
-    # Calculate style score based on wardrobe variety
-    style_score = calculate_style_score(request.user)
+    # Get outfit suggestions, with their items prefetched
+    outfit_suggestions = outfit_listing(request.user).order_by(*OUTFIT_ORDERING)[:3]
     
     context = {
-        'wardrobe_count': wardrobe_count,
+        'wardrobe_count': stats.total_items,
         'recent_items': recent_items,
         'saved_outfits': saved_outfits,
         'outfit_suggestions': outfit_suggestions,
-        'style_score': style_score,
+        'style_score': stats.style_score,
     }
     return render(request, 'wardrobe/dashboard.html', context)
 
 def calculate_style_score(user):
     """Calculate a style score based on wardrobe variety"""
-    # This is a simple implementation - in a real app, this would be more sophisticated
-    items = ClothingItem.objects.filter(user=user)
-    
-    if not items:
-        return 0
-    
-    # Count unique categories, colors, patterns
-    categories = set(items.values_list('category', flat=True))
-    colors = set(items.values_list('color', flat=True))
-    patterns = set(items.values_list('pattern', flat=True))
-    
-    # Calculate score based on variety
-    category_score = min(len(categories) * 10, 30)  # Max 30 points
-    color_score = min(len(colors) * 5, 30)  # Max 30 points
-    pattern_score = min(len(patterns) * 10, 30)  # Max 30 points
-    
-    # Add bonus for having items in each season
-    seasons = set(items.values_list('season', flat=True))
-    season_score = min(len(seasons) * 2.5, 10)  # Max 10 points
-    
-    total_score = category_score + color_score + pattern_score + season_score
-    return int(total_score)
+    return get_wardrobe_stats(user).style_score
 
 @login_required
 def wardrobe_home(request):
     """View for browsing wardrobe items"""
-    items = ClothingItem.objects.filter(user=request.user).order_by('-date_added')
-    
-    # Filter handling
-    category = request.GET.get('category')
-    color = request.GET.get('color')
-    pattern = request.GET.get('pattern')
-    season = request.GET.get('season')
+    items, selected = filter_items(request, item_listing(request.user))
     
-    if category and category != 'All':
-        items = items.filter(category=category.lower())
-    if color and color != 'All':
-        items = items.filter(color=color.lower())
-    if pattern and pattern != 'All':
-        items = items.filter(pattern=pattern.lower())
-    if season and season != 'All':
-        items = items.filter(season=season.lower())
+    # Page through the listing from the cursor
+    page, pagination = listing_page(request, items, ITEM_ORDERING,
+                                    getattr(settings, 'WARDROBE_PAGE_SIZE', DEFAULT_ITEMS_PAGE_SIZE))
     
-    context = {
-        'items': items,
-        'selected_category': category,
-        'selected_color': color,
-        'selected_pattern': pattern,
-        'selected_season': season,
-    }
+    context = {'items': page, **pagination, **selected}
     return render(request, 'wardrobe/wardrobe_home.html', context)
 
+def filter_items(request, items):
+    """Apply the wardrobe filters in the query string; returns (items, selected filter context)"""
+    selected = {}
+    for field in ('category', 'color', 'pattern', 'season'):
+        value = request.GET.get(field)
+        if value and value != 'All':
+            items = items.filter(**{field: value.lower()})
+        selected[f'selected_{field}'] = value
+    return items, selected
+
 @login_required
 def add_item(request):
     """View for adding a new clothing item"""
     if request.method == 'POST':
         form = ClothingItemForm(request.POST, request.FILES)
         if form.is_valid():
-            # Save the item but don't commit to DB yet
-            item = form.save(commit=False)
-            item.user = request.user
-            
-            # If image is provided, analyze it with ML
-            if 'image' in request.FILES:
-                image = request.FILES['image']
-                # Analyze image to detect color and pattern
-                analysis_results = analyze_image(image)
-                
-                # Update form with ML analysis results if available
-                if analysis_results.get('color'):
-                    item.color = analysis_results['color']
-                if analysis_results.get('pattern'):
-                    item.pattern = analysis_results['pattern']
-            
-            item.save()
-            messages.success(request, f'Item "{item.name}" has been added to your wardrobe!')
+            store_new_item(request, form)
             return redirect('wardrobe-home')
     else:
         form = ClothingItemForm()
     
     return render(request, 'wardrobe/item_form.html', {'form': form, 'title': 'Add New Item'})
 
+def store_new_item(request, form):
+    """Save a valid ClothingItemForm for the user and queue its image analysis"""
+    # Save the item but don't commit to DB yet
+    item = form.save(commit=False)
+    item.user = request.user
+    with stage('add_item', 'save'):
+        item.save()
+    
+    # Analyze the image in the background to detect color and pattern;
+    # the form values are kept until the analysis worker fills them in
+    try:
+        with stage('add_item', 'enqueue'):
+            enqueue_analysis(item)
+    except AnalysisQueueFull:
+        ClothingItem.objects.filter(pk=item.pk).update(analysis_status='skipped')
+        messages.warning(request, 'Image analysis is busy right now, so the color and pattern you entered were kept.')
+    
+    messages.success(request, f'Item "{item.name}" has been added to your wardrobe!')
+    return item
+
+@login_required
+def bulk_add_items(request):
+    """View for adding many clothing items at once from a batch of photos"""
+    if request.method == 'POST':
+        form = BulkItemUploadForm(request.POST, request.FILES)
+        if form.is_valid():
+            images = form.cleaned_data['images']
+            
+            # Analyze the whole batch in one pass
+            analysis_results = analyze_images(images)
+            
+            items = store_bulk_items(request.user, form.cleaned_data, images, analysis_results)
+            messages.success(request, f'{len(items)} items have been added to your wardrobe!')
+            return redirect('wardrobe-home')
+    else:
+        form = BulkItemUploadForm()
+    
+    return render(request, 'wardrobe/bulk_upload.html', {'form': form, 'title': 'Add Items in Bulk'})
+
+def store_bulk_items(user, cleaned_data, images, analysis_results):
+    """Create items and their features for a batch of analyzed uploads"""
+    items = []
+    for image, results in zip(images, analysis_results):
+        image.seek(0)
+        item = ClothingItem(
+            user=user,
+            name=os.path.splitext(os.path.basename(image.name))[0][:100],
+            category=cleaned_data['category'],
+            season=cleaned_data['season'],
+            color=results.get('color', 'multi'),
+            pattern=results.get('pattern', 'other'),
+            analysis_status='complete' if results else 'failed',
+            image_hash=hash_image_file(image),
+        )
+        # Store the file now; rows are inserted together below
+        with stage('bulk_add_items', 'store_file'):
+            item.image.save(image.name, image, save=False)
+        items.append(item)
+    
+    with stage('bulk_add_items', 'save'):
+        ClothingItem.objects.bulk_create(items)
+        items_added(items)  # bulk_create sends no post_save signals
+        
+        # Store the extracted image features alongside the new items
+        features = [build_item_features(item, results) for item, results in zip(items, analysis_results)]
+        ItemFeatures.objects.bulk_create([f for f in features if f is not None])
+    return items
+
+@login_required
+def item_rendition(request, image_hash, size, fmt):
+    """Serve an item image rendition, generating it on first request
+
+    Renditions are content-addressed, so browsers may keep them for good,
+    but they are private photos: shared caches must not store them.
+    """
+    if size not in RENDITION_SIZES or fmt not in RENDITION_FORMATS:
+        raise Http404
+    item = ClothingItem.objects.filter(user=request.user, image_hash=image_hash).first()
+    if item is None:
+        raise Http404
+    
+    name = generate_renditions(item, size)[fmt]
+    response = FileResponse(default_storage.open(name, 'rb'), content_type=f'image/{fmt}')
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
+def serve_rendition_file(request, path):
+    """Serve a stored rendition in development with far-future cache headers"""
+    response = serve(request, path, document_root=default_storage.location)
+    response['Cache-Control'] = 'private, max-age=31536000, immutable'
+    return response
+
 @login_required
 def item_detail(request, pk):
     """View for viewing a clothing item's details"""
@@ -149,6 +238,13 @@ def update_item(request, pk):
         form = ClothingItemForm(request.POST, request.FILES, instance=item)
         if form.is_valid():
             form.save()
+            
+            # Re-analyze when a new image is uploaded
+            if 'image' in request.FILES:
+                try:
+                    enqueue_analysis(item)
+                except AnalysisQueueFull:
+                    ClothingItem.objects.filter(pk=item.pk).update(analysis_status='skipped')
             messages.success(request, f'Item "{item.name}" has been updated!')
             return redirect('item-detail', pk=item.pk)
     else:
@@ -172,68 +268,64 @@ def delete_item(request, pk):
 @login_required
 def outfit_suggestions(request):
     """View for outfit suggestions"""
-    # Get all outfits for the user
-    outfits = Outfit.objects.filter(user=request.user).order_by('-ai_score')
+    # Get the user's outfits, best first
+    outfits, selected = filter_outfits(request, outfit_listing(request.user))
     
-    # Filter handling
-    occasion = request.GET.get('occasion')
-    season = request.GET.get('season')
-    style = request.GET.get('style')
+    page, pagination = listing_page(request, outfits, OUTFIT_ORDERING,
+                                    getattr(settings, 'OUTFITS_PAGE_SIZE', DEFAULT_OUTFITS_PAGE_SIZE))
     
-    if occasion:
-        outfits = outfits.filter(occasion=occasion.lower())
-    if season:
-        outfits = outfits.filter(season=season.lower())
-    if style:
-        outfits = outfits.filter(style=style.lower())
-    
-    context = {
-        'outfits': outfits,
-        'selected_occasion': occasion,
-        'selected_season': season,
-        'selected_style': style,
-    }
+    context = {'outfits': page, **pagination, **selected}
     return render(request, 'wardrobe/outfit_suggestions.html', context)
 
+def filter_outfits(request, outfits):
+    """Apply the outfit filters in the query string; returns (outfits, selected filter context)"""
+    selected = {}
+    for field in ('occasion', 'season', 'style'):
+        value = request.GET.get(field)
+        if value:
+            outfits = outfits.filter(**{field: value.lower()})
+        selected[f'selected_{field}'] = value
+    return outfits, selected
+
 @login_required
 def generate_suggestions(request):
     """Generate new outfit suggestions using ML"""
-    # Get user's clothing items
-    items = ClothingItem.objects.filter(user=request.user)
+    with stage('generate_suggestions', 'stats'):
+        stats = get_wardrobe_stats(request.user)
     
-    if items.count() < 2:
+    if stats.total_items < 2:
         messages.warning(request, 'You need at least 2 items in your wardrobe to generate outfit suggestions.')
         return redirect('wardrobe-home')
     
-    # Get user's style preferences
-    try:
-        style_prefs = StylePreference.objects.get(user=request.user)
-    except StylePreference.DoesNotExist:
-        style_prefs = StylePreference.objects.create(user=request.user)
+    # Get user's style preferences, parsed once and cached until they change
+    with stage('generate_suggestions', 'preferences'):
+        style_prefs = get_preferences(request.user)
     
-    # Generate outfit suggestions using ML
-    suggestions = generate_outfit_suggestions(items, style_prefs)
+    with stage('generate_suggestions', 'load_items'):
+        items = list(ClothingItem.objects.filter(user=request.user).only(*SUGGESTION_ITEM_FIELDS))
     
-    # Save the generated outfits
-    for suggestion in suggestions:
-        outfit = Outfit(
-            user=request.user,
-            name=suggestion['name'],
-            occasion=suggestion['occasion'],
-            season=suggestion['season'],
-            style=suggestion['style'],
-            style_notes=suggestion['style_notes'],
-            ai_score=suggestion['ai_score']
-        )
-        outfit.save()
-        
-        # Add items to the outfit
-        for item_id in suggestion['items']:
-            outfit.items.add(item_id)
+    # Deal suggestions from the precomputed pool; only what changed since it was built is recomputed
+    with stage('generate_suggestions', 'suggest'):
+        suggestions, _ = suggest_from_pool(request.user, items, style_prefs, stats.version)
     
-    messages.success(request, f'Generated {len(suggestions)} new outfit suggestions!')
+    # Save the generated outfits in one transaction, refreshing any outfit with the same items
+    with stage('generate_suggestions', 'save'):
+        saved = save_outfit_suggestions(request.user, suggestions)
+    observe_generation(items, suggestions)
+    report_saved_suggestions(request, saved)
     return redirect('outfit-suggestions')
 
+def observe_generation(items, suggestions):
+    metrics_registry.observe('items_per_wardrobe', len(items), SIZE_BUCKETS)
+    metrics_registry.observe('suggestions_per_call', len(suggestions), COUNT_BUCKETS)
+
+def report_saved_suggestions(request, saved):
+    created, refreshed = len(saved['created']), len(saved['refreshed'])
+    if refreshed:
+        messages.success(request, f'Generated {created} new outfit suggestions and refreshed {refreshed} existing ones!')
+    else:
+        messages.success(request, f'Generated {created} new outfit suggestions!')
+
 @login_required
 def outfit_detail(request, pk):
     """View for viewing an outfit's details"""
@@ -278,8 +370,10 @@ def delete_outfit(request, pk):
 @login_required
 def saved_outfits(request):
     """View for saved outfits"""
-    saved = SavedOutfit.objects.filter(user=request.user).order_by('-date_saved')
-    return render(request, 'wardrobe/saved_outfits.html', {'saved_outfits': saved})
+    page, pagination = listing_page(request, saved_outfit_listing(request.user), SAVED_OUTFIT_ORDERING,
+                                    getattr(settings, 'OUTFITS_PAGE_SIZE', DEFAULT_OUTFITS_PAGE_SIZE))
+    context = {'saved_outfits': page, **pagination}
+    return render(request, 'wardrobe/saved_outfits.html', context)
 
 @login_required
 def profile(request):
@@ -321,3 +415,26 @@ def style_preferences(request):
         form = StylePreferenceForm(instance=style_prefs)
     
     return render(request, 'wardrobe/style_preferences.html', {'form': form})
+
+@staff_member_required
+def request_metrics(request):
+    """Per-view request timing histograms collected by RequestTimingMiddleware"""
+    return JsonResponse(metrics_registry.snapshot())
+
+def metrics_access_allowed(request):
+    """Staff users, scrapers sending the METRICS_TOKEN bearer token, and METRICS_ALLOWED_IPS if configured"""
+    if request.user.is_staff:
+        return True
+    token = getattr(settings, 'METRICS_TOKEN', DEFAULT_METRICS_TOKEN)
+    if token and hmac.compare_digest(request.headers.get('Authorization', ''), f'Bearer {token}'):
+        return True
+    return request.META.get('REMOTE_ADDR') in getattr(settings, 'METRICS_ALLOWED_IPS', DEFAULT_METRICS_ALLOWED_IPS)
+
+def prometheus_metrics(request):
+    """Every counter and histogram in the Prometheus text format
+
+    Open to staff users and to scrapers let in by metrics_access_allowed.
+    """
+    if not metrics_access_allowed(request):
+        raise PermissionDenied
+    return HttpResponse(metrics_registry.prometheus_text(), content_type='text/plain; version=0.0.4; charset=utf-8')